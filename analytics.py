@@ -0,0 +1,257 @@
+"""Demand reports over the reservation history, computed with NumPy"""
+
+import argparse
+import json
+import os
+import zipfile
+from locking import atomic_write
+from reservation import Reservation
+from snapshot import source_signature
+from store import backend_name, flush_all
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("analytics.py needs NumPy: pip install numpy")
+
+
+def _dates(strings):
+    """Parse YYYY-MM-DD strings into a datetime64[D] array, with NaT for
+    the invalid ones."""
+    try:
+        return np.array(strings, dtype='datetime64[D]')
+    except ValueError:
+        dates = np.empty(len(strings), dtype='datetime64[D]')
+        for index, string in enumerate(strings):
+            try:
+                dates[index] = np.datetime64(string, 'D')
+            except ValueError:
+                dates[index] = np.datetime64('NaT')
+        return dates
+
+
+def cache_path(path):
+    """Return the columnar cache kept next to a reservations file."""
+    return path + '.npz'
+
+
+class Columns:
+    """Reservations as parallel arrays, one element per reservation.
+
+    Hotel and customer IDs are stored as integer codes into the sorted
+    ``hotel_ids`` and ``customer_ids`` arrays, and dates as
+    ``datetime64[D]``. Reservations with invalid dates are left out.
+    """
+    FIELDS = ('ids', 'hotel', 'customer', 'start', 'end', 'hotel_ids',
+              'customer_ids')
+
+    def __init__(self, ids, hotel, customer, start, end, hotel_ids,
+                 customer_ids):
+        self.ids = ids
+        self.hotel = hotel
+        self.customer = customer
+        self.start = start
+        self.end = end
+        self.hotel_ids = hotel_ids
+        self.customer_ids = customer_ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the columns from reservation records by ID."""
+        _require_numpy()
+        values = list(records.values())
+        start = _dates([record['start_date'] for record in values])
+        end = _dates([record['end_date'] for record in values])
+        valid = ~np.isnat(start) & ~np.isnat(end) & (end > start)
+        hotel_ids, hotel = np.unique(
+            np.array([record['hotel_id'] for record in values], dtype=str),
+            return_inverse=True)
+        customer_ids, customer = np.unique(
+            np.array([record['customer_id'] for record in values],
+                     dtype=str),
+            return_inverse=True)
+        return cls(np.array(list(records), dtype=str)[valid],
+                   hotel.astype(np.int32)[valid],
+                   customer.astype(np.int32)[valid],
+                   start[valid], end[valid], hotel_ids, customer_ids)
+
+    def save(self, path, source):
+        """Write the columns and the source signature to an .npz file."""
+        atomic_write(path, lambda file: np.savez(
+            file, source=np.array(source, dtype=np.int64),
+            **{name: getattr(self, name) for name in self.FIELDS}),
+            binary=True)
+
+    @classmethod
+    def load(cls, path, source):
+        """Return the columns cached in ``path`` if they were built from
+        ``source``, else None."""
+        try:
+            with np.load(path) as data:
+                if data['source'].tolist() != list(source):
+                    return None
+                return cls(*(data[name] for name in cls.FIELDS))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+
+def load_columns(use_cache=True):
+    """Return the reservations as Columns.
+
+    With the json backend, the columns are cached in
+    ``<reservations file>.npz`` and reused until the file changes.
+    """
+    _require_numpy()
+    # The cache is checked against the file, so write pending changes.
+    flush_all()
+    path = Reservation.reservations_file
+    source = source_signature(path)
+    cacheable = use_cache and backend_name() == 'json' and source is not None
+    if cacheable:
+        columns = Columns.load(cache_path(path), source)
+        if columns is not None:
+            return columns
+    columns = Columns.from_records(Reservation.get_all_reservations())
+    if cacheable:
+        columns.save(cache_path(path), source)
+    return columns
+
+
+def nights_by_hotel_month(columns):
+    """Return nights booked by (hotel ID, 'YYYY-MM').
+
+    A stay over a month end counts its nights in the month they fall in.
+    """
+    lengths = (columns.end - columns.start).astype(np.int64)
+    if not lengths.sum():
+        return {}
+    # One element per booked night.
+    first = np.cumsum(lengths) - lengths
+    offsets = np.arange(lengths.sum()) - np.repeat(first, lengths)
+    nights = np.repeat(columns.start, lengths) + offsets
+    months = nights.astype('datetime64[M]')
+    hotels = np.repeat(columns.hotel, lengths)
+    month_ids, month = np.unique(months, return_inverse=True)
+    counts = np.bincount(
+        hotels.astype(np.int64) * len(month_ids) + month,
+        minlength=len(columns.hotel_ids) * len(month_ids))
+    return {
+        (str(columns.hotel_ids[code // len(month_ids)]),
+         str(month_ids[code % len(month_ids)])): int(counts[code])
+        for code in np.flatnonzero(counts)
+    }
+
+
+def average_stay(columns):
+    """Return the average length of stay in nights by hotel ID."""
+    lengths = (columns.end - columns.start).astype(np.int64)
+    stays = np.bincount(columns.hotel, minlength=len(columns.hotel_ids))
+    nights = np.bincount(columns.hotel, weights=lengths,
+                         minlength=len(columns.hotel_ids))
+    return {
+        str(hotel_id): float(nights[code] / stays[code])
+        for code, hotel_id in enumerate(columns.hotel_ids) if stays[code]
+    }
+
+
+def booking_dates(feed_path):
+    """Return the time each reservation was first saved, by ID, from a
+    change feed (see changefeed.py)."""
+    dates = {}
+    with open(feed_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event["kind"] == 'reservations' and event["op"] == 'insert':
+                dates.setdefault(event["key"], event["time"])
+    return dates
+
+
+def lead_times(columns, booked, bins=(0, 1, 7, 14, 30, 60, 90, 180, 365)):
+    """Return a histogram of the days between booking and arrival.
+
+    ``booked`` maps reservation IDs to booking times in seconds since
+    the epoch, as returned by ``booking_dates``; reservations missing
+    from it are left out. Returns (counts, bin edges in days).
+    """
+    known = np.array([key in booked for key in columns.ids.tolist()],
+                     dtype=bool)
+    times = np.array(
+        [int(booked[key]) for key in columns.ids[known].tolist()],
+        dtype='datetime64[s]')
+    days = columns.start[known] - times.astype('datetime64[D]')
+    edges = np.array(bins + (np.iinfo(np.int32).max,))
+    counts, _ = np.histogram(days.astype(np.int64), bins=edges)
+    return counts, edges
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Reservation analytics CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Nights per month command
+    subparsers.add_parser(
+        'nights', help='Nights booked per hotel and month'
+        )
+
+    # Length of stay command
+    subparsers.add_parser(
+        'stay', help='Average length of stay per hotel'
+        )
+
+    # Lead time command
+    lead_parser = subparsers.add_parser(
+        'lead-time', help='Days between booking and arrival'
+        )
+    lead_parser.add_argument(
+        'feed', type=str, help='Change feed holding the booking times'
+        )
+
+    parser.add_argument(
+        '--no-cache', dest='cache', action='store_false',
+        help='Rebuild the columns instead of using the .npz cache'
+        )
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return
+    columns = load_columns(args.cache)
+
+    if args.command == 'nights':
+        for (hotel_id, month), nights in sorted(
+                nights_by_hotel_month(columns).items()):
+            print(f"Hotel ID: {hotel_id}, Month: {month}, Nights: {nights}")
+
+    elif args.command == 'stay':
+        for hotel_id, nights in sorted(average_stay(columns).items()):
+            print(f"Hotel ID: {hotel_id}, Average stay: {nights:.2f} nights")
+
+    elif args.command == 'lead-time':
+        if not os.path.isfile(args.feed):
+            print("Change feed not found.")
+            return
+        counts, edges = lead_times(columns, booking_dates(args.feed))
+        for low, high, count in zip(edges[:-1], edges[1:], counts):
+            if high == edges[-1]:
+                label = f"{low}+"
+            elif high - 1 == low:
+                label = f"{low}"
+            else:
+                label = f"{low}-{high - 1}"
+            print(f"{label} days: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Date-range availability index for hotel rooms"""
+
+import bisect
+import datetime
+from store import DerivedIndex, derived
+
+
+def to_ordinal(iso_date):
+    """Convert a YYYY-MM-DD date string to a day number."""
+    return datetime.date.fromisoformat(iso_date).toordinal()
+
+
+def from_ordinal(day):
+    """Convert a day number back to a YYYY-MM-DD date string."""
+    return datetime.date.fromordinal(day).isoformat()
+
+
+def stay_range(start_date, end_date):
+    """Return the [start, end) day numbers of a stay.
+
+    Raises ValueError if a date is malformed or the stay is empty.
+    """
+    start, end = to_ordinal(start_date), to_ordinal(end_date)
+    if end <= start:
+        raise ValueError("End date must be after start date.")
+    return start, end
+
+
+class RoomCalendar:
+    """Bookings of one room, kept as [start, end) day intervals sorted by
+    start.
+
+    Bookings normally do not overlap, which keeps lookups logarithmic.
+    Data saved before double bookings were rejected may contain
+    overlaps; once one is added, ``overlapping`` is set and lookups scan
+    every earlier booking instead.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.overlapping = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, start, end, reservation_id):
+        """Record a booking."""
+        pos = bisect.bisect_right(self.starts, start)
+        if (pos > 0 and self.ends[pos - 1] > start) or \
+                (pos < len(self.starts) and self.starts[pos] < end):
+            self.overlapping = True
+        self.starts.insert(pos, start)
+        self.ends.insert(pos, end)
+        self.ids.insert(pos, reservation_id)
+
+    def discard(self, start, reservation_id):
+        """Forget a booking if it is present."""
+        pos = bisect.bisect_left(self.starts, start)
+        while pos < len(self.starts) and self.starts[pos] == start:
+            if self.ids[pos] == reservation_id:
+                del self.starts[pos]
+                del self.ends[pos]
+                del self.ids[pos]
+                return
+            pos += 1
+
+    def conflict(self, start, end, ignore=None):
+        """Return the ID of a booking overlapping [start, end), or None.
+
+        Without overlapping bookings, only the last bookings starting
+        before ``end`` need to be looked at.
+        """
+        pos = bisect.bisect_left(self.starts, end) - 1
+        if self.overlapping:
+            for index in range(pos, -1, -1):
+                if self.ids[index] != ignore and self.ends[index] > start:
+                    return self.ids[index]
+            return None
+        while pos >= 0:
+            if self.ids[pos] != ignore:
+                return self.ids[pos] if self.ends[pos] > start else None
+            pos -= 1
+        return None
+
+    def gap(self, start, end):
+        """Return the free gap around the stay [start, end).
+
+        The gap is (end of the previous booking, start of the next one),
+        with None for a side without bookings. Returns None if the stay
+        overlaps a booking.
+        """
+        pos = bisect.bisect_left(self.starts, end) - 1
+        if self.overlapping:
+            if self.conflict(start, end) is not None:
+                return None
+            previous = max(self.ends[:pos + 1], default=None)
+        elif pos >= 0 and self.ends[pos] > start:
+            return None
+        else:
+            previous = self.ends[pos] if pos >= 0 else None
+        following = self.starts[pos + 1] if pos + 1 < len(self.starts) \
+            else None
+        return previous, following
+
+
+def _fit(gaps, start, end):
+    """Return how well [start, end) fits the intersection of ``gaps``;
+    lower is better, None if it does not fit."""
+    previous, following = None, None
+    for gap in gaps:
+        if gap is None:
+            return None
+        if gap[0] is not None:
+            previous = gap[0] if previous is None else max(previous, gap[0])
+        if gap[1] is not None:
+            following = gap[1] if following is None else min(
+                following, gap[1])
+    size = float('inf') if previous is None or following is None else \
+        following - previous
+    # Among equal gaps, prefer stays right next to other bookings.
+    touching = (previous == start) + (following == end)
+    return size, -touching
+
+
+class AvailabilityIndex(DerivedIndex):
+    """Per-room calendars built from a reservations store."""
+
+    def __init__(self, reservations):
+        self._calendars = {}
+        super().__init__(reservations)
+
+    def clear(self):
+        self._calendars = {}
+
+    def add(self, key, record):
+        try:
+            start, end = stay_range(record['start_date'], record['end_date'])
+        except ValueError:
+            return
+        room = (record['hotel_id'], record['room_number'])
+        self._calendars.setdefault(room, RoomCalendar()).add(start, end, key)
+
+    def discard(self, key, record):
+        room = (record['hotel_id'], record['room_number'])
+        if room not in self._calendars:
+            return
+        try:
+            start = to_ordinal(record['start_date'])
+        except ValueError:
+            return
+        self._calendars[room].discard(start, key)
+
+    def _room_calendar(self, hotel_id, room_number):
+        """Return the calendar of one room without bringing the index up
+        to date."""
+        return self._calendars.get((hotel_id, room_number), RoomCalendar())
+
+    def calendar(self, hotel_id, room_number):
+        """Return the calendar of one room."""
+        self.ensure()
+        return self._room_calendar(hotel_id, room_number)
+
+    def conflict(self, hotel_id, room_number, start, end, ignore=None):
+        """Return the ID of a reservation overlapping the stay, or None."""
+        return self.calendar(hotel_id, room_number).conflict(
+            start, end, ignore)
+
+    def best_fit(self, hotel_id, room_numbers, start, end, planned=None):
+        """Return the room best suited to the stay, or None if none is
+        free.
+
+        The chosen room is the one whose free gap around the stay is
+        smallest, so long free stretches stay available for long stays
+        and few short, unsellable gaps are left. ``planned`` maps
+        (hotel ID, room number) to a RoomCalendar of bookings not saved
+        yet. Takes O(k log n) for k rooms with n bookings each.
+        """
+        self.ensure()
+        best, best_score = None, None
+        planned = planned or {}
+        for number in sorted(room_numbers):
+            gaps = [self._room_calendar(hotel_id, number).gap(start, end)]
+            if (hotel_id, number) in planned:
+                gaps.append(planned[(hotel_id, number)].gap(start, end))
+            score = _fit(gaps, start, end)
+            if score is not None and (best_score is None
+                                      or score < best_score):
+                best, best_score = number, score
+        return best
+
+    def free_rooms(self, hotel_id, room_numbers, start, end):
+        """Return the rooms of ``room_numbers`` free for the whole stay."""
+        return [
+            number for number in room_numbers
+            if self.conflict(hotel_id, number, start, end) is None
+        ]
+
+
+def index_for(reservations):
+    """Return the shared availability index of a reservations store."""
+    return derived(reservations, AvailabilityIndex)
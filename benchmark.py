@@ -0,0 +1,345 @@
+"""Benchmarks for hotel, customer and reservation operations"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import serialization
+import store
+from customer import Customer
+from hotel import Hotel
+from populate_data import create_or_update_file
+from reservation import Reservation
+
+BASE_DATE = datetime.date(2024, 1, 1)
+
+
+def generate_data(hotels, rooms_per_hotel=10, customers=None,
+                  reservations=None):
+    """Return synthetic (hotels, customers, reservations) data in the
+    populate_data.py layout.
+
+    Reservations are two-night stays spread over every room so that none
+    of them overlap.
+    """
+    customers = hotels if customers is None else customers
+    reservations = hotels if reservations is None else reservations
+    hotels_data = {
+        f"H{number:07d}": {
+            "name": f"Hotel {number}",
+            "location": f"City {number % 100}, {number} Main Street",
+            "rooms": {
+                str(100 + room): {"available": True, "customer_id": None}
+                for room in range(rooms_per_hotel)
+            }
+        }
+        for number in range(hotels)
+    }
+    customers_data = {
+        f"C{number:07d}": {
+            "name": f"Customer {number}",
+            "email": f"customer{number}@example.com"
+        }
+        for number in range(customers)
+    }
+    reservations_data = {}
+    total_rooms = hotels * rooms_per_hotel
+    for number in range(reservations if total_rooms else 0):
+        slot, round_number = number % total_rooms, number // total_rooms
+        hotel_id = f"H{slot // rooms_per_hotel:07d}"
+        room_number = str(100 + slot % rooms_per_hotel)
+        start = BASE_DATE + datetime.timedelta(days=3 * round_number)
+        customer_id = f"C{number % max(customers, 1):07d}"
+        reservations_data[f"R{number:07d}"] = {
+            "customer_id": customer_id,
+            "hotel_id": hotel_id,
+            "room_number": room_number,
+            "start_date": start.isoformat(),
+            "end_date": (start + datetime.timedelta(days=2)).isoformat()
+        }
+        room = hotels_data[hotel_id]["rooms"][room_number]
+        room["available"] = False
+        room["customer_id"] = customer_id
+    return hotels_data, customers_data, reservations_data
+
+
+def _future_stay(number):
+    """Return dates of a stay after every generated reservation."""
+    start = BASE_DATE + datetime.timedelta(days=100000 + 3 * number)
+    return start.isoformat(), (start + datetime.timedelta(days=2)).isoformat()
+
+
+def _reservation_save(number, size, rng):
+    start_date, end_date = _future_stay(number)
+    Reservation(
+        f"RB{number:07d}", f"C{rng.randrange(size):07d}",
+        f"H{rng.randrange(size):07d}", "100", start_date, end_date).save()
+
+
+def _mixed(number, size, rng):
+    if rng.random() < 0.1:
+        _reservation_save(number, size, rng)
+    else:
+        Hotel.display_info(f"H{rng.randrange(size):07d}")
+
+
+# Workload name to a function running operation ``number``.
+WORKLOADS = {
+    'hotel.save': lambda number, size, rng: Hotel(
+        f"HB{number:07d}", "Bench Hotel", "Bench City",
+        {"101": {"available": True, "customer_id": None}}).save(),
+    'hotel.display': lambda number, size, rng: Hotel.display_info(
+        f"H{rng.randrange(size):07d}"),
+    'hotel.get_all': lambda number, size, rng: Hotel.get_all_hotels(),
+    'customer.save': lambda number, size, rng: Customer(
+        f"CB{number:07d}", "Bench Customer", "bench@example.com").save(),
+    'customer.get_all': lambda number, size, rng: Customer.get_all_customers(),
+    'reservation.save': _reservation_save,
+    'reservation.cancel': lambda number, size, rng: Reservation.cancel(
+        f"R{number:07d}"),
+    'reservation.get_all': (
+        lambda number, size, rng: Reservation.get_all_reservations()),
+    'mixed': _mixed,
+}
+
+
+# Workloads that use up one generated reservation per operation.
+CONSUMING = {'reservation.cancel'}
+
+
+def percentile(samples, fraction):
+    """Return the ``fraction`` percentile of sorted ``samples``."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def _peak_rss_kb():
+    """Return the peak resident set size of this process in KiB.
+
+    The peak only ever grows, so each workload runs in a process of its
+    own, see ``run``.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB.
+    return peak // 1024 if platform.system() == 'Darwin' else peak
+
+
+def run_workload(workload, size, operations, directory, cold=False,
+                 rooms_per_hotel=10, seed=0):
+    """Run one workload on a fresh dataset and return its measurements.
+
+    With ``cold`` the stores are dropped before every operation, which
+    matches the cost of running each operation as a separate CLI call.
+    Workloads in CONSUMING get a reservation for every operation.
+    """
+    Hotel.hotels_file = os.path.join(directory, 'hotels.json')
+    Customer.customers_file = os.path.join(directory, 'customers.json')
+    Reservation.reservations_file = os.path.join(
+        directory, 'reservations.json')
+    store.reset()
+    reservations = max(size, operations) if workload in CONSUMING else None
+    for path, data in zip(
+            (Hotel.hotels_file, Customer.customers_file,
+             Reservation.reservations_file),
+            generate_data(size, rooms_per_hotel,
+                          reservations=reservations)):
+        create_or_update_file(path, data)
+
+    operation = WORKLOADS[workload]
+    rng = random.Random(seed)
+    timings = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for number in range(operations):
+            if cold:
+                store.reset()
+            before = time.perf_counter()
+            operation(number, size, rng)
+            timings.append(time.perf_counter() - before)
+        store.flush_all()
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "workload": workload,
+        "size": size,
+        "operations": operations,
+        "cold": cold,
+        "throughput": operations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _commit():
+    """Return the current git commit, if any."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_isolated(backend, *args):
+    """Run one workload with the given storage backend."""
+    store.use_backend(backend)
+    return run_workload(*args)
+
+
+def run(workloads, sizes, operations, cold=False, rooms_per_hotel=10):
+    """Run every workload at every size and return the report.
+
+    Each workload runs in a new process, so its peak RSS is its own.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in sizes:
+        for workload in workloads:
+            with tempfile.TemporaryDirectory() as directory, \
+                    concurrent.futures.ProcessPoolExecutor(
+                        1, mp_context=context) as executor:
+                results.append(executor.submit(
+                    _run_isolated, store.backend_name(), workload, size,
+                    operations, directory, cold, rooms_per_hotel).result())
+    return {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "backend": store.backend_name(),
+        "results": results,
+    }
+
+
+def formats():
+    """Return every (style, codec, compression) usable here."""
+    codecs = [codec for codec in serialization.CODECS
+              if codec != 'orjson' or serialization.orjson is not None]
+    compressions = [
+        compression for compression in serialization.COMPRESSIONS
+        if compression != 'zstd' or serialization.zstandard is not None]
+    return [(style, codec, compression)
+            for style in serialization.STYLES
+            for codec in codecs
+            for compression in compressions]
+
+
+def run_formats(size, repeat=5, rooms_per_hotel=10):
+    """Measure each data file format on generated hotels and
+    reservations; return one result per format.
+
+    Sizes are in bytes and times are the best of ``repeat`` runs.
+    """
+    hotels, _, reservations = generate_data(size, rooms_per_hotel)
+    results = []
+    for style, codec, compression in formats():
+        encoded, encode_time, decode_time = 0, float('inf'), float('inf')
+        for _ in range(repeat):
+            encoded = 0
+            started = time.perf_counter()
+            raws = [serialization.encode(data, style, codec, compression)
+                    for data in (hotels, reservations)]
+            encode_time = min(encode_time, time.perf_counter() - started)
+            started = time.perf_counter()
+            for raw in raws:
+                serialization.decode(raw, codec)
+                encoded += len(raw)
+            decode_time = min(decode_time, time.perf_counter() - started)
+        results.append({
+            "style": style,
+            "codec": codec,
+            "compression": compression,
+            "bytes": encoded,
+            "encode_ms": encode_time * 1000,
+            "decode_ms": decode_time * 1000,
+        })
+    return results
+
+
+def compare(old, new):
+    """Return lines comparing the throughput of two reports."""
+    previous = {
+        (item["workload"], item["size"], item["cold"]): item
+        for item in old["results"]
+    }
+    lines = []
+    for item in new["results"]:
+        before = previous.get((item["workload"], item["size"], item["cold"]))
+        if before and before["throughput"]:
+            change = item["throughput"] / before["throughput"] - 1
+            lines.append(
+                f"{item['workload']} size={item['size']}: "
+                f"{item['throughput']:.0f} ops/s ({change:+.1%})")
+    return lines
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Benchmark CLI")
+    parser.add_argument(
+        '--workloads', nargs='+', choices=sorted(WORKLOADS),
+        default=sorted(WORKLOADS), help='Workloads to run'
+        )
+    parser.add_argument(
+        '--sizes', nargs='+', type=int, default=[10, 1000],
+        help='Number of hotels, customers and reservations'
+        )
+    parser.add_argument(
+        '--operations', type=int, default=200,
+        help='Operations per workload'
+        )
+    parser.add_argument(
+        '--rooms-per-hotel', type=int, default=10, help='Rooms in each hotel'
+        )
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Drop cached data before every operation'
+        )
+    parser.add_argument(
+        '--output', type=str, help='Write the JSON report to this file'
+        )
+    parser.add_argument(
+        '--compare', type=str, help='Earlier JSON report to compare against'
+        )
+    parser.add_argument(
+        '--formats', action='store_true',
+        help='Compare the data file formats instead of running workloads'
+        )
+    args = parser.parse_args()
+
+    if args.formats:
+        for size in args.sizes:
+            for item in run_formats(
+                    size, rooms_per_hotel=args.rooms_per_hotel):
+                print(f"size={size} {item['style']}/{item['codec']}/"
+                      f"{item['compression']}: {item['bytes']} bytes, "
+                      f"encode {item['encode_ms']:.2f} ms, "
+                      f"decode {item['decode_ms']:.2f} ms")
+        return
+
+    report = run(args.workloads, args.sizes, args.operations, args.cold,
+                 args.rooms_per_hotel)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            for line in compare(json.load(file), report):
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
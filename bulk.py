@@ -0,0 +1,210 @@
+"""Bulk import and export of data as JSON Lines"""
+
+import argparse
+import itertools
+import json
+import sys
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+from store import batch
+
+
+def _hotel(record):
+    return Hotel(
+        record['hotel_id'], record['name'], record['location'],
+        record.get('rooms', {}))
+
+
+def _customer(record):
+    return Customer(record['customer_id'], record['name'], record['email'])
+
+
+def _reservation(record):
+    return Reservation(
+        record['reservation_id'], record['customer_id'], record['hotel_id'],
+        record['room_number'], record['start_date'], record['end_date'])
+
+
+# Per kind: the ID field, the required fields, a function building the
+# entity from a record and the stores it writes to.
+KINDS = {
+    'hotels': (
+        'hotel_id', ('name', 'location'), _hotel,
+        lambda: (Hotel.storage(),)),
+    'customers': (
+        'customer_id', ('name', 'email'), _customer,
+        lambda: (Customer.storage(),)),
+    'reservations': (
+        'reservation_id',
+        ('customer_id', 'hotel_id', 'room_number', 'start_date', 'end_date'),
+        _reservation,
+        lambda: (Reservation.storage(), Hotel.storage())),
+}
+
+
+def validate(kind, record):
+    """Return an error message for an invalid record, or None."""
+    id_field, fields, _, _ = KINDS[kind]
+    if not isinstance(record, dict):
+        return "record is not a JSON object"
+    missing = [name for name in (id_field,) + fields if name not in record]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    wrong = [name for name in (id_field,) + fields
+             if not isinstance(record[name], str)]
+    if wrong:
+        return f"fields must be strings: {', '.join(wrong)}"
+    if kind == 'hotels' and not _valid_rooms(record.get('rooms', {})):
+        return ("rooms must map room numbers to objects with a boolean "
+                "'available' and a 'customer_id'")
+    return None
+
+
+def _valid_rooms(rooms):
+    """Return True if ``rooms`` has the layout of the hotels file."""
+    return isinstance(rooms, dict) and all(
+        isinstance(room, dict)
+        and isinstance(room.get('available'), bool)
+        and isinstance(room.get('customer_id', ''), (str, type(None)))
+        for room in rooms.values())
+
+
+def _lines(file, errors):
+    """Yield (line number, record) for each valid JSON line of ``file``."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as error:
+            errors.append((number, f"invalid JSON: {error.msg}"))
+
+
+def _save_reservations(numbered, errors):
+    """Save (line number, reservation) pairs in one batch; return how
+    many were saved.
+
+    Reservations rejected by ``Reservation.save_many`` are reported with
+    its reason and the others are tried again without them.
+    """
+    lines = {}
+    reservations = []
+    for number, reservation in numbered:
+        if reservation.reservation_id in lines:
+            errors.append((number, "duplicate reservation_id in batch"))
+            continue
+        lines[reservation.reservation_id] = number
+        reservations.append(reservation)
+    while reservations:
+        failures = Reservation.save_many(reservations)
+        if not failures:
+            break
+        errors.extend((lines[reservation_id], error)
+                      for reservation_id, error in failures.items())
+        reservations = [reservation for reservation in reservations
+                        if reservation.reservation_id not in failures]
+    return len(reservations)
+
+
+def bulk_import(kind, file, batch_size=1000):
+    """Import records of ``kind`` from a JSON Lines file object.
+
+    Records are read one line at a time, validated and written in
+    batches of ``batch_size``, each flushed to disk once. A batch that
+    fails leaves nothing of it behind. Returns the number of imported
+    records and a list of (line number, error) pairs.
+    """
+    _, _, build, stores = KINDS[kind]
+    stores = stores()
+    errors = []
+    imported = 0
+    lines = _lines(file, errors)
+    while True:
+        chunk = list(itertools.islice(lines, batch_size))
+        if not chunk:
+            break
+        numbered = []
+        for number, record in chunk:
+            error = validate(kind, record)
+            if error is not None:
+                errors.append((number, error))
+            else:
+                numbered.append((number, build(record)))
+        if kind == 'reservations':
+            imported += _save_reservations(numbered, errors)
+            continue
+        with batch(*stores):
+            for _, entity in numbered:
+                entity.save()
+        imported += len(numbered)
+    errors.sort()
+    return imported, errors
+
+
+def bulk_export(kind, file):
+    """Write every record of ``kind`` to ``file`` as JSON Lines.
+
+    Returns the number of records written.
+    """
+    id_field = KINDS[kind][0]
+    store = KINDS[kind][3]()[0]
+    count = 0
+    for key, record in store.all().items():
+        file.write(json.dumps({id_field: key, **record}) + '\n')
+        count += 1
+    return count
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Bulk data CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Bulk import command
+    import_parser = subparsers.add_parser(
+        'bulk-import', help='Import records from a JSON Lines file'
+        )
+    import_parser.add_argument('kind', choices=sorted(KINDS), help='Data kind')
+    import_parser.add_argument(
+        'file', type=str, help='JSON Lines file, or - for stdin'
+        )
+    import_parser.add_argument(
+        '--batch-size', type=int, default=1000,
+        help='Records written per batch'
+        )
+
+    # Bulk export command
+    export_parser = subparsers.add_parser(
+        'bulk-export', help='Export records to a JSON Lines file'
+        )
+    export_parser.add_argument('kind', choices=sorted(KINDS), help='Data kind')
+    export_parser.add_argument(
+        'file', type=str, help='JSON Lines file, or - for stdout'
+        )
+
+    args = parser.parse_args()
+
+    if args.command == 'bulk-import':
+        if args.file == '-':
+            imported, errors = bulk_import(
+                args.kind, sys.stdin, args.batch_size)
+        else:
+            with open(args.file, 'r', encoding='utf-8') as file:
+                imported, errors = bulk_import(
+                    args.kind, file, args.batch_size)
+        for number, error in errors:
+            print(f"Line {number}: {error}", file=sys.stderr)
+        print(f"Imported {imported} {args.kind}, {len(errors)} failed.")
+
+    elif args.command == 'bulk-export':
+        if args.file == '-':
+            bulk_export(args.kind, sys.stdout)
+        else:
+            with open(args.file, 'w', encoding='utf-8') as file:
+                count = bulk_export(args.kind, file)
+            print(f"Exported {count} {args.kind}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Bounded LRU cache for single-record reads"""
+
+import collections
+import os
+import time
+import weakref
+from instrumentation import metrics
+from store import derived
+
+MISSING = object()
+
+
+class LRUCache:
+    """Mapping that keeps at most ``size`` entries, dropping the least
+    recently used one first.
+
+    With a ``ttl`` in seconds, entries older than that count as missing.
+    Hits, misses and evictions are counted in ``stats``.
+    """
+
+    def __init__(self, size=1024, ttl=None, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        """Return the value cached under ``key``, or ``default``."""
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and \
+                self._clock() - entry[1] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Cache ``value`` under ``key``."""
+        self._entries[key] = (value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def discard(self, key):
+        """Forget ``key`` if it is cached."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Forget every entry."""
+        self._entries.clear()
+
+
+class RecordCache:
+    """Read-through LRU cache in front of a store's ``get``.
+
+    Local changes to the store drop the changed record, and a change of
+    the store's ``version()`` by another process, such as replacing the
+    file, drops everything. The version the store's own saves leave
+    behind is taken as current. The size and TTL come from
+    ``HOTEL_CACHE_SIZE`` and ``HOTEL_CACHE_TTL`` when set.
+    """
+
+    def __init__(self, source):
+        ttl = os.environ.get('HOTEL_CACHE_TTL')
+        self.cache = LRUCache(
+            int(os.environ.get('HOTEL_CACHE_SIZE') or 1024),
+            float(ttl) if ttl else None)
+        self._source = weakref.ref(source)
+        self._version = source.version()
+        source.add_listener(self._on_change)
+        source.add_save_listener(self._on_saved)
+
+    def _on_change(self, key, old, new):  # pylint: disable=unused-argument
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.discard(key)
+
+    def _on_saved(self, saved):  # pylint: disable=unused-argument
+        # Changed records were already dropped by _on_change.
+        self._version = self._source().version()
+
+    def get(self, key, default=None):
+        """Return the record stored under ``key``."""
+        source = self._source()
+        version = source.version()
+        if version != self._version:
+            self.cache.clear()
+            self._version = version
+        evictions = self.cache.stats['evictions']
+        record = self.cache.get(key)
+        if record is not MISSING:
+            metrics.count('hotel_cache_total', result='hit',
+                          file=source.kind)
+        else:
+            metrics.count('hotel_cache_total', result='miss',
+                          file=source.kind)
+            # Missing records are cached too, as None.
+            record = source.get(key)
+            self.cache.put(key, record)
+            metrics.count('hotel_cache_evictions_total',
+                          self.cache.stats['evictions'] - evictions,
+                          file=source.kind)
+        return default if record is None else record
+
+
+def cached(source):
+    """Return the shared record cache of a store."""
+    return derived(source, RecordCache)
@@ -0,0 +1,213 @@
+"""Append-only feed of record changes for downstream consumers"""
+
+import argparse
+import json
+import os
+import time
+from locking import atomic_write, file_lock
+
+# Stores opened while this is set publish their changes to the feed at
+# this path.
+FEED_ENV = 'HOTEL_CHANGE_FEED'
+
+
+class ChangeFeed:
+    """JSON Lines file of change events with increasing sequence numbers.
+
+    Each event is ``{"seq", "time", "kind", "key", "op", "old", "new"}``
+    where ``op`` is 'insert', 'update' or 'delete' and ``old`` and
+    ``new`` are the records before and after the change. Appends hold a
+    lock on the feed, so processes writing to the same feed get distinct,
+    ordered sequence numbers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._seq = 0
+        self._size = None
+
+    def _tail(self):
+        """Return the last sequence number in the file and whether the
+        file ends in the middle of a line."""
+        size = os.path.getsize(self.path) if os.path.isfile(self.path) else 0
+        if size == self._size:
+            return self._seq, False
+        if not size:
+            return 0, False
+        with open(self.path, 'rb') as file:
+            file.seek(max(0, size - 64 * 1024))
+            data = file.read()
+        for line in reversed(data.splitlines()):
+            try:
+                return json.loads(line)["seq"], not data.endswith(b'\n')
+            except (ValueError, KeyError):
+                # A torn line from an interrupted append.
+                continue
+        return 0, bool(data) and not data.endswith(b'\n')
+
+    def append(self, kind, key, old, new):
+        """Add one event and return its sequence number."""
+        return self.extend(kind, [(key, old, new)])
+
+    def extend(self, kind, changes):
+        """Add an event for each (key, old, new) change and return the
+        last sequence number.
+
+        The events get consecutive sequence numbers.
+        """
+        with file_lock(self.path):
+            seq, torn = self._tail()
+            lines = ['\n'] if torn else []
+            for key, old, new in changes:
+                if old is None:
+                    operation = 'insert'
+                elif new is None:
+                    operation = 'delete'
+                else:
+                    operation = 'update'
+                seq += 1
+                event = {"seq": seq, "time": time.time(), "kind": kind,
+                         "key": key, "op": operation, "old": old,
+                         "new": new}
+                lines.append(json.dumps(event) + '\n')
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(''.join(lines))
+                self._size = file.tell()
+            self._seq = seq
+        return seq
+
+    def listeners(self, kind):
+        """Return a change listener and a save listener publishing the
+        changes of ``kind``.
+
+        Changes are held back until the store reports them saved, so the
+        feed never shows a change that was not written.
+        """
+        changes = []
+
+        def record(key, old, new):
+            # Reloads carry no record changes.
+            if key is not None:
+                changes.append((key, old, new))
+
+        def publish(saved):
+            held = changes[:]
+            changes.clear()
+            if saved and held:
+                self.extend(kind, held)
+        return record, publish
+
+
+_feeds = {}
+
+
+def feed(path):
+    """Return the shared feed writing to ``path``."""
+    path = os.path.abspath(path)
+    if path not in _feeds:
+        _feeds[path] = ChangeFeed(path)
+    return _feeds[path]
+
+
+def attach(store, path=None):
+    """Publish the changes of ``store`` to the feed at ``path``, by
+    default the one named by ``HOTEL_CHANGE_FEED``."""
+    record, publish = feed(path or os.environ[FEED_ENV]).listeners(
+        store.kind)
+    store.add_listener(record)
+    store.add_save_listener(publish)
+
+
+def read(path, seq=0, offset=0):
+    """Return the events after sequence number ``seq`` and the offset to
+    read from next time.
+
+    ``offset`` is a byte position at or before the first wanted event,
+    as returned by an earlier call, so only new events are read. An
+    incomplete last line is left for the next call.
+    """
+    if not os.path.isfile(path):
+        return [], 0
+    if os.path.getsize(path) < offset:
+        # The feed was replaced; read it again from the start.
+        offset = 0
+    events = []
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # The rest of a torn line, cut off by the next append.
+                continue
+            if event["seq"] > seq:
+                events.append(event)
+    return events, offset
+
+
+def consume(path, checkpoint_path, handler):
+    """Pass the events added since the last call to ``handler``.
+
+    The position reached is saved in ``checkpoint_path``, also when the
+    handler raises, so the next call resumes after the last event
+    handled. An event is handled again only if the process dies before
+    the checkpoint is saved. Returns the number of events handled.
+    """
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        checkpoint = {"seq": 0, "offset": 0}
+    events, offset = read(path, checkpoint["seq"], checkpoint["offset"])
+    handled = 0
+    try:
+        for event in events:
+            handler(event)
+            checkpoint["seq"] = event["seq"]
+            handled += 1
+        checkpoint["offset"] = offset
+    finally:
+        atomic_write(checkpoint_path, lambda file: json.dump(
+            checkpoint, file))
+    return handled
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Change feed CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Tail feed command
+    tail_parser = subparsers.add_parser(
+        'tail', help='Print the events added since the last checkpoint'
+        )
+    tail_parser.add_argument('feed', type=str, help='Change feed file')
+    tail_parser.add_argument(
+        '--checkpoint', type=str, required=True,
+        help='File keeping the position of this consumer'
+        )
+    tail_parser.add_argument(
+        '--follow', action='store_true', help='Keep waiting for new events'
+        )
+    tail_parser.add_argument(
+        '--interval', type=float, default=1.0,
+        help='Seconds between checks with --follow'
+        )
+
+    args = parser.parse_args()
+
+    if args.command == 'tail':
+        def show(event):
+            print(json.dumps(event), flush=True)
+
+        consume(args.feed, args.checkpoint, show)
+        while args.follow:
+            time.sleep(args.interval)
+            consume(args.feed, args.checkpoint, show)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""Compact in-memory models for hotels, rooms and reservations"""
+
+import copy
+import datetime
+import sys
+from array import array
+
+HOTEL_FIELDS = ('name', 'location', 'rooms')
+ROOM_FIELDS = ('available', 'customer_id')
+RESERVATION_FIELDS = ('customer_id', 'hotel_id', 'room_number',
+                      'start_date', 'end_date')
+
+
+def _intern(value):
+    """Intern string IDs so repeated IDs share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _ordinal(iso_date):
+    """Return the day ordinal of an ISO date, or the string itself if it
+    would not be written back the same."""
+    try:
+        ordinal = datetime.date.fromisoformat(iso_date).toordinal()
+    except (TypeError, ValueError):
+        return iso_date
+    return ordinal if _iso(ordinal) == iso_date else iso_date
+
+
+def _iso(ordinal):
+    if not isinstance(ordinal, int):
+        return ordinal
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+def _extra(record, fields):
+    """Return a copy of the keys of ``record`` not in ``fields``, or
+    None."""
+    extra = {key: copy.deepcopy(value) for key, value in record.items()
+             if key not in fields}
+    return extra or None
+
+
+def _fits_room(room):
+    return (isinstance(room, dict)
+            and isinstance(room.get('available'), bool)
+            and 'customer_id' in room
+            and isinstance(room['customer_id'], (str, type(None))))
+
+
+class CodeTable:
+    """Maps interned string IDs to small integer codes and back."""
+    __slots__ = ('ids', '_codes')
+
+    def __init__(self):
+        self.ids = []
+        self._codes = {}
+
+    def code(self, value):
+        """Return the code of ``value``, adding it if needed."""
+        if value not in self._codes:
+            self._codes[value] = len(self.ids)
+            self.ids.append(_intern(value))
+        return self._codes[value]
+
+
+class RoomTable:
+    """Room status of one hotel kept in parallel compact arrays.
+
+    Room numbers are kept in insertion order. Availability is a bitset in
+    a bytearray and the occupying customer is a code in a ``CodeTable``
+    that can be shared between hotels, with -1 for no customer. Keys of
+    a room other than ``available`` and ``customer_id`` are kept as they
+    are in ``extra``, by room number.
+    """
+    __slots__ = ('numbers', '_positions', '_available', '_customers',
+                 'customer_ids', 'extra')
+
+    def __init__(self, customer_ids=None):
+        self.numbers = []
+        self._positions = {}
+        self._available = bytearray()
+        self._customers = array('i')
+        self.customer_ids = customer_ids if customer_ids is not None \
+            else CodeTable()
+        self.extra = None
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, number):
+        return number in self._positions
+
+    def _customer_code(self, customer_id):
+        if customer_id is None:
+            return -1
+        return self.customer_ids.code(customer_id)
+
+    def _set_available(self, position, available):
+        byte, bit = divmod(position, 8)
+        while len(self._available) <= byte:
+            self._available.append(0)
+        if available:
+            self._available[byte] |= 1 << bit
+        else:
+            self._available[byte] &= ~(1 << bit) & 0xFF
+
+    def _is_set(self, position):
+        byte, bit = divmod(position, 8)
+        return bool(self._available[byte] >> bit & 1)
+
+    def is_available(self, number):
+        """Return the availability flag of a room."""
+        return self._is_set(self._positions[number])
+
+    def customer(self, number):
+        """Return the customer occupying a room, or None."""
+        code = self._customers[self._positions[number]]
+        return None if code < 0 else self.customer_ids.ids[code]
+
+    def set(self, number, available=True, customer_id=None, extra=None):
+        """Add a room or update its status."""
+        number = _intern(number)
+        if number not in self._positions:
+            self._positions[number] = len(self.numbers)
+            self.numbers.append(number)
+            self._customers.append(-1)
+        position = self._positions[number]
+        self._set_available(position, available)
+        self._customers[position] = self._customer_code(customer_id)
+        if extra:
+            self.extra = self.extra or {}
+            self.extra[number] = extra
+        elif self.extra:
+            self.extra.pop(number, None)
+
+    def remove(self, number):
+        """Remove a room, keeping the order of the others."""
+        position = self._positions.pop(number)
+        del self.numbers[position]
+        del self._customers[position]
+        for index in range(position, len(self.numbers)):
+            self._positions[self.numbers[index]] = index
+            self._set_available(index, self._is_set(index + 1))
+        self._set_available(len(self.numbers), False)
+        if self.extra:
+            self.extra.pop(number, None)
+
+    def available_count(self):
+        """Return how many rooms are flagged available."""
+        return sum(bin(byte).count('1') for byte in self._available)
+
+    @classmethod
+    def from_json(cls, rooms, customer_ids=None):
+        """Build a table from a ``rooms`` dict of the JSON layout, or
+        return None if a room does not fit the table."""
+        if not all(_fits_room(room) for room in rooms.values()):
+            return None
+        table = cls(customer_ids)
+        for number, room in rooms.items():
+            table.set(number, room['available'], room['customer_id'],
+                      _extra(room, ROOM_FIELDS))
+        return table
+
+    def to_json(self):
+        """Return the rooms in the JSON layout."""
+        rooms = {}
+        for number in self.numbers:
+            rooms[number] = {"available": self.is_available(number),
+                             "customer_id": self.customer(number)}
+            if self.extra and number in self.extra:
+                rooms[number].update(copy.deepcopy(self.extra[number]))
+        return rooms
+
+
+class CompactHotel:
+    """A hotel with its rooms in a ``RoomTable``."""
+    __slots__ = ('hotel_id', 'name', 'location', 'rooms', 'extra')
+
+    def __init__(self, hotel_id, name, location, rooms, extra=None):
+        self.hotel_id = _intern(hotel_id)
+        self.name = name
+        self.location = location
+        self.rooms = rooms
+        self.extra = extra
+
+    @classmethod
+    def from_json(cls, hotel_id, record, customer_ids=None):
+        """Build a hotel from its record in ``hotels.json``, or return
+        None if the record does not fit the model."""
+        if not isinstance(record, dict) or \
+                not all(field in record for field in HOTEL_FIELDS) or \
+                not isinstance(record['rooms'], dict):
+            return None
+        rooms = RoomTable.from_json(record['rooms'], customer_ids)
+        if rooms is None:
+            return None
+        return cls(hotel_id, record['name'], record['location'], rooms,
+                   _extra(record, HOTEL_FIELDS))
+
+    def to_json(self):
+        """Return the hotel record in the ``hotels.json`` layout."""
+        record = {"name": self.name, "location": self.location,
+                  "rooms": self.rooms.to_json()}
+        if self.extra:
+            record.update(copy.deepcopy(self.extra))
+        return record
+
+
+class CompactReservation:
+    """A reservation with interned IDs and dates as day ordinals.
+
+    Dates that are not in the ISO format are kept as strings.
+    """
+    __slots__ = ('reservation_id', 'customer_id', 'hotel_id', 'room_number',
+                 'start', 'end', 'extra')
+
+    def __init__(self, reservation_id, customer_id, hotel_id, room_number,
+                 start, end, extra=None):
+        self.reservation_id = _intern(reservation_id)
+        self.customer_id = _intern(customer_id)
+        self.hotel_id = _intern(hotel_id)
+        self.room_number = _intern(room_number)
+        self.start = start
+        self.end = end
+        self.extra = extra
+
+    @classmethod
+    def from_json(cls, reservation_id, record):
+        """Build a reservation from its record in ``reservations.json``,
+        or return None if the record does not fit the model."""
+        if not isinstance(record, dict) or not all(
+                isinstance(record.get(field), str)
+                for field in RESERVATION_FIELDS):
+            return None
+        return cls(reservation_id, record["customer_id"], record["hotel_id"],
+                   record["room_number"], _ordinal(record["start_date"]),
+                   _ordinal(record["end_date"]),
+                   _extra(record, RESERVATION_FIELDS))
+
+    def to_json(self):
+        """Return the reservation record in the JSON layout."""
+        record = {"customer_id": self.customer_id, "hotel_id": self.hotel_id,
+                  "room_number": self.room_number,
+                  "start_date": _iso(self.start), "end_date": _iso(self.end)}
+        if self.extra:
+            record.update(copy.deepcopy(self.extra))
+        return record
+
+
+class HotelLayout:
+    """Keeps the hotel records of a store as ``CompactHotel`` models.
+
+    The hotels of one store share a customer ID table. Records that do
+    not fit the model are kept as they are.
+    """
+
+    def __init__(self):
+        self.customer_ids = CodeTable()
+
+    def pack(self, key, record):
+        """Return the form ``record`` is kept in, sharing nothing with
+        it."""
+        model = CompactHotel.from_json(key, record, self.customer_ids)
+        return copy.deepcopy(record) if model is None else model
+
+    @staticmethod
+    def unpack(_key, value):
+        """Return a new record in the JSON layout."""
+        if isinstance(value, CompactHotel):
+            return value.to_json()
+        return copy.deepcopy(value)
+
+
+class ReservationLayout:
+    """Keeps the reservation records of a store as
+    ``CompactReservation`` models."""
+
+    @staticmethod
+    def pack(key, record):
+        """Return the form ``record`` is kept in, sharing nothing with
+        it."""
+        model = CompactReservation.from_json(key, record)
+        return copy.deepcopy(record) if model is None else model
+
+    @staticmethod
+    def unpack(_key, value):
+        """Return a new record in the JSON layout."""
+        if isinstance(value, CompactReservation):
+            return value.to_json()
+        return copy.deepcopy(value)
+
+
+# Layout classes by kind of data file.
+LAYOUTS = {
+    'hotels': HotelLayout,
+    'reservations': ReservationLayout,
+}
+
+
+def layout_for(kind):
+    """Return a new layout for the records of ``kind``, or None if they
+    are kept as parsed."""
+    layout = LAYOUTS.get(kind)
+    return None if layout is None else layout()
@@ -1,9 +1,10 @@
 # customer.py
 """This code handles customers"""
 
-import json
-import os
 import argparse
+from cache import cached
+from instrumentation import add_arguments, cli_session
+from store import get_store
 
 
 class Customer:
@@ -15,53 +16,49 @@ class Customer:
         self.name = name
         self.email = email
 
+    @staticmethod
+    def storage():
+        """Return the shared store backing the customers file."""
+        return get_store('customers', Customer.customers_file)
+
     def save(self):
         """Save the customer to the JSON file."""
-        if not os.path.isfile(Customer.customers_file):
-            with open(Customer.customers_file, 'w', encoding='utf-8') as file:
-                json.dump({}, file)
-
-        with open(Customer.customers_file, 'r+', encoding='utf-8') as file:
-            customers = json.load(file)
-            customers[self.customer_id] = {
-                "name": self.name,
-                "email": self.email
-            }
-            file.seek(0)
-            json.dump(customers, file, indent=4)
+        Customer.storage().put(self.customer_id, {
+            "name": self.name,
+            "email": self.email
+        })
 
     @staticmethod
-    def delete(customer_id):
-        """Delete a customer by ID from the JSON file."""
-        if not os.path.isfile(Customer.customers_file):
+    def delete(customer_id, mode=None):
+        """Delete a customer by ID from the JSON file.
+
+        ``mode`` can be 'restrict' or 'cascade' to check the reservations
+        that refer to the customer, see ``integrity.delete_customer``. By
+        default nothing else is checked or changed."""
+        if mode is not None:
+            # Imported here because integrity depends on this module.
+            # pylint: disable-next=import-outside-toplevel
+            from integrity import delete_customer
+            return delete_customer(customer_id, mode)
+        customers = Customer.storage()
+        if not customers.exists():
             print("Customers file not found.")
-            return
-
-        with open(Customer.customers_file, 'r+', encoding='utf-8') as file:
-            customers = json.load(file)
-            if customer_id in customers:
-                del customers[customer_id]
-                file.seek(0)
-                file.truncate()
-                json.dump(customers, file, indent=4)
-            else:
-                print("Customer not found.")
+            return False
+        if not customers.remove(customer_id):
+            print("Customer not found.")
+            return False
+        return True
 
     @staticmethod
     def get_all_customers():
         """Return all customers from the JSON file."""
-        if not os.path.isfile(Customer.customers_file):
-            return {}
-        with open(Customer.customers_file, 'r', encoding='utf-8') as file:
-            customers = json.load(file)
-        return customers
+        return Customer.storage().all()
 
     @staticmethod
     def display_info(customer_id):
         """Display information for a specific customer."""
-        customers = Customer.get_all_customers()
-        if customer_id in customers:
-            customer = customers[customer_id]
+        customer = cached(Customer.storage()).get(customer_id)
+        if customer is not None:
             print(
                 f"""Customer ID: {customer_id},
                 Name: {customer['name']},
@@ -71,8 +68,8 @@ class Customer:
             print("Customer not found.")
 
 
-def main():
-    """Main when called from terminal"""
+def build_parser():
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(description="Customer Management CLI")
     subparsers = parser.add_subparsers(dest='command')
 
@@ -87,6 +84,15 @@ def main():
     # Delete customer command
     delete_parser = subparsers.add_parser('delete', help='Delete a customer')
     delete_parser.add_argument('customer_id', type=str, help='Customer ID')
+    delete_mode = delete_parser.add_mutually_exclusive_group()
+    delete_mode.add_argument(
+        '--restrict', dest='mode', action='store_const', const='restrict',
+        help='Refuse to delete a customer that reservations refer to'
+        )
+    delete_mode.add_argument(
+        '--cascade', dest='mode', action='store_const', const='cascade',
+        help='Also delete the reservations that refer to the customer'
+        )
 
     # Display customer info command
     display_parser = subparsers.add_parser(
@@ -94,20 +100,34 @@ def main():
         )
     display_parser.add_argument('customer_id', type=str, help='Customer ID')
 
-    args = parser.parse_args()
+    add_arguments(parser, subparsers)
+    return parser
+
 
+def run(args):
+    """Run one parsed command."""
     if args.command == 'create':
         customer = Customer(args.customer_id, args.name, args.email)
         customer.save()
         print(f"Customer {args.name} created successfully.")
 
     elif args.command == 'delete':
-        Customer.delete(args.customer_id)
-        print(f"Customer {args.customer_id} deleted successfully.")
+        if Customer.delete(args.customer_id, args.mode):
+            print(f"Customer {args.customer_id} deleted successfully.")
 
     elif args.command == 'display':
         Customer.display_info(args.customer_id)
 
 
+def main(argv=None):
+    """Main when called from terminal"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'display':
+        # One lookup per process: stream the file instead of loading it.
+        Customer.storage().lazy_lookups = True
+    with cli_session(args):
+        run(args)
+
+
 if __name__ == '__main__':
     main()
@@ -2,8 +2,10 @@
 """This code handles hotels"""
 
 import json
-import os
 import argparse
+from cache import cached
+from instrumentation import add_arguments, cli_session
+from store import get_store
 
 
 class Hotel:
@@ -16,65 +18,50 @@ class Hotel:
         self.location = location
         self.rooms = rooms
 
+    @staticmethod
+    def storage():
+        """Return the shared store backing the hotels file."""
+        return get_store('hotels', Hotel.hotels_file)
+
     def save(self):
         """Save the hotel to the JSON file."""
-        hotels = {}
-        if os.path.isfile(Hotel.hotels_file):
-            with open(Hotel.hotels_file, 'r', encoding='utf-8') as file:
-                try:
-                    hotels = json.load(file)
-                except json.JSONDecodeError:
-                    print(
-                        "Warning: Existing hotels file is corrupted "
-                        "and will be overwritten."
-                        )
-        hotels[self.hotel_id] = {
+        Hotel.storage().put(self.hotel_id, {
             "name": self.name,
             "location": self.location,
             "rooms": self.rooms
-        }
-        with open(Hotel.hotels_file, 'w', encoding='utf-8') as file:
-            json.dump(hotels, file, indent=4)
+        })
 
     @staticmethod
-    def delete(hotel_id):
-        """Delete a hotel by ID from the JSON file."""
-        if not os.path.isfile(Hotel.hotels_file):
+    def delete(hotel_id, mode=None):
+        """Delete a hotel by ID from the JSON file.
+
+        ``mode`` can be 'restrict' or 'cascade' to check the reservations
+        that refer to the hotel, see ``integrity.delete_hotel``. By default
+        nothing else is checked or changed."""
+        if mode is not None:
+            # Imported here because integrity depends on this module.
+            # pylint: disable-next=import-outside-toplevel
+            from integrity import delete_hotel
+            return delete_hotel(hotel_id, mode)
+        hotels = Hotel.storage()
+        if not hotels.exists():
             print("Hotels file not found.")
-            return
-        with open(Hotel.hotels_file, 'r+', encoding='utf-8') as file:
-            try:
-                hotels = json.load(file)
-            except json.JSONDecodeError:
-                print("Error: hotels file is corrupted.")
-                return
-            if hotel_id in hotels:
-                del hotels[hotel_id]
-                file.seek(0)
-                file.truncate()
-                json.dump(hotels, file, indent=4)
-            else:
-                print("Hotel not found.")
+            return False
+        if not hotels.remove(hotel_id):
+            print("Hotel not found.")
+            return False
+        return True
 
     @staticmethod
     def get_all_hotels():
         """Return all hotels from the JSON file."""
-        if not os.path.isfile(Hotel.hotels_file):
-            return {}
-        with open(Hotel.hotels_file, 'r', encoding='utf-8') as file:
-            try:
-                hotels = json.load(file)
-            except json.JSONDecodeError:
-                print("Error: hotels file is corrupted.")
-                return {}
-        return hotels
+        return Hotel.storage().all()
 
     @staticmethod
     def display_info(hotel_id):
         """Display information for a specific hotel."""
-        hotels = Hotel.get_all_hotels()
-        if hotel_id in hotels:
-            hotel = hotels[hotel_id]
+        hotel = cached(Hotel.storage()).get(hotel_id)
+        if hotel is not None:
             print(
                 f"Hotel ID: {hotel_id}, "
                 f"Name: {hotel['name']}, "
@@ -100,8 +87,8 @@ class Hotel:
             print(f"Room {room_number} not found in hotel {self.hotel_id}.")
 
 
-def main():
-    """Main function when called from terminal"""
+def build_parser():
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(description="Hotel Management CLI")
     subparsers = parser.add_subparsers(dest='command')
 
@@ -121,6 +108,15 @@ def main():
     # Delete hotel command
     delete_parser = subparsers.add_parser('delete', help='Delete a hotel')
     delete_parser.add_argument('hotel_id', type=str, help='Hotel ID')
+    delete_mode = delete_parser.add_mutually_exclusive_group()
+    delete_mode.add_argument(
+        '--restrict', dest='mode', action='store_const', const='restrict',
+        help='Refuse to delete a hotel that reservations refer to'
+        )
+    delete_mode.add_argument(
+        '--cascade', dest='mode', action='store_const', const='cascade',
+        help='Also delete the reservations that refer to the hotel'
+        )
 
     # Display hotel info command
     display_parser = subparsers.add_parser(
@@ -129,20 +125,78 @@ def main():
         )
     display_parser.add_argument('hotel_id', type=str, help='Hotel ID')
 
-    args = parser.parse_args()
+    # Search hotels command
+    search_parser = subparsers.add_parser(
+        'search', help='Find hotels with rooms free for a date range'
+        )
+    search_parser.add_argument(
+        '--from', dest='start_date', type=str, required=True,
+        help='Start Date (YYYY-MM-DD)'
+        )
+    search_parser.add_argument(
+        '--to', dest='end_date', type=str, required=True,
+        help='End Date (YYYY-MM-DD)'
+        )
+    search_parser.add_argument(
+        '--city', type=str, help='Only hotels whose location contains this'
+        )
+    search_parser.add_argument(
+        '--workers', type=int, help='Worker processes, all cores by default'
+        )
+    search_parser.add_argument(
+        '--snapshot', type=str,
+        help='Search snapshot file to reuse between searches, '
+        '<hotels>.search.snap by default'
+        )
+    search_parser.add_argument(
+        '--limit', type=int, help='Show at most this many hotels'
+        )
+
+    add_arguments(parser, subparsers)
+    return parser
+
 
+def run(args):
+    """Run one parsed command."""
     if args.command == 'create':
         hotel = Hotel(args.hotel_id, args.name, args.location, args.rooms)
         hotel.save()
         print(f"Hotel {args.name} created successfully.")
 
     elif args.command == 'delete':
-        Hotel.delete(args.hotel_id)
-        print(f"Hotel {args.hotel_id} deleted successfully.")
+        if Hotel.delete(args.hotel_id, args.mode):
+            print(f"Hotel {args.hotel_id} deleted successfully.")
 
     elif args.command == 'display':
         Hotel.display_info(args.hotel_id)
 
+    elif args.command == 'search':
+        # Imported here because search depends on this module.
+        # pylint: disable-next=import-outside-toplevel
+        from search import search
+        try:
+            results = search(args.start_date, args.end_date, args.city,
+                             workers=args.workers,
+                             snapshot_path=args.snapshot, limit=args.limit)
+        except ValueError as error:
+            print(f"Invalid dates: {error}")
+            return
+        for hotel_id, name, location, free in results:
+            print(f"Hotel ID: {hotel_id}, Name: {name}, "
+                  f"Location: {location}, Free rooms: {', '.join(free)}")
+        if not results:
+            print("No hotels with free rooms found.")
+
+
+def main(argv=None):
+    """Main function when called from terminal"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'display':
+        # One lookup per process: stream the file instead of loading it.
+        Hotel.storage().lazy_lookups = True
+    with cli_session(args):
+        run(args)
+
 
 if __name__ == '__main__':
     main()
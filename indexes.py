@@ -0,0 +1,87 @@
+"""Secondary indexes over reservations and hotel rooms"""
+
+from store import DerivedIndex, derived
+
+
+class ReservationIndex(DerivedIndex):
+    """Reservation IDs by customer, by hotel and by room."""
+
+    def __init__(self, reservations):
+        self._by_customer = {}
+        self._by_hotel = {}
+        self._by_room = {}
+        super().__init__(reservations)
+
+    def clear(self):
+        self._by_customer = {}
+        self._by_hotel = {}
+        self._by_room = {}
+
+    def _keys(self, record):
+        return (
+            (self._by_customer, record['customer_id']),
+            (self._by_hotel, record['hotel_id']),
+            (self._by_room, (record['hotel_id'], record['room_number'])),
+        )
+
+    def add(self, key, record):
+        for index, value in self._keys(record):
+            index.setdefault(value, set()).add(key)
+
+    def discard(self, key, record):
+        for index, value in self._keys(record):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def by_customer(self, customer_id):
+        """Return the IDs of a customer's reservations."""
+        self.ensure()
+        return sorted(self._by_customer.get(customer_id, ()))
+
+    def by_hotel(self, hotel_id):
+        """Return the IDs of the reservations at a hotel."""
+        self.ensure()
+        return sorted(self._by_hotel.get(hotel_id, ()))
+
+    def by_room(self, hotel_id, room_number):
+        """Return the IDs of the reservations of one room."""
+        self.ensure()
+        return sorted(self._by_room.get((hotel_id, room_number), ()))
+
+
+class RoomAssignmentIndex(DerivedIndex):
+    """Rooms occupied by each customer, from a hotels store."""
+
+    def __init__(self, hotels):
+        self._rooms = {}
+        super().__init__(hotels)
+
+    def clear(self):
+        self._rooms = {}
+
+    def add(self, key, record):
+        for number, room in record.get('rooms', {}).items():
+            if room.get('customer_id') is not None:
+                self._rooms.setdefault(room['customer_id'], set()).add(
+                    (key, number))
+
+    def discard(self, key, record):
+        for number, room in record.get('rooms', {}).items():
+            rooms = self._rooms.get(room.get('customer_id'))
+            if rooms is not None:
+                rooms.discard((key, number))
+                if not rooms:
+                    del self._rooms[room['customer_id']]
+
+    def rooms_of(self, customer_id):
+        """Return the (hotel ID, room number) pairs held by a customer."""
+        self.ensure()
+        return sorted(self._rooms.get(customer_id, ()))
+
+
+def reservation_index(reservations):
+    """Return the shared secondary index of a reservations store."""
+    return derived(reservations, ReservationIndex)
@@ -0,0 +1,243 @@
+"""Timing, byte and call counters for the hot paths, plus CLI profiling"""
+
+import argparse
+import contextlib
+import cProfile
+import functools
+import inspect
+import io
+import pstats
+import sys
+import time
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Metric descriptions by name.
+HELP = {
+    'hotel_operation_calls_total': 'Calls of each entity operation.',
+    'hotel_operation_seconds': 'Time spent in each entity operation.',
+    'hotel_phase_seconds': 'Time spent in each storage phase.',
+    'hotel_bytes_read_total': 'Bytes read from data files.',
+    'hotel_bytes_written_total': 'Bytes written to data files.',
+    'hotel_cache_total': 'Record cache lookups by result.',
+    'hotel_cache_evictions_total': 'Records evicted from the record cache.',
+    'hotel_lock_acquired_total': 'File locks acquired.',
+    'hotel_lock_contended_total': 'File locks that had to wait for '
+                                  'another process.',
+    'hotel_lock_wait_seconds': 'Time spent waiting for file locks.',
+}
+
+
+class Metrics:
+    """Counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+
+    def clear(self):
+        """Forget every recorded value."""
+        self.counters = {}
+        self.histograms = {}
+
+    def count(self, name, value=1, **labels):
+        """Add ``value`` to a counter."""
+        if not self.enabled:
+            return
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram."""
+        if not self.enabled:
+            return
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        buckets, total, count = series.get(key, ([0] * len(BUCKETS), 0.0, 0))
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                buckets[index] += 1
+        series[key] = (buckets, total + value, count + 1)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of the block in a histogram."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Return every metric in the Prometheus text format."""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(key)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, total, count) in sorted(series.items()):
+                for bound, value in zip(BUCKETS, buckets):
+                    lines.append(
+                        f"{name}_bucket{_labels(key, le=bound)} {value}")
+                lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {total}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key, **extra):
+    items = list(key) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in items) + '}'
+
+
+metrics = Metrics()
+
+
+def phase(name):
+    """Time one storage phase, such as 'read' or 'write'."""
+    return metrics.timer('hotel_phase_seconds', phase=name)
+
+
+def instrumented(operation, function):
+    """Wrap ``function`` to count its calls and time it."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        metrics.count('hotel_operation_calls_total', operation=operation)
+        with metrics.timer('hotel_operation_seconds', operation=operation):
+            return function(*args, **kwargs)
+    wrapper.instrumented = function
+    return wrapper
+
+
+# Operations wrapped by install(), by class.
+OPERATIONS = {
+    'Hotel': ('save', 'delete', 'get_all_hotels', 'display_info',
+              'add_room', 'remove_room'),
+    'Customer': ('save', 'delete', 'get_all_customers', 'display_info'),
+    'Reservation': ('save', 'save_many', 'cancel', 'get_all_reservations'),
+}
+
+
+def _classes():
+    """Return (name, class) pairs of the classes to instrument."""
+    # pylint: disable-next=import-outside-toplevel
+    from customer import Customer
+    # pylint: disable-next=import-outside-toplevel
+    from hotel import Hotel
+    # pylint: disable-next=import-outside-toplevel
+    from reservation import Reservation
+    classes = [('Hotel', Hotel), ('Customer', Customer),
+               ('Reservation', Reservation)]
+    # Run as ``python hotel.py``, the CLI uses the copy of the class
+    # defined in __main__, not the one of the imported module.
+    script = sys.modules.get('__main__')
+    for class_name, cls in list(classes):
+        other = getattr(script, class_name, None)
+        if isinstance(other, type) and other is not cls:
+            classes.append((class_name, other))
+    return classes
+
+
+def install():
+    """Start recording metrics and wrap the entity operations."""
+    metrics.enabled = True
+    for class_name, cls in _classes():
+        for name in OPERATIONS[class_name]:
+            attribute = inspect.getattr_static(cls, name)
+            static = isinstance(attribute, staticmethod)
+            function = attribute.__func__ if static else attribute
+            if hasattr(function, 'instrumented'):
+                continue
+            wrapper = instrumented(f"{class_name}.{name}", function)
+            setattr(cls, name, staticmethod(wrapper) if static else wrapper)
+
+
+def uninstall():
+    """Stop recording metrics and restore the entity operations."""
+    metrics.enabled = False
+    for class_name, cls in _classes():
+        for name in OPERATIONS[class_name]:
+            attribute = inspect.getattr_static(cls, name)
+            static = isinstance(attribute, staticmethod)
+            function = attribute.__func__ if static else attribute
+            if hasattr(function, 'instrumented'):
+                original = function.instrumented
+                setattr(cls, name,
+                        staticmethod(original) if static else original)
+
+
+def write_metrics(path):
+    """Write the metrics in Prometheus format to ``path`` or stdout."""
+    text = metrics.render()
+    if path == '-':
+        sys.stdout.write(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+def add_arguments(parser, subparsers=None):
+    """Add the --profile and --metrics options to a CLI parser.
+
+    With ``subparsers``, every subcommand accepts them too, so they can
+    be given before or after the subcommand.
+    """
+    parsers = [(parser, None)]
+    if subparsers is not None:
+        # Subcommands must not reset options given before them.
+        parsers += [(item, argparse.SUPPRESS)
+                    for item in subparsers.choices.values()]
+    for item, default in parsers:
+        item.add_argument(
+            '--profile', type=str, metavar='FILE', default=default,
+            help='Write cProfile statistics to FILE, or - to print them'
+            )
+        item.add_argument(
+            '--metrics', type=str, metavar='FILE', default=default,
+            help='Write Prometheus metrics to FILE, or - to print them'
+            )
+
+
+@contextlib.contextmanager
+def cli_session(args):
+    """Profile and meter the block as requested by the CLI options.
+
+    Sessions can be nested, as in shell.py; metrics installed by an
+    outer session stay installed. Only one profiler can run at a time.
+    """
+    profiler = None
+    if getattr(args, 'profile', None) and sys.getprofile() is not None:
+        raise ValueError("--profile cannot be used while profiling")
+    installed = bool(getattr(args, 'metrics', None)) and not metrics.enabled
+    if installed:
+        install()
+    if getattr(args, 'profile', None):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            if args.profile == '-':
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats(
+                    'cumulative').print_stats(30)
+                sys.stdout.write(output.getvalue())
+            else:
+                profiler.dump_stats(args.profile)
+        if getattr(args, 'metrics', None):
+            write_metrics(args.metrics)
+        if installed:
+            uninstall()
@@ -0,0 +1,82 @@
+"""Referential integrity between hotels, customers and reservations"""
+
+import copy
+from customer import Customer
+from hotel import Hotel
+from indexes import RoomAssignmentIndex, reservation_index
+from reservation import Reservation
+from store import batch, derived
+
+RESTRICT = 'restrict'
+CASCADE = 'cascade'
+
+
+def _references(reservation_ids, rooms=()):
+    """Describe what still refers to a record."""
+    parts = []
+    if reservation_ids:
+        parts.append(f"reservations {', '.join(reservation_ids)}")
+    if rooms:
+        parts.append("rooms " + ', '.join(
+            f"{number} in hotel {hotel_id}" for hotel_id, number in rooms))
+    return ' and '.join(parts)
+
+
+def delete_hotel(hotel_id, mode=RESTRICT):
+    """Delete a hotel, checking the reservations that refer to it.
+
+    With ``restrict`` the hotel is kept if any reservation refers to it.
+    With ``cascade`` those reservations are deleted too. Returns True if
+    the hotel was deleted.
+    """
+    hotels = Hotel.storage()
+    reservations = Reservation.storage()
+    with batch(reservations, hotels):
+        if hotel_id not in hotels:
+            print("Hotel not found.")
+            return False
+        reservation_ids = reservation_index(reservations).by_hotel(hotel_id)
+        if reservation_ids and mode == RESTRICT:
+            print(f"Hotel {hotel_id} is referenced by "
+                  f"{_references(reservation_ids)}.")
+            return False
+        for reservation_id in reservation_ids:
+            reservations.remove(reservation_id)
+        hotels.remove(hotel_id)
+    return True
+
+
+def delete_customer(customer_id, mode=RESTRICT):
+    """Delete a customer, checking their reservations and rooms.
+
+    With ``restrict`` the customer is kept if any reservation or room
+    refers to them. With ``cascade`` their reservations are deleted and
+    their rooms are freed. Returns True if the customer was deleted.
+    """
+    customers = Customer.storage()
+    hotels = Hotel.storage()
+    reservations = Reservation.storage()
+    with batch(customers, reservations, hotels):
+        if customer_id not in customers:
+            print("Customer not found.")
+            return False
+        reservation_ids = reservation_index(reservations).by_customer(
+            customer_id)
+        rooms = derived(hotels, RoomAssignmentIndex).rooms_of(customer_id)
+        if (reservation_ids or rooms) and mode == RESTRICT:
+            print(f"Customer {customer_id} is referenced by "
+                  f"{_references(reservation_ids, rooms)}.")
+            return False
+        for reservation_id in reservation_ids:
+            reservations.remove(reservation_id)
+        changed = {}
+        for hotel_id, number in rooms:
+            hotel = changed.get(hotel_id) or copy.deepcopy(
+                hotels.get(hotel_id))
+            hotel['rooms'][number]['available'] = True
+            hotel['rooms'][number]['customer_id'] = None
+            changed[hotel_id] = hotel
+        for hotel_id, hotel in changed.items():
+            hotels.put(hotel_id, hotel)
+        customers.remove(customer_id)
+    return True
@@ -0,0 +1,141 @@
+"""Append-only journal storage backend"""
+
+import argparse
+import json
+import os
+from instrumentation import metrics, phase
+from locking import file_lock
+from store import JsonStore, DELETED, UNKNOWN
+
+
+class JournalStore(JsonStore):
+    """Store that appends each change to a journal instead of
+    rewriting the whole data file.
+
+    The data file keeps the usual JSON layout and acts as a snapshot.
+    Every put or delete is appended to ``<file>.journal`` as one JSON
+    line, and the state is rebuilt by replaying the journal over the
+    snapshot. Once the journal holds ``compact_every`` entries it is
+    folded back into the snapshot.
+    """
+    compact_every = 1000
+
+    def __init__(self, kind, path):
+        super().__init__(kind, path)
+        self.journal_path = path + '.journal'
+        self._entries = 0
+
+    def _stat(self):
+        """Return a signature covering both the snapshot and journal."""
+        signatures = []
+        for name in (self.path, self.journal_path):
+            try:
+                info = os.stat(name)
+            except FileNotFoundError:
+                signatures.append(None)
+            else:
+                signatures.append(
+                    (info.st_mtime_ns, info.st_size, info.st_ino))
+        if signatures == [None, None]:
+            return None
+        return tuple(signatures)
+
+    def _read(self):
+        """Load the snapshot and replay the journal on top of it."""
+        data = super()._read()
+        self._entries = 0
+        if not os.path.isfile(self.journal_path):
+            return data
+        with open(self.journal_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn line from an interrupted append; the entries
+                    # after it start on a new line.
+                    continue
+                apply_entry(data, entry)
+                self._entries += 1
+        return data
+
+    def _point_lookup(self, key):
+        """The journal must be replayed, so lookups need the full load."""
+        return UNKNOWN
+
+    def exists(self):
+        """Return True if the snapshot, journal or pending data exists."""
+        return os.path.isfile(self.journal_path) or super().exists()
+
+    def flush(self):
+        """Append pending changes to the journal."""
+        if not self._pending:
+            return
+        with file_lock(self.path), phase('append'):
+            self.refresh()
+            torn = self._ends_torn()
+            with open(self.journal_path, 'a', encoding='utf-8') as file:
+                if torn:
+                    file.write('\n')
+                for key, record in self._pending.items():
+                    if record is DELETED:
+                        entry = {"op": "delete", "key": key}
+                    else:
+                        entry = {"op": "put", "key": key,
+                                 "record": self._plain(key, record)}
+                    line = json.dumps(entry) + '\n'
+                    file.write(line)
+                    metrics.count('hotel_bytes_written_total', len(line),
+                                  file=self.kind)
+                    self._entries += 1
+            self._pending = {}
+            self._signature = self._stat()
+            if self._entries >= self.compact_every:
+                self.compact()
+        self._notify_saved()
+
+    def _ends_torn(self):
+        """Return True if the journal ends in the middle of a line."""
+        try:
+            with open(self.journal_path, 'rb') as file:
+                file.seek(0, os.SEEK_END)
+                if not file.tell():
+                    return False
+                file.seek(-1, os.SEEK_END)
+                return file.read(1) != b'\n'
+        except FileNotFoundError:
+            return False
+
+    def compact(self):
+        """Fold the journal into the snapshot file."""
+        with file_lock(self.path):
+            self.refresh()
+            self._write()
+            if os.path.isfile(self.journal_path):
+                os.remove(self.journal_path)
+            self._entries = 0
+            self._signature = self._stat()
+
+
+def apply_entry(data, entry):
+    """Apply one journal entry to ``data``."""
+    if entry['op'] == 'put':
+        data[entry['key']] = entry['record']
+    elif entry['op'] == 'delete':
+        data.pop(entry['key'], None)
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Journal maintenance CLI")
+    parser.add_argument(
+        'files', nargs='+', help='Data files whose journal should be compacted'
+        )
+    args = parser.parse_args()
+
+    for path in args.files:
+        JournalStore(os.path.basename(path), path).compact()
+        print(f"Compacted {path}.")
+
+
+if __name__ == '__main__':
+    main()
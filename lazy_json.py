@@ -0,0 +1,191 @@
+"""Streaming point lookups in large JSON data files"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+from locking import atomic_write
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Reader:
+    """Incrementally decoded text of a file with byte offsets.
+
+    Only the unconsumed part of the file is kept in memory.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def more(self):
+        """Read another chunk; return False at end of file."""
+        if self.eof:
+            return False
+        chunk = self._file.read(CHUNK_SIZE)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self._decoder.decode(
+            chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def consume(self, end):
+        """Move past the text up to buffer position ``end``."""
+        self.offset += len(self.buffer[self.pos:end].encode('utf-8'))
+        self.pos = end
+
+    def skip_whitespace(self):
+        """Move past whitespace and return the next character."""
+        while True:
+            self.consume(_WHITESPACE.match(self.buffer, self.pos).end())
+            if self.pos < len(self.buffer) or not self.more():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, characters):
+        """Consume the next character, which must be in ``characters``."""
+        character = self.skip_whitespace()
+        if not character or character not in characters:
+            raise ValueError(
+                f"Expected one of {characters!r} at byte {self.offset}.")
+        self.consume(self.pos + 1)
+        return character
+
+    def value(self):
+        """Decode the next JSON value; return it with its byte span."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                continue
+            if end == len(self.buffer) and self.more():
+                # A number may continue in the next chunk.
+                continue
+            start = self.offset
+            self.consume(end)
+            return value, start, self.offset - start
+
+
+def iter_items(file):
+    """Yield (key, value, offset, length) for each top-level entry of a
+    JSON object read from the binary ``file``.
+
+    ``offset`` and ``length`` give the byte span of the value.
+    """
+    reader = _Reader(file)
+    reader.expect('{')
+    if reader.skip_whitespace() == '}':
+        return
+    while True:
+        key, _, _ = reader.value()
+        reader.expect(':')
+        value, offset, length = reader.value()
+        yield key, value, offset, length
+        if reader.expect(',}') == '}':
+            return
+
+
+def index_path(path):
+    """Return the sidecar offset index kept next to a JSON data file."""
+    return path + '.idx'
+
+
+def _signature(path):
+    info = os.stat(path)
+    return [info.st_mtime_ns, info.st_size]
+
+
+def build_index(path):
+    """Write the sidecar index mapping each key to its byte span."""
+    with open(path, 'rb') as file:
+        source = _signature(path)
+        offsets = {
+            key: [offset, length]
+            for key, _, offset, length in iter_items(file)
+        }
+    atomic_write(index_path(path), lambda file: json.dump(
+        {"source": source, "offsets": offsets}, file))
+    return len(offsets)
+
+
+def _load_index(path):
+    """Return the offsets of a sidecar index matching ``path``, or None."""
+    try:
+        with open(index_path(path), 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if index.get("source") != _signature(path):
+        return None
+    return index["offsets"]
+
+
+def lookup(path, key):
+    """Return the top-level value stored under ``key`` in a JSON file,
+    or None.
+
+    A current sidecar index is used to seek straight to the value.
+    Otherwise the file is scanned one entry at a time and the scan stops
+    at the first match, so memory use does not grow with the file.
+    """
+    if not os.path.isfile(path):
+        return None
+    offsets = _load_index(path)
+    with open(path, 'rb') as file:
+        if offsets is not None:
+            if key not in offsets:
+                return None
+            offset, length = offsets[key]
+            file.seek(offset)
+            return json.loads(file.read(length))
+        for current, value, _, _ in iter_items(file):
+            if current == key:
+                return value
+    return None
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Streaming JSON lookup CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Build index command
+    index_parser = subparsers.add_parser(
+        'index', help='Build the byte-offset index of a JSON data file'
+        )
+    index_parser.add_argument('file', type=str, help='JSON data file')
+
+    # Lookup command
+    lookup_parser = subparsers.add_parser(
+        'lookup', help='Print one record of a JSON data file'
+        )
+    lookup_parser.add_argument('file', type=str, help='JSON data file')
+    lookup_parser.add_argument('key', type=str, help='Record ID')
+
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        count = build_index(args.file)
+        print(f"Indexed {count} records of {args.file}.")
+
+    elif args.command == 'lookup':
+        record = lookup(args.file, args.key)
+        if record is None:
+            print("Record not found.")
+        else:
+            print(json.dumps(record, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Cross-process file locks and atomic file writes"""
+
+import contextlib
+import os
+import stat
+import tempfile
+import time
+from instrumentation import metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# Lock contention counters for this process.
+stats = {'acquired': 0, 'contended': 0, 'wait_seconds': 0.0}
+
+_held = {}
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on ``path`` for the duration of the block.
+
+    The lock is taken on a ``<path>.lock`` file so the data file itself
+    can be replaced while locked. Locks are reentrant within a process.
+    Without ``fcntl`` the lock only guards the current process.
+    """
+    lock_path = os.path.abspath(path) + '.lock'
+    if lock_path in _held:
+        _held[lock_path] += 1
+        try:
+            yield
+        finally:
+            _held[lock_path] -= 1
+        return
+
+    name = os.path.basename(path)
+    with open(lock_path, 'a+', encoding='utf-8') as handle:
+        waited = 0.0
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                stats['contended'] += 1
+                metrics.count('hotel_lock_contended_total', file=name)
+                started = time.perf_counter()
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                waited = time.perf_counter() - started
+                stats['wait_seconds'] += waited
+        stats['acquired'] += 1
+        metrics.count('hotel_lock_acquired_total', file=name)
+        metrics.observe('hotel_lock_wait_seconds', waited, file=name)
+        _held[lock_path] = 1
+        try:
+            yield
+        finally:
+            del _held[lock_path]
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _file_mode(path):
+    """Return the permission bits for a new version of ``path``: those
+    of the existing file, or the ones ``open`` would give a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        # The umask can only be read by setting it.
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path, write, binary=False):
+    """Replace ``path`` with the data written by ``write(file)``.
+
+    The data goes to a temporary file in the same directory, which is
+    synced and renamed over ``path``, so readers see either the old or
+    the new contents and never a partial file. The file is opened in
+    binary mode if ``binary`` is true, otherwise as UTF-8 text. The
+    permissions of the existing file are kept.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        if binary:
+            file = os.fdopen(descriptor, 'wb')
+        else:
+            file = os.fdopen(descriptor, 'w', encoding='utf-8')
+        with file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,456 @@
+"""Multi-version storage backend with lock-free, consistent reads"""
+
+import argparse
+import contextlib
+import copy
+import itertools
+import json
+import os
+import shutil
+import weakref
+from locking import atomic_write, file_lock
+from serialization import read_file, write_file
+from store import DELETED, JsonStore, Observable
+
+DEFAULT_DIR = 'hotel_versions'
+KINDS = ('hotels', 'customers', 'reservations')
+
+
+class Repository:
+    """Immutable versions of the data files of one directory.
+
+    Each version lives in ``<root>/NNNNNNNN/`` and holds the data files
+    changed by one commit. ``<root>/CURRENT`` is a manifest naming the
+    file of every kind in the latest version, and is replaced atomically
+    to publish a version, so changes to several files become visible
+    together. Readers never lock: they read the manifest and then files
+    that are never modified. Writers commit under a lock on ``CURRENT``.
+    Versions older than the last ``keep_versions`` are deleted unless
+    the latest version still uses their files.
+    """
+    keep_versions = 8
+
+    def __init__(self, root):
+        self.root = root
+        self.current_path = os.path.join(root, 'CURRENT')
+        self.stores = weakref.WeakSet()
+        self._signature = None
+        self._manifest = None
+        self._pinned = None
+        self._depth = 0
+        self.changes = itertools.count()
+
+    def _read_manifest(self):
+        """Return the latest manifest, read from disk if it changed."""
+        try:
+            info = os.stat(self.current_path)
+        except FileNotFoundError:
+            return {"version": 0, "files": {}}
+        signature = (info.st_mtime_ns, info.st_size, info.st_ino)
+        if signature != self._signature:
+            try:
+                with open(self.current_path, 'r', encoding='utf-8') as file:
+                    self._manifest = json.load(file)
+            except FileNotFoundError:
+                return {"version": 0, "files": {}}
+            self._signature = signature
+        return self._manifest
+
+    def manifest(self):
+        """Return the manifest reads should use.
+
+        Inside ``pin()`` this is the pinned version, otherwise the latest
+        one.
+        """
+        if self._pinned is not None and not self._depth:
+            return self._pinned
+        return self._read_manifest()
+
+    def load(self, name):
+        """Return the records of a version file, by its manifest name."""
+        return read_file(os.path.join(self.root, name))
+
+    def _lease_path(self):
+        return os.path.join(self.root, 'readers',
+                            f"{os.getpid()}-{id(self)}.json")
+
+    def _take_lease(self):
+        """Return the latest manifest, recorded in a lease file so that
+        its version is not pruned while it is read."""
+        while True:
+            manifest = self._read_manifest()
+            if not manifest["files"]:
+                return manifest
+            os.makedirs(os.path.dirname(self._lease_path()), exist_ok=True)
+            atomic_write(self._lease_path(), lambda file: json.dump(
+                {"pid": os.getpid(), "files": manifest["files"]}, file))
+            # The version may have been pruned before the lease was taken.
+            if all(os.path.isfile(os.path.join(self.root, name))
+                   for name in manifest["files"].values()):
+                return manifest
+
+    def _leased(self):
+        """Return the version directories held by live readers."""
+        directory = os.path.join(self.root, 'readers')
+        if not os.path.isdir(directory):
+            return set()
+        used = set()
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    lease = json.load(file)
+                os.kill(lease["pid"], 0)
+            except ProcessLookupError:
+                # Left behind by a reader that died.
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                continue
+            except PermissionError:
+                pass
+            except (OSError, ValueError, KeyError):
+                continue
+            used.update(name.split('/')[0]
+                        for name in lease["files"].values())
+        return used
+
+    @contextlib.contextmanager
+    def pin(self):
+        """Read every store of the repository at one version.
+
+        Changes published during the block are not seen until it ends.
+        The version is leased, so it is not pruned before the block ends,
+        however long it takes.
+        """
+        if self._pinned is not None:
+            yield self._pinned
+            return
+        self._pinned = self._take_lease()
+        try:
+            yield self._pinned
+        finally:
+            self._pinned = None
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._lease_path())
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Lock out other writers and commit every change made in the
+        block as one version, at the outermost level.
+
+        If the block raises, its uncommitted changes are discarded.
+        """
+        with contextlib.ExitStack() as stack:
+            if not self._depth:
+                os.makedirs(self.root, exist_ok=True)
+                stack.enter_context(file_lock(self.current_path))
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    for item in self.stores:
+                        item.rollback()
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self.commit()
+
+    def commit(self):
+        """Publish the pending changes of every store as a new version.
+
+        Returns the new version number, or None if nothing was pending.
+        """
+        # In the order the stores were first changed.
+        stores = sorted((item for item in self.stores if item.pending()),
+                        key=lambda item: item.changed_at)
+        if not stores:
+            return None
+        with file_lock(self.current_path):
+            manifest = self._read_manifest()
+            version = manifest["version"] + 1
+            os.makedirs(os.path.join(self.root, f"{version:08d}"),
+                        exist_ok=True)
+            files = dict(manifest["files"])
+            written = {}
+            for item in stores:
+                data = item.merge(files.get(item.kind))
+                files[item.kind] = f"{version:08d}/{item.kind}.json"
+                write_file(os.path.join(self.root, files[item.kind]), data)
+                written[item] = data
+            atomic_write(self.current_path, lambda file: json.dump(
+                {"version": version, "files": files}, file, indent=4))
+            for item, data in written.items():
+                item.committed(files[item.kind], data)
+            self.prune(version - self.keep_versions, files)
+        return version
+
+    def prune(self, oldest, files):
+        """Delete the versions before ``oldest`` that neither ``files``
+        nor a pinned reader refers to."""
+        used = {name.split('/')[0] for name in files.values()}
+        used |= self._leased()
+        for entry in os.listdir(self.root):
+            if entry.isdigit() and int(entry) < oldest and entry not in used:
+                shutil.rmtree(os.path.join(self.root, entry),
+                              ignore_errors=True)
+
+    def versions(self):
+        """Return the version numbers kept on disk."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(entry) for entry in os.listdir(self.root)
+                      if entry.isdigit())
+
+
+_repositories = {}
+
+
+def get_repository(root):
+    """Return the shared repository for ``root``."""
+    root = os.path.abspath(root)
+    if root not in _repositories:
+        _repositories[root] = Repository(root)
+    return _repositories[root]
+
+
+def repository_root(path):
+    """Return the versions directory used for a data file."""
+    return os.environ.get('HOTEL_MVCC_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(path)), DEFAULT_DIR)
+
+
+class VersionedStore(Observable):
+    """Store reading and writing immutable versions of a data file.
+
+    It offers the same interface as ``store.JsonStore``. The stores of
+    one directory share a Repository, so a ``store.batch()`` over
+    reservations and hotels publishes both in a single version, and a
+    reader sees either none or all of its changes.
+    """
+
+    def __init__(self, kind, path, repository=None):
+        self.kind = kind
+        self.path = path
+        self.repository = repository or get_repository(repository_root(path))
+        self.repository.stores.add(self)
+        self._data = {}
+        self._file = None
+        self._loaded = False
+        self._pending = {}
+        self.changed_at = None
+
+    def version(self):
+        """Return the number of the version being read."""
+        return self.repository.manifest()["version"]
+
+    def refresh(self):
+        """Switch to the latest version of the file if it changed.
+
+        Pending changes are applied again on top of the new data.
+        """
+        for _ in range(3):
+            name = self.repository.manifest()["files"].get(self.kind)
+            if self._loaded and name == self._file:
+                return
+            try:
+                data = {} if name is None else self.repository.load(name)
+            except FileNotFoundError:
+                # The version was pruned after the manifest was read.
+                continue
+            break
+        else:
+            raise RuntimeError(f"Could not read a version of {self.kind}.")
+        for key, record in self._pending.items():
+            if record is DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = record
+        self._data = data
+        self._file = name
+        self._loaded = True
+        self._notify()
+
+    def snapshot(self):
+        """Return a context manager reading every store of the directory
+        at one version, see ``Repository.pin``."""
+        return self.repository.pin()
+
+    def exists(self):
+        """Return True if a version of the file exists or there is
+        unflushed data."""
+        return (self.kind in self.repository.manifest()["files"]
+                or bool(self._pending))
+
+    def get(self, key, default=None):
+        """Return a copy of the record stored under ``key``."""
+        self.refresh()
+        if key not in self._data:
+            return default
+        return copy.deepcopy(self._data[key])
+
+    def all(self):
+        """Return a copy of every record."""
+        self.refresh()
+        return copy.deepcopy(self._data)
+
+    def __contains__(self, key):
+        self.refresh()
+        return key in self._data
+
+    def put(self, key, record):
+        """Store ``record`` under ``key``."""
+        self.refresh()
+        record = copy.deepcopy(record)
+        old = self._data.get(key)
+        self._data[key] = record
+        self._track()
+        self._pending[key] = record
+        self._notify(key, old, record)
+        self._maybe_flush()
+
+    def remove(self, key):
+        """Remove ``key`` and return True if it was present."""
+        self.refresh()
+        if key not in self._data:
+            return False
+        old = self._data.pop(key)
+        self._track()
+        self._pending[key] = DELETED
+        self._notify(key, old, None)
+        self._maybe_flush()
+        return True
+
+    def _track(self):
+        """Note when the store first gets uncommitted changes."""
+        if not self._pending:
+            self.changed_at = next(self.repository.changes)
+
+    def _maybe_flush(self):
+        """Commit right away unless a batch is open."""
+        if not self.repository._depth:  # pylint: disable=protected-access
+            self.flush()
+
+    def pending(self):
+        """Return True if there are uncommitted changes."""
+        return bool(self._pending)
+
+    def merge(self, name):
+        """Return the records of version file ``name`` with the pending
+        changes applied."""
+        if self._loaded and name == self._file:
+            # Already loaded, with the pending changes applied.
+            return self._data
+        data = {} if name is None else self.repository.load(name)
+        for key, record in self._pending.items():
+            if record is DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = record
+        return data
+
+    def committed(self, name, data):
+        """Take ``data``, just written to version file ``name``, as the
+        current state."""
+        self._data = data
+        self._file = name
+        self._loaded = True
+        self._pending = {}
+        self._notify_saved()
+
+    def rollback(self):
+        """Discard uncommitted changes."""
+        if self._pending:
+            self._pending = {}
+            self._loaded = False
+            self._notify_saved(False)
+            self._notify()
+
+    def flush(self):
+        """Commit the pending changes of every store in the directory."""
+        with self.repository.transaction():
+            pass
+
+    @contextlib.contextmanager
+    def batch(self, scope=None):  # pylint: disable=unused-argument
+        """Group changes to the stores of the directory into one version.
+
+        Other writers are locked out for the whole block, so everything
+        read inside it is current. Readers are not blocked and see the
+        previous version until the outermost batch ends.
+        """
+        with self.repository.transaction():
+            self.refresh()
+            yield self
+
+
+def migrate(root, files):
+    """Publish JSON data files as a new version.
+
+    ``files`` maps a kind to the JSON file holding its records; missing
+    files are skipped. Returns the number of records per kind.
+    """
+    repository = get_repository(root)
+    counts = {}
+    with repository.transaction():
+        for kind, path in files.items():
+            if not os.path.isfile(path):
+                continue
+            records = JsonStore(kind, path).all()
+            store = next((item for item in repository.stores
+                          if item.kind == kind), None) or VersionedStore(
+                              kind, path, repository)
+            with store.batch():
+                for key in set(store.all()) - set(records):
+                    store.remove(key)
+                for key, record in records.items():
+                    store.put(key, record)
+            counts[kind] = len(records)
+    return counts
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Versioned storage CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Migrate JSON files command
+    migrate_parser = subparsers.add_parser(
+        'migrate', help='Publish the JSON data files as a new version'
+        )
+    migrate_parser.add_argument(
+        '--dir', type=str, default=DEFAULT_DIR, help='Versions directory'
+        )
+    for kind in KINDS:
+        migrate_parser.add_argument(
+            f'--{kind}', type=str, default=f'{kind}.json',
+            help=f'{kind.capitalize()} JSON file'
+            )
+
+    # List versions command
+    versions_parser = subparsers.add_parser(
+        'versions', help='List the versions kept on disk'
+        )
+    versions_parser.add_argument(
+        '--dir', type=str, default=DEFAULT_DIR, help='Versions directory'
+        )
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        counts = migrate(args.dir, {kind: getattr(args, kind)
+                                    for kind in KINDS})
+        for kind, count in counts.items():
+            print(f"Imported {count} {kind}.")
+
+    elif args.command == 'versions':
+        repository = get_repository(args.dir)
+        current = repository.manifest()["version"]
+        for version in repository.versions():
+            marker = ' (current)' if version == current else ''
+            print(f"Version {version}{marker}")
+
+
+if __name__ == '__main__':
+    main()
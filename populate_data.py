@@ -3,6 +3,7 @@
 
 import json
 import argparse
+from serialization import write_file
 
 # Default initial data
 default_hotels_data = {
@@ -63,8 +64,7 @@ default_reservations_data = {
 
 def create_or_update_file(file_name, data):
     """Create or update"""
-    with open(file_name, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4)
+    write_file(file_name, data)
 
 def main(hotels, customers, reservations):
     """Main entry point"""
@@ -0,0 +1,325 @@
+"""Occupancy counters kept up to date with the data, and reports on them"""
+
+import argparse
+import json
+from availability import from_ordinal, stay_range
+from hotel import Hotel
+from instrumentation import add_arguments, cli_session
+from locking import atomic_write
+from reservation import Reservation
+from snapshot import source_signature
+from store import DerivedIndex, backend_name, derived, snapshot
+
+
+class DayCounter:
+    """Numbers per day supporting range updates and range sums.
+
+    Two Fenwick trees over the day numbers are kept as sparse dicts, so
+    adding a stay and summing any range both take O(log days) no matter
+    how long the stay or the range is.
+    """
+    # Above the day number of 9999-12-31.
+    SIZE = 1 << 22
+
+    def __init__(self):
+        self._linear = {}
+        self._constant = {}
+
+    @classmethod
+    def _update(cls, tree, index, value):
+        while index < cls.SIZE:
+            tree[index] = tree.get(index, 0) + value
+            index += index & -index
+
+    @staticmethod
+    def _query(tree, index):
+        total = 0
+        while index > 0:
+            total += tree.get(index, 0)
+            index -= index & -index
+        return total
+
+    def _prefix(self, day):
+        """Return the sum of days 1 to ``day``."""
+        return (self._query(self._linear, day) * day
+                - self._query(self._constant, day))
+
+    def add(self, start, end, value=1):
+        """Add ``value`` to each day of [start, end)."""
+        self._update(self._linear, start, value)
+        self._update(self._linear, end, -value)
+        self._update(self._constant, start, value * (start - 1))
+        self._update(self._constant, end, -value * (end - 1))
+
+    def total(self, start, end):
+        """Return the sum over the days of [start, end)."""
+        return self._prefix(end - 1) - self._prefix(start - 1)
+
+    def to_json(self):
+        """Return the trees as a JSON object."""
+        return {"linear": self._linear, "constant": self._constant}
+
+    @classmethod
+    def from_json(cls, data):
+        """Build a counter from the output of ``to_json``."""
+        counter = cls()
+        counter._linear = {int(day): value
+                           for day, value in data["linear"].items()}
+        counter._constant = {int(day): value
+                             for day, value in data["constant"].items()}
+        return counter
+
+
+def cache_path(path, name):
+    """Return the cache of the ``name`` counters kept next to a data
+    file."""
+    return f"{path}.{name}.json"
+
+
+class CachedIndex(DerivedIndex):
+    """Counters saved next to the store's file when they are built.
+
+    With the json backend, later processes load them instead of reading
+    every record, as long as the file keeps the (mtime, size) they were
+    built from. Subclasses set ``NAME`` and implement ``dump`` and
+    ``load``.
+    """
+    NAME = None
+
+    def dump(self):
+        """Return the counters as JSON data."""
+        raise NotImplementedError
+
+    def load(self, data):
+        """Replace the counters with the output of ``dump``."""
+        raise NotImplementedError
+
+    def _load_cache(self, path, signature):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                cached = json.load(file)
+            if cached["source"] != list(signature):
+                return False
+            self.clear()
+            self.load(cached["data"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.clear()
+            return False
+        return True
+
+    def ensure(self):
+        """Bring the index up to date, from the cache if it is current."""
+        source = self._source()
+        source.refresh()
+        if self._built:
+            return
+        signature = source_signature(source.path)
+        cacheable = backend_name() == 'json' and signature is not None \
+            and not source.pending()
+        path = cache_path(source.path, self.NAME)
+        if cacheable and self._load_cache(path, signature):
+            self._built = True
+            return
+        super().ensure()
+        if cacheable:
+            data = {"source": list(signature), "data": self.dump()}
+            try:
+                atomic_write(path, lambda file: json.dump(data, file))
+            except OSError:
+                # The cache only saves time; a read-only directory is fine.
+                pass
+
+
+class RoomCountIndex(CachedIndex):
+    """Number of rooms and of rooms marked unavailable, per hotel."""
+    NAME = 'rooms'
+
+    def __init__(self, hotels):
+        self._counts = {}
+        super().__init__(hotels)
+
+    def clear(self):
+        self._counts = {}
+
+    def add(self, key, record):
+        rooms = record.get('rooms', {})
+        self._counts[key] = (
+            len(rooms),
+            sum(1 for room in rooms.values() if not room.get('available')))
+
+    def discard(self, key, record):
+        self._counts.pop(key, None)
+
+    def dump(self):
+        return self._counts
+
+    def load(self, data):
+        self._counts = {key: tuple(counts) for key, counts in data.items()}
+
+    def counts(self):
+        """Return (rooms, unavailable rooms) by hotel ID."""
+        self.ensure()
+        return dict(self._counts)
+
+
+class NightsIndex(CachedIndex):
+    """Booked rooms per hotel and day, built from the reservations."""
+    NAME = 'nights'
+
+    def __init__(self, reservations):
+        self._hotels = {}
+        super().__init__(reservations)
+
+    def clear(self):
+        self._hotels = {}
+
+    def _apply(self, record, value):
+        try:
+            start, end = stay_range(record['start_date'], record['end_date'])
+        except ValueError:
+            return
+        counter = self._hotels.setdefault(record['hotel_id'], DayCounter())
+        counter.add(start, end, value)
+
+    def add(self, key, record):
+        self._apply(record, 1)
+
+    def discard(self, key, record):
+        self._apply(record, -1)
+
+    def dump(self):
+        return {hotel_id: counter.to_json()
+                for hotel_id, counter in self._hotels.items()}
+
+    def load(self, data):
+        self._hotels = {hotel_id: DayCounter.from_json(counter)
+                        for hotel_id, counter in data.items()}
+
+    def nights(self, hotel_id, start, end):
+        """Return the room nights booked at a hotel within [start, end)."""
+        self.ensure()
+        counter = self._hotels.get(hotel_id)
+        return 0 if counter is None else counter.total(start, end)
+
+
+def occupancy(start_date, end_date, hotel_ids=None, adr=None):
+    """Return occupancy statistics for a date range.
+
+    Returns one dict per hotel, sorted by ID, and a dict of totals. Each
+    holds the number of rooms, the room nights available and sold, the
+    occupancy rate, the rooms marked unavailable now and, given the
+    average daily rate ``adr``, the revenue per available room (RevPAR).
+    Room nights available assume the hotel's current number of rooms.
+    """
+    start, end = stay_range(start_date, end_date)
+    rows = []
+    with snapshot(Hotel.storage(), Reservation.storage()):
+        counts = derived(Hotel.storage(), RoomCountIndex).counts()
+        nights = derived(Reservation.storage(), NightsIndex)
+        for hotel_id in sorted(counts if hotel_ids is None else hotel_ids):
+            rooms, unavailable = counts.get(hotel_id, (0, 0))
+            rows.append(_stats({
+                "hotel_id": hotel_id,
+                "rooms": rooms,
+                "unavailable": unavailable,
+                "available_nights": rooms * (end - start),
+                "sold_nights": nights.nights(hotel_id, start, end),
+            }, adr))
+    totals = _stats({
+        name: sum(row[name] for row in rows)
+        for name in ("rooms", "unavailable", "available_nights",
+                     "sold_nights")
+    }, adr)
+    return rows, totals
+
+
+def daily_occupancy(start_date, end_date, hotel_id):
+    """Return (day number, rooms booked, rooms) for each day of a range
+    at one hotel."""
+    start, end = stay_range(start_date, end_date)
+    with snapshot(Hotel.storage(), Reservation.storage()):
+        rooms, _ = derived(Hotel.storage(), RoomCountIndex).counts().get(
+            hotel_id, (0, 0))
+        nights = derived(Reservation.storage(), NightsIndex)
+        return [(day, nights.nights(hotel_id, day, day + 1), rooms)
+                for day in range(start, end)]
+
+
+def _stats(row, adr):
+    available = row["available_nights"]
+    row["occupancy"] = row["sold_nights"] / available if available else 0.0
+    if adr is not None:
+        row["revpar"] = adr * row["occupancy"]
+    return row
+
+
+def _format(row):
+    text = (f"Rooms: {row['rooms']}, Unavailable now: {row['unavailable']}, "
+            f"Room nights: {row['sold_nights']}/{row['available_nights']}, "
+            f"Occupancy: {row['occupancy']:.1%}")
+    if "revpar" in row:
+        text += f", RevPAR: {row['revpar']:.2f}"
+    return text
+
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(description="Hotel reports CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Occupancy report command
+    occupancy_parser = subparsers.add_parser(
+        'occupancy', help='Report occupancy for a date range'
+        )
+    occupancy_parser.add_argument(
+        '--from', dest='start_date', type=str, required=True,
+        help='Start Date (YYYY-MM-DD)'
+        )
+    occupancy_parser.add_argument(
+        '--to', dest='end_date', type=str, required=True,
+        help='End Date (YYYY-MM-DD), not included'
+        )
+    occupancy_parser.add_argument(
+        '--hotel', type=str, action='append',
+        help='Hotel ID, can be repeated; all hotels by default'
+        )
+    occupancy_parser.add_argument(
+        '--adr', type=float, help='Average daily rate, to compute RevPAR'
+        )
+    occupancy_parser.add_argument(
+        '--daily', action='store_true',
+        help='Also show each day of the range for every hotel'
+        )
+
+    add_arguments(parser, subparsers)
+    return parser
+
+
+def run(args):
+    """Run one parsed command."""
+    if args.command == 'occupancy':
+        try:
+            rows, totals = occupancy(
+                args.start_date, args.end_date, args.hotel, args.adr)
+        except ValueError as error:
+            print(f"Invalid dates: {error}")
+            return
+        for row in rows:
+            print(f"Hotel ID: {row['hotel_id']}, {_format(row)}")
+            if args.daily:
+                for day, booked, rooms in daily_occupancy(
+                        args.start_date, args.end_date, row['hotel_id']):
+                    print(f"  {from_ordinal(day)}: {booked}/{rooms} "
+                          "rooms booked")
+        print(f"Total, {_format(totals)}")
+
+
+def main(argv=None):
+    """Main function when called from terminal"""
+    args = build_parser().parse_args(argv)
+    with cli_session(args):
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 # reservation.py
 """This code handles reservations"""
 
-import json
-import os
 import argparse
+import copy
+import json
+from availability import RoomCalendar, index_for, stay_range
 from hotel import Hotel
+from indexes import reservation_index
+from instrumentation import add_arguments, cli_session
+from store import batch, get_store
 
 
 class Reservation:
@@ -26,92 +30,279 @@ class Reservation:
         self.start_date = start_date
         self.end_date = end_date
 
+    @staticmethod
+    def storage():
+        """Return the shared store backing the reservations file."""
+        return get_store('reservations', Reservation.reservations_file)
+
+    def to_record(self):
+        """Return the reservation in the JSON file layout."""
+        return {
+            "customer_id": self.customer_id,
+            "hotel_id": self.hotel_id,
+            "room_number": self.room_number,
+            "start_date": self.start_date,
+            "end_date": self.end_date
+        }
+
     def save(self):
         """Save the reservation to the JSON file and
-        update hotel room status."""
-        if not os.path.isfile(Reservation.reservations_file):
-            with open(
-                    Reservation.reservations_file, 'w',
-                    encoding='utf-8') as file:
-                json.dump({}, file)
-
-        with open(
-                Reservation.reservations_file,
-                'r+', encoding='utf-8'
-                ) as file:
-            reservations = json.load(file)
-            reservations[self.reservation_id] = {
-                "customer_id": self.customer_id,
-                "hotel_id": self.hotel_id,
-                "room_number": self.room_number,
-                "start_date": self.start_date,
-                "end_date": self.end_date
-            }
-            file.seek(0)
-            json.dump(reservations, file, indent=4)
-
-        with open(Hotel.hotels_file, 'r+', encoding='utf-8') as file:
-            hotels = json.load(file)
-            if (self.hotel_id in hotels
-                    and self.room_number in hotels[self.hotel_id]['rooms']):
-                hotels[self.hotel_id]['rooms'][self.room_number]['available']\
-                    = False
-                hotels[self.hotel_id]['rooms'][self.room_number]['customer_id']\
-                    = self.customer_id
-                file.seek(0)
-                file.truncate()
-                json.dump(hotels, file, indent=4)
+        update hotel room status.
+
+        Returns False without saving if the dates are invalid or the room
+        is already booked for part of the stay."""
+        failures = Reservation.save_many([self])
+        if failures:
+            print(failures[self.reservation_id])
+            return False
+        return True
+
+    @staticmethod
+    def save_many(reservations):
+        """Save several reservations with one write per file.
+
+        Every reservation is checked before anything is written: dates
+        must be valid and no room may be booked twice for the same night,
+        either by existing reservations or within the batch. If any check
+        fails nothing is saved. Returns a dict mapping each failed
+        reservation ID to its error message, empty on success.
+        """
+        reservations_store = Reservation.storage()
+        hotels = Hotel.storage()
+        scope = {reservation.hotel_id for reservation in reservations}
+        with batch(reservations_store, hotels, scope=scope):
+            index = index_for(reservations_store)
+            failures = {}
+            booked = {}
+            seen = set()
+            for reservation in reservations:
+                room = (reservation.hotel_id, reservation.room_number)
+                if reservation.reservation_id in seen:
+                    failures[reservation.reservation_id] = \
+                        "Duplicate reservation ID in batch."
+                    continue
+                seen.add(reservation.reservation_id)
+                try:
+                    start, end = stay_range(
+                        reservation.start_date, reservation.end_date)
+                except ValueError as error:
+                    failures[reservation.reservation_id] = \
+                        f"Invalid dates: {error}"
+                    continue
+                calendar = booked.setdefault(room, RoomCalendar())
+                conflict = index.conflict(
+                    *room, start, end, ignore=reservation.reservation_id)
+                if conflict is None:
+                    conflict = calendar.conflict(start, end)
+                if conflict is not None:
+                    failures[reservation.reservation_id] = (
+                        f"Room {reservation.room_number} in hotel "
+                        f"{reservation.hotel_id} is already booked by "
+                        f"reservation {conflict}."
+                        )
+                    continue
+                calendar.add(start, end, reservation.reservation_id)
+            if failures:
+                return failures
+
+            changed = {}
+            for reservation in reservations:
+                reservations_store.put(
+                    reservation.reservation_id, reservation.to_record())
+                hotel = changed.get(reservation.hotel_id) or copy.deepcopy(
+                    hotels.get(reservation.hotel_id))
+                if hotel is None or reservation.room_number not in \
+                        hotel['rooms']:
+                    continue
+                room = hotel['rooms'][reservation.room_number]
+                room['available'] = False
+                room['customer_id'] = reservation.customer_id
+                changed[reservation.hotel_id] = hotel
+            for hotel_id, hotel in changed.items():
+                hotels.put(hotel_id, hotel)
+        return {}
+
+    @staticmethod
+    def auto_assign(reservations):
+        """Choose a room for each reservation and save them.
+
+        The rooms of each reservation's hotel are considered and the
+        best fit is chosen, see ``AvailabilityIndex.best_fit``. Stays are
+        placed in order of arrival, longest first on the same day. If
+        any reservation cannot be placed nothing is saved. Returns a dict
+        mapping each failed reservation ID to its error message, empty
+        on success, when ``room_number`` is set on every reservation.
+        """
+        reservations_store = Reservation.storage()
+        hotels = Hotel.storage()
+        scope = {reservation.hotel_id for reservation in reservations}
+        with batch(reservations_store, hotels, scope=scope):
+            index = index_for(reservations_store)
+            failures = {}
+            stays = []
+            for reservation in reservations:
+                try:
+                    start, end = stay_range(
+                        reservation.start_date, reservation.end_date)
+                except ValueError as error:
+                    failures[reservation.reservation_id] = \
+                        f"Invalid dates: {error}"
+                    continue
+                stays.append((start, start - end, end, reservation))
+            planned = {}
+            # By arrival, then longest stay first.
+            for start, _, end, reservation in sorted(
+                    stays, key=lambda stay: stay[:2]):
+                hotel = hotels.get(reservation.hotel_id)
+                room_number = None if hotel is None else index.best_fit(
+                    reservation.hotel_id, hotel['rooms'], start, end,
+                    planned)
+                if room_number is None:
+                    failures[reservation.reservation_id] = (
+                        f"No room in hotel {reservation.hotel_id} is free "
+                        f"from {reservation.start_date} to "
+                        f"{reservation.end_date}."
+                        )
+                    continue
+                reservation.room_number = room_number
+                planned.setdefault(
+                    (reservation.hotel_id, room_number), RoomCalendar()).add(
+                        start, end, reservation.reservation_id)
+            if failures:
+                return failures
+            return Reservation.save_many(reservations)
 
     @staticmethod
     def cancel(reservation_id):
         """Cancel a reservation and update hotel room status."""
-        if not os.path.isfile(Reservation.reservations_file):
+        reservations = Reservation.storage()
+        hotels = Hotel.storage()
+        if not reservations.exists():
             print("Reservations file not found.")
             return False
 
-        with open(
-                Reservation.reservations_file,
-                'r+', encoding='utf-8'
-                ) as file:
-            reservations = json.load(file)
-            if reservation_id in reservations:
-                reservation = reservations.pop(reservation_id)
-                file.seek(0)
-                file.truncate()
-                json.dump(reservations, file, indent=4)
-                with open(Hotel.hotels_file, 'r+', encoding='utf-8') as file:
-                    hotels = json.load(file)
-                    hotel_id = reservation['hotel_id']
-                    room_number = reservation['room_number']
-                    if (
-                            hotel_id in hotels
-                            and room_number in hotels[hotel_id]['rooms']
-                            ):
-                        hotels[hotel_id]['rooms'][room_number]['available']\
-                            = True
-                        hotels[hotel_id]['rooms'][room_number]['customer_id']\
-                            = None
-                        file.seek(0)
-                        file.truncate()
-                        json.dump(hotels, file, indent=4)
-                return True
-            print("Reservation not found.")
-            return False
+        # Look the hotel up first, so sharded stores lock only its shard.
+        found = reservations.get(reservation_id)
+        scope = None if found is None else {found['hotel_id']}
+        with batch(reservations, hotels, scope=scope):
+            reservation = reservations.get(reservation_id)
+            if reservation is None:
+                print("Reservation not found.")
+                return False
+            reservations.remove(reservation_id)
+            # Changed on a copy, so listeners see the record as it was.
+            hotel = copy.deepcopy(hotels.get(reservation['hotel_id']))
+            room_number = reservation['room_number']
+            if hotel is not None and room_number in hotel['rooms']:
+                room = hotel['rooms'][room_number]
+                room['available'] = True
+                room['customer_id'] = None
+                hotels.put(reservation['hotel_id'], hotel)
+        return True
 
     @staticmethod
     def get_all_reservations():
         """Return all reservations from the JSON file."""
-        if not os.path.isfile(Reservation.reservations_file):
-            return {}
-        with open(
-                Reservation.reservations_file, 'r', encoding='utf-8'
-                ) as file:
-            reservations = json.load(file)
-        return reservations
+        return Reservation.storage().all()
 
+    @staticmethod
+    def _records(reservation_ids):
+        """Return the records of ``reservation_ids`` by ID."""
+        reservations = Reservation.storage()
+        return {key: reservations.get(key) for key in reservation_ids}
 
-def main():
-    """Main function when called from terminal"""
+    @staticmethod
+    def find_by_customer(customer_id):
+        """Return the reservations of a customer."""
+        return Reservation._records(
+            reservation_index(Reservation.storage()).by_customer(customer_id))
+
+    @staticmethod
+    def find_by_hotel(hotel_id):
+        """Return the reservations at a hotel."""
+        return Reservation._records(
+            reservation_index(Reservation.storage()).by_hotel(hotel_id))
+
+    @staticmethod
+    def find_by_room(hotel_id, room_number):
+        """Return the reservations of one room of a hotel."""
+        return Reservation._records(
+            reservation_index(Reservation.storage()).by_room(
+                hotel_id, room_number))
+
+    @staticmethod
+    def available_rooms(hotel_id, start_date, end_date):
+        """Return the rooms of a hotel that are free for the whole stay."""
+        hotel = Hotel.storage().get(hotel_id)
+        if hotel is None:
+            return []
+        start, end = stay_range(start_date, end_date)
+        return index_for(Reservation.storage()).free_rooms(
+            hotel_id, hotel['rooms'], start, end)
+
+
+FIELDS = ('reservation_id', 'customer_id', 'hotel_id', 'room_number',
+          'start_date', 'end_date')
+
+
+def _invalid(record, optional=()):
+    """Return an error message for an invalid reservation object, or
+    None. Fields in ``optional`` may be missing or null."""
+    if not isinstance(record, dict):
+        return "record is not a JSON object"
+    missing = [name for name in FIELDS
+               if name not in record and name not in optional]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    unknown = [name for name in record if name not in FIELDS]
+    if unknown:
+        return f"unknown {', '.join(unknown)}"
+    wrong = [name for name, value in record.items()
+             if not isinstance(value, str)
+             and not (value is None and name in optional)]
+    if wrong:
+        return f"fields must be strings: {', '.join(wrong)}"
+    return None
+
+
+def read_batch(file, optional=()):
+    """Read reservations from a JSON Lines file object.
+
+    Returns the reservations and a list of (line number, error) pairs
+    for the lines that are not reservation objects. Fields in
+    ``optional`` default to None.
+    """
+    reservations = []
+    errors = []
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            errors.append((number, f"invalid JSON: {error.msg}"))
+            continue
+        error = _invalid(record, optional)
+        if error is not None:
+            errors.append((number, error))
+            continue
+        reservations.append(Reservation(
+            **{**dict.fromkeys(optional), **record}))
+    return reservations, errors
+
+
+def _report_lines(errors):
+    """Print the bad lines of a batch file; return True if there were
+    any."""
+    for number, error in errors:
+        print(f"Line {number}: {error}")
+    if errors:
+        print("Failed to create reservations, nothing was saved.")
+    return bool(errors)
+
+
+def build_parser():
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(description="Reservation Management CLI")
     subparsers = parser.add_subparsers(dest='command')
 
@@ -140,8 +331,72 @@ def main():
         'reservation_id', type=str, help='Reservation ID'
         )
 
-    args = parser.parse_args()
+    # Room availability command
+    availability_parser = subparsers.add_parser(
+        'availability', help='List rooms free for a date range'
+        )
+    availability_parser.add_argument('hotel_id', type=str, help='Hotel ID')
+    availability_parser.add_argument(
+        'start_date', type=str, help='Start Date (YYYY-MM-DD)'
+        )
+    availability_parser.add_argument(
+        'end_date', type=str, help='End Date (YYYY-MM-DD)'
+        )
+
+    # List reservations command
+    list_parser = subparsers.add_parser(
+        'list', help='List reservations of a customer, hotel or room'
+        )
+    list_group = list_parser.add_mutually_exclusive_group(required=True)
+    list_group.add_argument('--customer', type=str, help='Customer ID')
+    list_group.add_argument('--hotel', type=str, help='Hotel ID')
+    list_parser.add_argument(
+        '--room', type=str, help='Room Number, used with --hotel'
+        )
+
+    # Batch reservation command
+    batch_parser = subparsers.add_parser(
+        'create-batch',
+        help='Create many reservations at once from a JSON Lines file'
+        )
+    batch_parser.add_argument(
+        'file', type=str,
+        help='JSON Lines file with one reservation object per line'
+        )
+
+    # Auto-assign reservation command
+    assign_parser = subparsers.add_parser(
+        'auto-assign', help='Create a reservation in the best-fitting room'
+        )
+    assign_parser.add_argument(
+        'reservation_id', type=str, help='Reservation ID'
+        )
+    assign_parser.add_argument('customer_id', type=str, help='Customer ID')
+    assign_parser.add_argument('hotel_id', type=str, help='Hotel ID')
+    assign_parser.add_argument(
+        'start_date', type=str, help='Start Date (YYYY-MM-DD)'
+        )
+    assign_parser.add_argument(
+        'end_date', type=str, help='End Date (YYYY-MM-DD)'
+        )
 
+    # Batch auto-assign command
+    assign_batch_parser = subparsers.add_parser(
+        'auto-assign-batch',
+        help='Create many reservations in the best-fitting rooms'
+        )
+    assign_batch_parser.add_argument(
+        'file', type=str,
+        help='JSON Lines file with one reservation object per line, '
+             'without room_number'
+        )
+
+    add_arguments(parser, subparsers)
+    return parser
+
+
+def run(args):
+    """Run one parsed command."""
     if args.command == 'create':
         reservation = Reservation(
             args.reservation_id,
@@ -151,8 +406,10 @@ def main():
             args.start_date,
             args.end_date
             )
-        reservation.save()
-        print(f"Reservation {args.reservation_id} created successfully.")
+        if reservation.save():
+            print(f"Reservation {args.reservation_id} created successfully.")
+        else:
+            print("Failed to create reservation.")
 
     elif args.command == 'cancel':
         success = Reservation.cancel(args.reservation_id)
@@ -161,6 +418,75 @@ def main():
         else:
             print("Failed to cancel reservation.")
 
+    elif args.command == 'list':
+        if args.customer:
+            found = Reservation.find_by_customer(args.customer)
+        elif args.room:
+            found = Reservation.find_by_room(args.hotel, args.room)
+        else:
+            found = Reservation.find_by_hotel(args.hotel)
+        for reservation_id, record in found.items():
+            print(
+                f"Reservation ID: {reservation_id}, "
+                f"Customer ID: {record['customer_id']}, "
+                f"Hotel ID: {record['hotel_id']}, "
+                f"Room: {record['room_number']}, "
+                f"From: {record['start_date']}, "
+                f"To: {record['end_date']}"
+                )
+        if not found:
+            print("No reservations found.")
+
+    elif args.command == 'create-batch':
+        with open(args.file, 'r', encoding='utf-8') as file:
+            reservations, errors = read_batch(file)
+        if _report_lines(errors):
+            return
+        failures = Reservation.save_many(reservations)
+        for reservation_id, error in failures.items():
+            print(f"{reservation_id}: {error}")
+        if failures:
+            print("Failed to create reservations, nothing was saved.")
+        else:
+            print(f"{len(reservations)} reservations created successfully.")
+
+    elif args.command in ('auto-assign', 'auto-assign-batch'):
+        if args.command == 'auto-assign':
+            reservations = [Reservation(
+                args.reservation_id, args.customer_id, args.hotel_id, None,
+                args.start_date, args.end_date)]
+        else:
+            with open(args.file, 'r', encoding='utf-8') as file:
+                reservations, errors = read_batch(file, ('room_number',))
+            if _report_lines(errors):
+                return
+        failures = Reservation.auto_assign(reservations)
+        for reservation_id, error in failures.items():
+            print(f"{reservation_id}: {error}")
+        if failures:
+            print("Failed to create reservations, nothing was saved.")
+        else:
+            for reservation in reservations:
+                print(f"Reservation {reservation.reservation_id} created "
+                      f"in room {reservation.room_number}.")
+
+    elif args.command == 'availability':
+        try:
+            rooms = Reservation.available_rooms(
+                args.hotel_id, args.start_date, args.end_date
+                )
+        except ValueError as error:
+            print(f"Invalid dates: {error}")
+            return
+        print(f"Available rooms: {', '.join(rooms) or 'none'}")
+
+
+def main(argv=None):
+    """Main function when called from terminal"""
+    args = build_parser().parse_args(argv)
+    with cli_session(args):
+        run(args)
+
 
 if __name__ == '__main__':
     main()
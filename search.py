@@ -0,0 +1,150 @@
+"""Parallel availability search across all hotels"""
+
+import concurrent.futures
+import json
+import os
+import tempfile
+from availability import RoomCalendar, stay_range
+from hotel import Hotel
+from locking import atomic_write
+from reservation import Reservation
+from snapshot import SnapshotReader, source_signature, write_snapshot
+from store import backend_name, flush_all, snapshot
+
+
+def _sources():
+    """Return the signatures of the files a search snapshot comes from."""
+    return [list(signature) if signature else None
+            for signature in map(source_signature, (
+                Hotel.hotels_file, Reservation.reservations_file))]
+
+
+def _sources_path(path):
+    return path + '.sources'
+
+
+def default_snapshot():
+    """Return the search snapshot kept next to the hotels file, or None
+    if its directory cannot be written."""
+    directory = os.path.dirname(os.path.abspath(Hotel.hotels_file))
+    if not os.access(directory, os.W_OK):
+        return None
+    return os.path.splitext(Hotel.hotels_file)[0] + '.search.snap'
+
+
+def prepare(path):
+    """Write a search snapshot of every hotel to ``path``.
+
+    Each record holds the hotel's name, location, room numbers and the
+    sorted booked [start, end) day ranges of each room.
+    """
+    sources = _sources()
+    with snapshot(Hotel.storage(), Reservation.storage()):
+        hotels = Hotel.get_all_hotels()
+        reservations = Reservation.get_all_reservations()
+    booked = {}
+    for record in reservations.values():
+        try:
+            start, end = stay_range(record['start_date'], record['end_date'])
+        except ValueError:
+            continue
+        booked.setdefault(record['hotel_id'], {}).setdefault(
+            record['room_number'], []).append([start, end])
+    data = {}
+    for hotel_id, hotel in hotels.items():
+        rooms = booked.get(hotel_id, {})
+        data[hotel_id] = {
+            "name": hotel['name'],
+            "location": hotel['location'],
+            "rooms": list(hotel['rooms']),
+            "booked": {number: sorted(ranges)
+                       for number, ranges in rooms.items()},
+        }
+    write_snapshot(path, data)
+    atomic_write(_sources_path(path), lambda file: json.dump(sources, file))
+
+
+def is_current(path):
+    """Return True if the search snapshot matches the data files."""
+    if backend_name() != 'json':
+        # Other backends keep their data outside the files checked here.
+        return False
+    try:
+        with open(_sources_path(path), 'r', encoding='utf-8') as file:
+            sources = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return os.path.isfile(path) and sources == _sources()
+
+
+def _free_rooms(record, start, end):
+    """Return the rooms of a search record free for [start, end)."""
+    free = []
+    for number in record['rooms']:
+        calendar = RoomCalendar()
+        # Ranges are sorted, so each one is added at the end.
+        for position, (first, last) in enumerate(
+                record['booked'].get(number, ())):
+            calendar.add(first, last, position)
+        if calendar.conflict(start, end) is None:
+            free.append(number)
+    return free
+
+
+def search_range(path, first, last, start, end, city=None):
+    """Search hotels ``first`` to ``last`` of a snapshot.
+
+    Returns (hotel ID, name, location, free rooms) for each hotel in
+    ``city`` with at least one free room. Runs in worker processes,
+    which read the shared snapshot through mmap.
+    """
+    city = city.lower() if city else None
+    results = []
+    with SnapshotReader(path) as reader:
+        for hotel_id, record in reader.items(first, last):
+            if city and city not in record['location'].lower():
+                continue
+            free = _free_rooms(record, start, end)
+            if free:
+                results.append(
+                    (hotel_id, record['name'], record['location'], free))
+    return results
+
+
+def search(start_date, end_date, city=None, workers=None, snapshot_path=None,
+           limit=None):
+    """Find hotels with rooms free from ``start_date`` to ``end_date``.
+
+    Hotels are split into ranges searched by a process pool. Results are
+    ranked by number of free rooms, most first. ``snapshot_path`` is the
+    search snapshot file to use, rebuilt if out of date; without it the
+    one of ``default_snapshot()`` is used, so searches between changes
+    do not rebuild it.
+    """
+    start, end = stay_range(start_date, end_date)
+    workers = workers or os.cpu_count() or 1
+    # Snapshots are checked against the files, so write pending changes.
+    flush_all()
+    with tempfile.TemporaryDirectory() as directory:
+        path = (snapshot_path or default_snapshot()
+                or os.path.join(directory, 'search.snap'))
+        if not is_current(path):
+            prepare(path)
+        with SnapshotReader(path) as reader:
+            total = len(reader)
+        if workers == 1:
+            results = search_range(path, 0, total, start, end, city)
+        else:
+            size = max(1, -(-total // (workers * 4)))
+            ranges = [(first, first + size)
+                      for first in range(0, total, size)]
+            with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                futures = [
+                    pool.submit(search_range, path, first, last, start, end,
+                                city)
+                    for first, last in ranges
+                ]
+                results = [item for future in futures
+                           for item in future.result()]
+    results.sort(key=lambda item: (-len(item[3]), item[0]))
+    return results[:limit] if limit else results
@@ -0,0 +1,185 @@
+"""Encoding of the JSON data files: layout, codec and compression"""
+
+import argparse
+import gzip
+import json
+import os
+import zlib
+from locking import atomic_write
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+STYLES = ('pretty', 'compact')
+CODECS = ('json', 'orjson')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_settings = {'style': None, 'codec': None, 'compression': None}
+
+
+def _available(codec=None, compression=None):
+    """Raise ValueError if a codec or compression cannot be used."""
+    if codec is not None and codec not in CODECS:
+        raise ValueError(f"Unknown JSON codec: {codec}")
+    if codec == 'orjson' and orjson is None:
+        raise ValueError("The orjson codec needs: pip install orjson")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression needs: pip install zstandard")
+
+
+def settings():
+    """Return the style, codec and compression used for writing.
+
+    Each comes from ``configure()``, else from the ``HOTEL_JSON_STYLE``,
+    ``HOTEL_JSON_CODEC`` and ``HOTEL_JSON_COMPRESSION`` environment
+    variables. By default files are pretty-printed, uncompressed, and
+    encoded with orjson when it is installed.
+    """
+    return {
+        'style': (_settings['style'] or os.environ.get('HOTEL_JSON_STYLE')
+                  or 'pretty'),
+        'codec': (_settings['codec'] or os.environ.get('HOTEL_JSON_CODEC')
+                  or ('orjson' if orjson is not None else 'json')),
+        'compression': (_settings['compression']
+                        or os.environ.get('HOTEL_JSON_COMPRESSION')
+                        or 'none'),
+    }
+
+
+def configure(style=None, codec=None, compression=None):
+    """Select how data files are written from now on."""
+    if style is not None and style not in STYLES:
+        raise ValueError(f"Unknown JSON style: {style}")
+    _available(codec, compression)
+    for name, value in (('style', style), ('codec', codec),
+                        ('compression', compression)):
+        if value is not None:
+            _settings[name] = value
+
+
+def dumps(data, style=None, codec=None):
+    """Return ``data`` as UTF-8 JSON bytes."""
+    current = settings()
+    style = style or current['style']
+    codec = codec or current['codec']
+    _available(codec)
+    if codec == 'orjson':
+        # Like json, write non-string keys such as room numbers as strings.
+        option = orjson.OPT_NON_STR_KEYS
+        if style == 'pretty':
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if style == 'pretty':
+        return json.dumps(data, indent=4).encode('utf-8')
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def loads(raw, codec=None):
+    """Parse UTF-8 JSON bytes."""
+    codec = codec or settings()['codec']
+    if codec == 'orjson' and orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def compress(raw, compression=None):
+    """Compress encoded bytes."""
+    compression = compression or settings()['compression']
+    _available(compression=compression)
+    if compression == 'gzip':
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(raw)
+    return raw
+
+
+def decompress(raw):
+    """Undo any compression, recognised by the leading magic bytes.
+
+    Raises ValueError if the data cannot be decompressed, and ImportError
+    if it is zstd compressed but zstandard is not installed, so that the
+    file is not mistaken for a corrupted one.
+    """
+    if raw.startswith(ZSTD_MAGIC) and zstandard is None:
+        raise ImportError("Reading zstd files needs: pip install zstandard")
+    try:
+        if raw.startswith(GZIP_MAGIC):
+            return gzip.decompress(raw)
+        if raw.startswith(ZSTD_MAGIC):
+            return zstandard.ZstdDecompressor().decompressobj().decompress(
+                raw)
+    except (OSError, EOFError, zlib.error) as error:
+        raise ValueError(f"Corrupted compressed data: {error}") from error
+    return raw
+
+
+def encode(data, style=None, codec=None, compression=None):
+    """Return ``data`` as the bytes of a data file."""
+    return compress(dumps(data, style, codec), compression)
+
+
+def decode(raw, codec=None):
+    """Return the data held in the bytes of a data file.
+
+    Raises ValueError if the bytes are not valid, possibly compressed,
+    JSON, and ImportError if they need a missing decompressor.
+    """
+    return loads(decompress(raw), codec)
+
+
+def write_file(path, data):
+    """Atomically replace ``path`` with ``data``; return the bytes
+    written."""
+    raw = encode(data)
+    atomic_write(path, lambda file: file.write(raw), binary=True)
+    return len(raw)
+
+
+def read_file(path):
+    """Return the data held in a data file."""
+    with open(path, 'rb') as file:
+        return decode(file.read())
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Data file format CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Convert file command
+    convert_parser = subparsers.add_parser(
+        'convert', help='Rewrite a data file in another format'
+        )
+    convert_parser.add_argument('file', type=str, help='Data file')
+    convert_parser.add_argument('--style', choices=STYLES, help='Layout')
+    convert_parser.add_argument('--codec', choices=CODECS, help='Encoder')
+    convert_parser.add_argument(
+        '--compression', choices=COMPRESSIONS, help='Compression'
+        )
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        try:
+            configure(args.style, args.codec, args.compression)
+            size = write_file(args.file, read_file(args.file))
+        except (OSError, ValueError, ImportError) as error:
+            print(f"Error: {error}")
+            return
+        print(f"Wrote {size} bytes to {args.file}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""Long-running HTTP/JSON booking service"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import functools
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import integrity
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+
+REASONS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    """An error answered with an HTTP status code."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _captured(operation, *args):
+    """Run ``operation`` and return its result and printed messages."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = operation(*args)
+    return result, output.getvalue().strip()
+
+
+def _required(body, *fields):
+    """Return the values of ``fields`` from a request body."""
+    if not isinstance(body, dict):
+        raise HttpError(400, "Request body must be a JSON object.")
+    missing = [name for name in fields if name not in body]
+    if missing:
+        raise HttpError(400, f"Missing fields: {', '.join(missing)}.")
+    wrong = [name for name in fields if not isinstance(body[name], str)]
+    if wrong:
+        raise HttpError(400, f"Fields must be strings: {', '.join(wrong)}.")
+    return [body[name] for name in fields]
+
+
+def _rooms(body):
+    """Return the rooms of a hotel request body, checking their shape."""
+    rooms = body.get('rooms', {})
+    if not isinstance(rooms, dict) or not all(
+            isinstance(room, dict)
+            and isinstance(room.get('available'), bool)
+            and isinstance(room.get('customer_id', ''), (str, type(None)))
+            for room in rooms.values()):
+        raise HttpError(400, "rooms must map room numbers to objects with "
+                        "a boolean 'available' and a 'customer_id'.")
+    return rooms
+
+
+def create_hotel(body):
+    """Create or replace a hotel."""
+    hotel_id, name, location = _required(body, 'hotel_id', 'name', 'location')
+    Hotel(hotel_id, name, location, _rooms(body)).save()
+    return 201, {'hotel_id': hotel_id}
+
+
+def delete_hotel(hotel_id):
+    """Delete a hotel that no reservation refers to."""
+    if hotel_id not in Hotel.storage():
+        raise HttpError(404, "Hotel not found.")
+    deleted, message = _captured(integrity.delete_hotel, hotel_id)
+    if not deleted:
+        raise HttpError(409, message)
+    return 200, {'hotel_id': hotel_id}
+
+
+def create_customer(body):
+    """Create or replace a customer."""
+    customer_id, name, email = _required(body, 'customer_id', 'name', 'email')
+    Customer(customer_id, name, email).save()
+    return 201, {'customer_id': customer_id}
+
+
+def delete_customer(customer_id):
+    """Delete a customer that no reservation or room refers to."""
+    if customer_id not in Customer.storage():
+        raise HttpError(404, "Customer not found.")
+    deleted, message = _captured(integrity.delete_customer, customer_id)
+    if not deleted:
+        raise HttpError(409, message)
+    return 200, {'customer_id': customer_id}
+
+
+def create_reservation(body):
+    """Book a room."""
+    reservation = Reservation(*_required(
+        body, 'reservation_id', 'customer_id', 'hotel_id', 'room_number',
+        'start_date', 'end_date'))
+    saved, message = _captured(reservation.save)
+    if not saved:
+        raise HttpError(409, message)
+    return 201, {'reservation_id': reservation.reservation_id}
+
+
+def cancel_reservation(reservation_id):
+    """Cancel a reservation."""
+    canceled, message = _captured(Reservation.cancel, reservation_id)
+    if not canceled:
+        raise HttpError(404, message)
+    return 200, {'reservation_id': reservation_id}
+
+
+def availability(query):
+    """List the rooms of a hotel free for a date range."""
+    try:
+        hotel_id = query['hotel_id'][0]
+        start_date, end_date = query['start_date'][0], query['end_date'][0]
+    except KeyError as error:
+        raise HttpError(400, f"Missing parameter: {error.args[0]}.") from None
+    try:
+        rooms = Reservation.available_rooms(hotel_id, start_date, end_date)
+    except ValueError as error:
+        raise HttpError(400, str(error)) from None
+    return 200, {'hotel_id': hotel_id, 'rooms': rooms}
+
+
+# Collection name to (store, not found message, create, delete).
+RESOURCES = {
+    'hotels': (
+        Hotel.storage, "Hotel not found.", create_hotel, delete_hotel),
+    'customers': (
+        Customer.storage, "Customer not found.", create_customer,
+        delete_customer),
+    'reservations': (
+        Reservation.storage, "Reservation not found.", create_reservation,
+        cancel_reservation),
+}
+
+
+class BookingServer:
+    """Serves the booking API from one process with warm data.
+
+    Writes run one at a time in a single writer thread, so the event loop
+    keeps answering reads while a write waits for the disk. Reads are
+    answered from views of the records, which the writer thread replaces
+    after each write instead of changing them. A read sees the data from
+    before or after a write, never from halfway through it. Queries that
+    need the store indexes, such as availability, run in the writer
+    thread too. The views are refreshed every ``refresh_interval``
+    seconds to pick up changes made by other processes.
+    """
+
+    def __init__(self, refresh_interval=1.0):
+        self.refresh_interval = refresh_interval
+        self._executor = None
+        self._views = {}
+        self._changed = {}
+        self._refresher = None
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening and return the bound (host, port)."""
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='writer')
+        await self._run(self._load)
+        self._refresher = asyncio.create_task(self._refresh_loop())
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop accepting requests and finish queued writes."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._refresher.cancel()
+        await self._run(lambda: None)
+        self._executor.shutdown()
+
+    async def serve_forever(self):
+        """Serve until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    def _run(self, operation, *args):
+        """Queue ``operation`` for the writer thread and return a future
+        of its result."""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, self._apply, operation, args)
+
+    def _load(self):
+        """Build the views and follow the changes of every store."""
+        for name, (storage, _, _, _) in RESOURCES.items():
+            source = storage()
+            source.add_listener(functools.partial(self._record, name))
+            self._views[name] = source.all()
+
+    def _record(self, name, key, _old, new):
+        """Note a change made in the writer thread; None marks a
+        collection to reload."""
+        if key is None or name in self._changed and \
+                self._changed[name] is None:
+            self._changed[name] = None
+        else:
+            # Listeners may be given the store's own record.
+            self._changed.setdefault(name, {})[key] = copy.deepcopy(new)
+
+    def _apply(self, operation, args):
+        """Run ``operation`` in the writer thread and publish new views."""
+        self._changed = {}
+        try:
+            return operation(*args)
+        except Exception:
+            # The changes may have been rolled back, so reload them.
+            self._changed = dict.fromkeys(self._changed)
+            raise
+        finally:
+            self._publish()
+
+    def _publish(self):
+        """Replace the views of the collections changed by the last
+        operation."""
+        views = dict(self._views)
+        for name, changes in self._changed.items():
+            if changes is None:
+                views[name] = RESOURCES[name][0]().all()
+                continue
+            records = dict(views[name])
+            for key, record in changes.items():
+                if record is None:
+                    records.pop(key, None)
+                else:
+                    records[key] = record
+            views[name] = records
+        self._changed = {}
+        self._views = views
+
+    def _refresh(self):
+        """Reload the stores changed by other processes."""
+        for storage, _, _, _ in RESOURCES.values():
+            storage().refresh()
+
+    async def _refresh_loop(self):
+        """Refresh the views periodically."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._run(self._refresh)
+            except Exception:  # pylint: disable=broad-except
+                pass  # Tried again on the next round.
+
+    async def handle(self, method, target, body):
+        """Return the (status, payload) answer to one request."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['availability'] and method == 'GET':
+            return await self._run(availability, parse_qs(url.query))
+        if not parts or parts[0] not in RESOURCES or len(parts) > 2:
+            raise HttpError(404, "Unknown resource.")
+        _, missing, create, delete = RESOURCES[parts[0]]
+        if len(parts) == 1 and method == 'POST':
+            return await self._run(create, body)
+        if len(parts) == 2 and method == 'GET':
+            record = self._views[parts[0]].get(parts[1])
+            if record is None:
+                raise HttpError(404, missing)
+            return 200, record
+        if len(parts) == 2 and method == 'DELETE':
+            return await self._run(delete, parts[1])
+        raise HttpError(405, "Method not allowed.")
+
+    async def _serve(self, reader, writer):
+        """Answer requests on one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                raw = await reader.readexactly(length) if length else b''
+                status, payload = await self._answer(method, target, raw)
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1')
+                    + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, method, target, raw):
+        """Return the status and JSON payload for a raw request."""
+        try:
+            body = json.loads(raw) if raw else None
+            return await self.handle(method, target, body)
+        except json.JSONDecodeError:
+            return 400, {'error': "Request body is not valid JSON."}
+        except HttpError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error:  # pylint: disable=broad-except
+            return 500, {'error': str(error)}
+
+
+async def _run(host, port):
+    server = BookingServer()
+    host, port = await server.start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    await server.serve_forever()
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Booking HTTP service")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host')
+    parser.add_argument('--port', type=int, default=8080, help='Port')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Storage backend that splits each data file into shards by hotel ID"""
+
+import argparse
+import contextlib
+import json
+import os
+import zlib
+from locking import atomic_write, file_lock
+from serialization import read_file, write_file
+from store import JsonStore, Observable
+
+DEFAULT_SHARDS = 16
+
+
+def shard_of(key, count):
+    """Return the shard number of ``key`` out of ``count`` shards."""
+    return zlib.crc32(key.encode('utf-8')) % count
+
+
+def shard_dir(path):
+    """Return the directory holding the shards of a data file."""
+    return os.path.splitext(path)[0] + '.shards'
+
+
+def manifest_path(path):
+    """Return the manifest listing the shards of a data file."""
+    return os.path.join(shard_dir(path), 'manifest.json')
+
+
+def routing_key(kind, key, record):
+    """Return the key that decides which shard holds a record.
+
+    Hotels and reservations are placed by hotel ID, so a hotel and its
+    reservations live in shards with the same number. Other records are
+    placed by their own key.
+    """
+    if kind == 'reservations':
+        return record['hotel_id']
+    return key
+
+
+class ShardedStore(Observable):
+    """Store that keeps a data file as several smaller JSON shards.
+
+    It offers the same interface as ``store.JsonStore``. Records are
+    placed in ``<name>.shards/shard-NN.json`` by the CRC32 of their
+    hotel ID, and ``manifest.json`` in the same directory records the
+    shard files. Every shard is a JsonStore with its own lock, so a
+    write rewrites only the owning shard, and writers of different
+    shards do not wait for each other. The shard count of a new manifest
+    is ``count``, or ``HOTEL_SHARDS`` from the environment.
+
+    Reservations are looked up by ID through ``route-NN.json`` files,
+    placed by the CRC32 of the reservation ID, which map every
+    reservation ID to its hotel ID. A lookup reads one route file and
+    the owning shard only.
+    """
+
+    def __init__(self, kind, path, count=None):
+        self.kind = kind
+        self.path = path
+        self.manifest_path = manifest_path(path)
+        manifest = self._load_manifest(count)
+        self.shards = [
+            JsonStore(kind, os.path.join(shard_dir(path), name))
+            for name in manifest['shards']
+        ]
+        for shard in self.shards:
+            shard.add_listener(self._notify)
+            shard.add_save_listener(self._on_shard_saved)
+        self.routes = []
+        self._routed = True
+        if kind == 'reservations':
+            names = manifest.get('routes') or [
+                f"route-{number:02d}.json"
+                for number in range(len(self.shards))]
+            self.routes = [
+                JsonStore('routes', os.path.join(shard_dir(path), name))
+                for name in names]
+            # Manifests written before routes existed get them built from
+            # the shards on first use.
+            self._routed = 'routes' in manifest or not os.path.isfile(
+                self.manifest_path)
+
+    def _on_shard_saved(self, saved):
+        """Report a save once no shard has unwritten changes."""
+        if not self.pending():
+            self._notify_saved(saved)
+
+    def _load_manifest(self, count):
+        """Read the manifest, or describe a new one if there is none."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            count = count or int(
+                os.environ.get('HOTEL_SHARDS') or DEFAULT_SHARDS)
+            return {
+                "kind": self.kind,
+                "scheme": "crc32",
+                "shards": [f"shard-{number:02d}.json"
+                           for number in range(count)],
+            }
+
+    def _write_manifest(self):
+        """Write the manifest listing the shard and route files."""
+        manifest = {
+            "kind": self.kind,
+            "scheme": "crc32",
+            "shards": [os.path.basename(shard.path) for shard in self.shards],
+        }
+        if self.routes:
+            manifest["routes"] = [
+                os.path.basename(route.path) for route in self.routes]
+        atomic_write(self.manifest_path, lambda file: json.dump(
+            manifest, file, indent=4))
+
+    def _ensure_manifest(self):
+        """Create the shard directory and manifest before a write."""
+        if os.path.isfile(self.manifest_path):
+            return
+        os.makedirs(shard_dir(self.path), exist_ok=True)
+        with file_lock(self.manifest_path):
+            if not os.path.isfile(self.manifest_path):
+                self._write_manifest()
+
+    def _ensure_routes(self):
+        """Build the route files of a manifest that has none."""
+        if self._routed:
+            return
+        with file_lock(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                if 'routes' not in json.load(file):
+                    with contextlib.ExitStack() as stack:
+                        for route in self.routes:
+                            stack.enter_context(route.batch())
+                        for shard in self.shards:
+                            for key, record in shard.all().items():
+                                self._route(key).put(key, record['hotel_id'])
+                    self._write_manifest()
+        self._routed = True
+
+    def _route(self, key):
+        """Return the route file that holds the hotel ID of a
+        reservation."""
+        return self.routes[shard_of(key, len(self.routes))]
+
+    def _hotel_of(self, key):
+        """Return the hotel ID a reservation is stored under, or None."""
+        self._ensure_routes()
+        return self._route(key).get(key)
+
+    @property
+    def flush_every(self):
+        """Pending writes per shard before it is flushed."""
+        return self.shards[0].flush_every
+
+    @flush_every.setter
+    def flush_every(self, value):
+        for shard in self.shards + self.routes:
+            shard.flush_every = value
+
+    @property
+    def lazy_lookups(self):
+        """Whether cold shards stream the file for single lookups."""
+        return self.shards[0].lazy_lookups
+
+    @lazy_lookups.setter
+    def lazy_lookups(self, value):
+        for shard in self.shards + self.routes:
+            shard.lazy_lookups = value
+
+    def shard_for(self, key, record=None):
+        """Return the shard that holds, or would hold, a record.
+
+        Reservations are placed by the hotel ID in ``record``; without a
+        record their hotel ID is looked up in the route files.
+        """
+        if self.kind == 'reservations' and record is None:
+            hotel_id = self._hotel_of(key)
+            if hotel_id is None:
+                return None
+            return self.shards[shard_of(hotel_id, len(self.shards))]
+        return self.shards[shard_of(
+            routing_key(self.kind, key, record), len(self.shards))]
+
+    def version(self):
+        """Return a value that changes when any shard changes on disk."""
+        return tuple(shard.version() for shard in self.shards)
+
+    def refresh(self):
+        """Reload the shards that changed on disk."""
+        for shard in self.shards:
+            shard.refresh()
+
+    def exists(self):
+        """Return True if the shards exist or there is unflushed data."""
+        return os.path.isfile(self.manifest_path) or any(
+            shard.exists() for shard in self.shards)
+
+    def get(self, key, default=None):
+        """Return the record stored under ``key``."""
+        shard = self.shard_for(key)
+        return default if shard is None else shard.get(key, default)
+
+    def all(self):
+        """Return every record of every shard."""
+        records = {}
+        for shard in self.shards:
+            records.update(shard.all())
+        return records
+
+    def __contains__(self, key):
+        shard = self.shard_for(key)
+        return shard is not None and key in shard
+
+    def put(self, key, record):
+        """Store ``record`` under ``key`` in its shard."""
+        self._ensure_manifest()
+        shard = self.shard_for(key, record)
+        if self.kind == 'reservations':
+            hotel_id = self._hotel_of(key)
+            if hotel_id != record['hotel_id']:
+                # The reservation may have moved to another hotel.
+                if hotel_id is not None:
+                    current = self.shards[shard_of(hotel_id, len(self.shards))]
+                    if current is not shard:
+                        current.remove(key)
+                self._route(key).put(key, record['hotel_id'])
+        shard.put(key, record)
+
+    def remove(self, key):
+        """Remove ``key`` and return True if it was present."""
+        shard = self.shard_for(key)
+        if shard is None:
+            return False
+        removed = shard.remove(key)
+        if self.routes:
+            self._route(key).remove(key)
+        return removed
+
+    def snapshot(self):
+        """Return a context manager for consistent reads, a no-op here."""
+        return contextlib.nullcontext(self)
+
+    def pending(self):
+        """Return True if any shard has changes not written yet."""
+        return any(shard.pending() for shard in self.shards)
+
+    def flush(self):
+        """Write the pending changes of every shard and route file."""
+        for shard in self.shards + self.routes:
+            shard.flush()
+
+    @contextlib.contextmanager
+    def batch(self, scope=None):
+        """Group several changes, flushing each shard once.
+
+        ``scope`` lists the hotel IDs the block works on. Only their
+        shards are locked, so batches on other hotels can run at the same
+        time; without it every shard and route file is locked. Route
+        changes made in a scoped block are written as they happen.
+        """
+        self._ensure_manifest()
+        if scope is None:
+            shards = self.shards + self.routes
+        else:
+            numbers = {shard_of(key, len(self.shards)) for key in scope}
+            shards = [self.shards[number] for number in sorted(numbers)]
+        with contextlib.ExitStack() as stack:
+            for shard in shards:
+                stack.enter_context(shard.batch())
+            yield self
+
+
+def split(path, kind, count=None):
+    """Move the records of a JSON data file into shards.
+
+    Returns the number of records moved. The JSON file is left in place.
+    """
+    records = read_file(path)
+    sharded = ShardedStore(kind, path, count)
+    with sharded.batch():
+        for key, record in records.items():
+            sharded.put(key, record)
+    return len(records)
+
+
+def join(path, kind):
+    """Write the records of every shard back into one JSON data file."""
+    records = ShardedStore(kind, path).all()
+    write_file(path, records)
+    return len(records)
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Sharded storage CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Split file command
+    split_parser = subparsers.add_parser(
+        'split', help='Split a JSON data file into shards'
+        )
+    split_parser.add_argument('kind', type=str, help='Kind of data')
+    split_parser.add_argument('file', type=str, help='JSON data file')
+    split_parser.add_argument(
+        '--shards', type=int, help=f'Number of shards ({DEFAULT_SHARDS})'
+        )
+
+    # Join shards command
+    join_parser = subparsers.add_parser(
+        'join', help='Join the shards of a data file into one JSON file'
+        )
+    join_parser.add_argument('kind', type=str, help='Kind of data')
+    join_parser.add_argument('file', type=str, help='JSON data file')
+
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        count = split(args.file, args.kind, args.shards)
+        print(f"Moved {count} records into {shard_dir(args.file)}.")
+
+    elif args.command == 'join':
+        count = join(args.file, args.kind)
+        print(f"Wrote {count} records to {args.file}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Interactive and batch shell over the hotel, customer, reservation and
+report commands"""
+
+import argparse
+import shlex
+import sys
+import customer
+import hotel
+import report
+import reservation
+import store
+from instrumentation import add_arguments, cli_session
+
+COMMANDS = {
+    'hotel': hotel,
+    'customer': customer,
+    'reservation': reservation,
+    'report': report,
+}
+
+
+class Shell:
+    """Runs entity commands against data kept in memory.
+
+    Each line is an entity name followed by the arguments of that
+    entity's CLI, e.g. ``reservation create R001 C001 H001 101
+    2024-01-01 2024-01-05``. Writes are flushed every ``flush_every``
+    commands and when the shell ends. The shell assumes it is the only
+    writer while it runs, since its unflushed changes are invisible to
+    other processes.
+    """
+
+    def __init__(self, flush_every=100):
+        self.flush_every = flush_every
+        self.commands_run = 0
+        self._parsers = {}
+
+    def _parser(self, name):
+        if name not in self._parsers:
+            parser = COMMANDS[name].build_parser()
+            parser.prog = name
+            self._parsers[name] = parser
+        return self._parsers[name]
+
+    def execute(self, line):
+        """Run one command line. Returns False when the shell should
+        stop."""
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return True
+        if not words:
+            return True
+        if words[0] in ('exit', 'quit'):
+            return False
+        if words[0] == 'flush':
+            store.flush_all()
+            return True
+        if words[0] not in COMMANDS:
+            print(f"Unknown command: {words[0]}. Use one of "
+                  f"{', '.join(sorted(COMMANDS))}, flush or exit.")
+            return True
+        try:
+            args = self._parser(words[0]).parse_args(words[1:])
+        except SystemExit:
+            # argparse already printed the problem.
+            return True
+        try:
+            # Per-line --profile and --metrics cover just that command.
+            with cli_session(args):
+                COMMANDS[words[0]].run(args)
+        except Exception as error:  # pylint: disable=broad-except
+            # One failed command must not end the session.
+            print(f"Error: {error}")
+            return True
+        self.commands_run += 1
+        if self.commands_run % self.flush_every == 0:
+            store.flush_all()
+        return True
+
+    def run(self, lines, prompt=None):
+        """Run commands from an iterable of lines."""
+        stores = (hotel.Hotel.storage(), customer.Customer.storage(),
+                  reservation.Reservation.storage())
+        saved = [getattr(item, 'flush_every', 1) for item in stores]
+        for item in stores:
+            item.flush_every = float('inf')
+        try:
+            if prompt:
+                print(prompt, end='', flush=True)
+            for line in lines:
+                if not self.execute(line):
+                    break
+                if prompt:
+                    print(prompt, end='', flush=True)
+        finally:
+            store.flush_all()
+            for item, value in zip(stores, saved):
+                item.flush_every = value
+
+
+def _positive_int(text):
+    """Parse a command count of at least 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {text}")
+    return value
+
+
+def main(argv=None):
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(
+        description="Run hotel, customer, reservation and report commands "
+                    "in one process"
+        )
+    parser.add_argument(
+        'script', type=str, nargs='?',
+        help='File with one command per line, stdin by default'
+        )
+    parser.add_argument(
+        '--flush-every', type=_positive_int, default=100,
+        help='Write changes to disk every N commands'
+        )
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    shell = Shell(args.flush_every)
+    with cli_session(args):
+        if args.script:
+            with open(args.script, 'r', encoding='utf-8') as file:
+                shell.run(file)
+        else:
+            shell.run(sys.stdin, '> ' if sys.stdin.isatty() else None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""Binary snapshots of the data files, read through mmap"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from locking import atomic_write
+from serialization import read_file, write_file
+
+MAGIC = b'HSNP'
+VERSION = 1
+# magic, version, record count, source mtime (ns), source size
+HEADER = struct.Struct('<4sHIqq')
+# key offset, key length, value offset, value length
+ENTRY = struct.Struct('<QIQI')
+
+
+def snapshot_path(json_path):
+    """Return the snapshot file kept next to a JSON data file."""
+    return json_path + '.snap'
+
+
+def source_signature(json_path):
+    """Return the (mtime, size) of a JSON file, or None if missing."""
+    try:
+        info = os.stat(json_path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def write_snapshot(path, data, source=None):
+    """Write ``data`` (a dict of JSON records by ID) as a snapshot.
+
+    The file holds a header, a table of fixed-width entries sorted by
+    key, and a string table with the UTF-8 keys and the compact JSON of
+    each record. ``source`` is the (mtime, size) of the JSON file the
+    data came from, used to tell whether the snapshot is still current.
+    """
+    items = sorted(
+        (str(key).encode('utf-8'),
+         json.dumps(record, separators=(',', ':')).encode('utf-8'))
+        for key, record in data.items())
+    mtime, size = source if source is not None else (-1, -1)
+    offset = HEADER.size + ENTRY.size * len(items)
+
+    def write(file):
+        file.write(HEADER.pack(MAGIC, VERSION, len(items), mtime, size))
+        position = offset
+        for key, value in items:
+            file.write(ENTRY.pack(
+                position, len(key), position + len(key), len(value)))
+            position += len(key) + len(value)
+        for key, value in items:
+            file.write(key)
+            file.write(value)
+
+    atomic_write(path, write, binary=True)
+
+
+class SnapshotReader:
+    """Read-only view of a snapshot file.
+
+    The file is memory-mapped, and a lookup is a binary search over the
+    entry table, so only the pages holding the visited entries and the
+    matching record are read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, mtime, size = HEADER.unpack_from(
+            self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a snapshot file.")
+        self.source = None if mtime < 0 else (mtime, size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, index):
+        return ENTRY.unpack_from(self._map, HEADER.size + ENTRY.size * index)
+
+    def key_at(self, index):
+        """Return the key of entry ``index`` in sorted order."""
+        key_offset, key_length, _, _ = self._entry(index)
+        return self._map[key_offset:key_offset + key_length].decode('utf-8')
+
+    def record_at(self, index):
+        """Return the record of entry ``index`` in sorted order."""
+        _, _, value_offset, value_length = self._entry(index)
+        return json.loads(self._map[value_offset:value_offset + value_length])
+
+    def find(self, key):
+        """Return the entry index of ``key``, or -1."""
+        wanted = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, _, _ = self._entry(middle)
+            current = self._map[key_offset:key_offset + key_length]
+            if current < wanted:
+                low = middle + 1
+            elif current > wanted:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def get(self, key, default=None):
+        """Return the record stored under ``key``."""
+        index = self.find(key)
+        return default if index < 0 else self.record_at(index)
+
+    def items(self, start=0, stop=None):
+        """Yield (key, record) pairs of entries ``start`` to ``stop``."""
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            yield self.key_at(index), self.record_at(index)
+
+    def to_dict(self):
+        """Return every record by key."""
+        return dict(self.items())
+
+
+def open_current(json_path):
+    """Return a reader for the snapshot of ``json_path`` if it matches
+    the JSON file's current contents, else None."""
+    path = snapshot_path(json_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        reader = SnapshotReader(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if reader.source is None or reader.source != source_signature(json_path):
+        reader.close()
+        return None
+    return reader
+
+
+def to_binary(json_path, path=None):
+    """Convert a JSON data file to a snapshot and return its path."""
+    path = path or snapshot_path(json_path)
+    source = source_signature(json_path)
+    write_snapshot(path, read_file(json_path), source)
+    return path
+
+
+def to_json(path, json_path):
+    """Convert a snapshot back to a JSON data file."""
+    with SnapshotReader(path) as reader:
+        data = reader.to_dict()
+    write_file(json_path, data)
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="Binary snapshot CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # JSON to snapshot command
+    binary_parser = subparsers.add_parser(
+        'to-binary', help='Convert a JSON data file to a snapshot'
+        )
+    binary_parser.add_argument('json_file', type=str, help='JSON data file')
+    binary_parser.add_argument(
+        'snapshot_file', type=str, nargs='?',
+        help='Snapshot file, <json_file>.snap by default'
+        )
+
+    # Snapshot to JSON command
+    json_parser = subparsers.add_parser(
+        'to-json', help='Convert a snapshot to a JSON data file'
+        )
+    json_parser.add_argument('snapshot_file', type=str, help='Snapshot file')
+    json_parser.add_argument('json_file', type=str, help='JSON data file')
+
+    args = parser.parse_args()
+
+    if args.command == 'to-binary':
+        path = to_binary(args.json_file, args.snapshot_file)
+        print(f"Snapshot written to {path}.")
+
+    elif args.command == 'to-json':
+        to_json(args.snapshot_file, args.json_file)
+        print(f"JSON written to {args.json_file}.")
+
+
+if __name__ == '__main__':
+    main()
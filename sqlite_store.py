@@ -0,0 +1,489 @@
+"""SQLite storage backend for hotels, customers and reservations"""
+
+import argparse
+import contextlib
+import os
+import sqlite3
+import weakref
+from availability import (AvailabilityIndex, RoomCalendar, from_ordinal,
+                          stay_range)
+from indexes import ReservationIndex, RoomAssignmentIndex
+from store import JsonStore, Observable
+
+DEFAULT_DB = 'hotel_system.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hotels (
+    hotel_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    hotel_id TEXT NOT NULL,
+    room_number TEXT NOT NULL,
+    available INTEGER NOT NULL,
+    customer_id TEXT,
+    PRIMARY KEY (hotel_id, room_number)
+);
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    reservation_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    hotel_id TEXT NOT NULL,
+    room_number TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rooms_customer
+    ON rooms (customer_id);
+CREATE INDEX IF NOT EXISTS reservations_customer
+    ON reservations (customer_id);
+CREATE INDEX IF NOT EXISTS reservations_hotel
+    ON reservations (hotel_id);
+CREATE INDEX IF NOT EXISTS reservations_room_dates
+    ON reservations (hotel_id, room_number, start_date, end_date);
+"""
+
+
+class Database:
+    """One SQLite connection shared by the stores of a directory."""
+
+    def __init__(self, path):
+        self.path = path
+        # Transactions are begun explicitly, see transaction(). The
+        # connection may move to another thread, such as the writer
+        # thread of server.py, but is never used by two at once.
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.stores = weakref.WeakSet()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the block in one transaction, committed at the outermost
+        level.
+
+        The transaction takes the write lock when it begins, so other
+        processes cannot write between the checks made in the block and
+        its writes. The stores of the database are told when their
+        changes are committed or rolled back.
+        """
+        if self._depth == 0:
+            self.connection.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield self.connection
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.connection.execute("ROLLBACK")
+                self._saved(False)
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.connection.execute("COMMIT")
+            self._saved(True)
+
+    def _saved(self, saved):
+        # Same order as store.batch() flushes JSON stores, so listeners
+        # such as change feeds see the same order on every backend.
+        for item in sorted(self.stores, key=lambda item: os.path.abspath(
+                item.path), reverse=True):
+            item._notify_saved(saved)  # pylint: disable=protected-access
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+
+_databases = {}
+
+
+def get_database(path):
+    """Return the shared database for ``path``."""
+    path = os.path.abspath(path)
+    if path not in _databases:
+        _databases[path] = Database(path)
+    return _databases[path]
+
+
+class SqliteStore(Observable):
+    """Store backed by indexed SQLite tables instead of a JSON file.
+
+    It offers the same interface as ``store.JsonStore``. ``kind`` picks
+    the table, and the database lives next to the JSON file it replaces.
+    """
+
+    def __init__(self, kind, path):
+        self.kind = kind
+        self.path = path
+        db_path = os.environ.get('HOTEL_SQLITE_DB') or os.path.join(
+            os.path.dirname(os.path.abspath(path)), DEFAULT_DB)
+        self.database = get_database(db_path)
+        self.database.stores.add(self)
+        self._table = TABLES[kind]
+        self._data_version = self._current_version()
+
+    def _current_version(self):
+        """Return SQLite's counter of commits made by other connections."""
+        return self.database.connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+
+    def version(self):
+        """Return a value that changes when another process commits."""
+        return self._current_version()
+
+    def refresh(self):
+        """Tell listeners to rebuild if another process changed the
+        database."""
+        version = self._current_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._notify()
+
+    def exists(self):
+        """Return True if the backing database file exists."""
+        return os.path.isfile(self.database.path)
+
+    def get(self, key, default=None):
+        """Return the record stored under ``key``."""
+        record = self._table.get(self.database.connection, key)
+        return default if record is None else record
+
+    def all(self):
+        """Return every record in the table."""
+        return self._table.all(self.database.connection)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def put(self, key, record):
+        """Insert or replace the record stored under ``key``."""
+        with self.database.transaction() as connection:
+            old = self._table.get(connection, key)
+            self._table.put(connection, key, record)
+            self._notify(key, old, record)
+
+    def remove(self, key):
+        """Remove ``key`` and return True if it was present."""
+        with self.database.transaction() as connection:
+            old = self._table.get(connection, key)
+            removed = self._table.remove(connection, key)
+            if removed:
+                self._notify(key, old, None)
+        return removed
+
+    def where(self, **values):
+        """Return the records whose columns equal ``values``, by key.
+
+        The lookup uses the indexes of the table, see ``SCHEMA``.
+        """
+        return self._table.where(self.database.connection, values)
+
+    def bookings(self, hotel_id, room_number, start_date=None,
+                 end_date=None):
+        """Return the reservations of one room, by ID.
+
+        With dates, only those overlapping [start_date, end_date) are
+        returned. Uses the ``reservations_room_dates`` index.
+        """
+        query = ("SELECT reservation_id, customer_id, start_date, end_date "
+                 "FROM reservations WHERE hotel_id = ? AND room_number = ?")
+        parameters = [hotel_id, room_number]
+        if start_date is not None:
+            query += " AND start_date < ? AND end_date > ?"
+            parameters += [end_date, start_date]
+        return {
+            key: {"customer_id": customer_id, "hotel_id": hotel_id,
+                  "room_number": room_number, "start_date": start,
+                  "end_date": end}
+            for key, customer_id, start, end in
+            self.database.connection.execute(query, parameters)
+        }
+
+    def index(self, index_class):
+        """Return a version of ``index_class`` answered by queries on the
+        table, or None, see ``store.derived``."""
+        kind, index = INDEXES.get(index_class, (None, None))
+        if kind != self.kind:
+            return None
+        return index(self)
+
+    def snapshot(self):
+        """Return a context manager for consistent reads, a no-op here."""
+        return contextlib.nullcontext(self)
+
+    def flush(self):
+        """Changes are committed as they happen."""
+
+    @contextlib.contextmanager
+    def batch(self, scope=None):  # pylint: disable=unused-argument
+        """Group several changes into one transaction."""
+        try:
+            with self.database.transaction():
+                yield self
+        except BaseException:
+            # Listeners saw changes that were rolled back.
+            self._notify()
+            raise
+
+
+class HotelTable:
+    """Hotels and their rooms."""
+
+    @staticmethod
+    def _rooms(connection, hotel_id):
+        rows = connection.execute(
+            "SELECT room_number, available, customer_id FROM rooms "
+            "WHERE hotel_id = ?", (hotel_id,))
+        return {
+            number: {"available": bool(available), "customer_id": customer}
+            for number, available, customer in rows
+        }
+
+    @staticmethod
+    def get(connection, key):
+        """Return one hotel with its rooms."""
+        row = connection.execute(
+            "SELECT name, location FROM hotels WHERE hotel_id = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "location": row[1],
+                "rooms": HotelTable._rooms(connection, key)}
+
+    @staticmethod
+    def all(connection):
+        """Return every hotel with its rooms."""
+        hotels = {
+            hotel_id: {"name": name, "location": location, "rooms": {}}
+            for hotel_id, name, location in connection.execute(
+                "SELECT hotel_id, name, location FROM hotels")
+        }
+        for hotel_id, number, available, customer in connection.execute(
+                "SELECT hotel_id, room_number, available, customer_id "
+                "FROM rooms"):
+            if hotel_id in hotels:
+                hotels[hotel_id]["rooms"][number] = {
+                    "available": bool(available), "customer_id": customer}
+        return hotels
+
+    @staticmethod
+    def put(connection, key, record):
+        """Insert or replace a hotel and its rooms."""
+        connection.execute(
+            "INSERT OR REPLACE INTO hotels VALUES (?, ?, ?)",
+            (key, record["name"], record["location"]))
+        connection.execute("DELETE FROM rooms WHERE hotel_id = ?", (key,))
+        connection.executemany(
+            "INSERT INTO rooms VALUES (?, ?, ?, ?)",
+            [(key, number, int(room.get("available", True)),
+              room.get("customer_id"))
+             for number, room in record.get("rooms", {}).items()])
+
+    @staticmethod
+    def remove(connection, key):
+        """Delete a hotel and its rooms."""
+        connection.execute("DELETE FROM rooms WHERE hotel_id = ?", (key,))
+        cursor = connection.execute(
+            "DELETE FROM hotels WHERE hotel_id = ?", (key,))
+        return cursor.rowcount > 0
+
+
+class FlatTable:
+    """A table with one row per record and no nested data."""
+
+    def __init__(self, table, key_column, columns):
+        self.table = table
+        self.key_column = key_column
+        self.columns = columns
+
+    def get(self, connection, key):
+        """Return one record."""
+        row = connection.execute(
+            f"SELECT {', '.join(self.columns)} FROM {self.table} "
+            f"WHERE {self.key_column} = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(self.columns, row))
+
+    def all(self, connection):
+        """Return every record."""
+        rows = connection.execute(
+            f"SELECT {self.key_column}, {', '.join(self.columns)} "
+            f"FROM {self.table}")
+        return {row[0]: dict(zip(self.columns, row[1:])) for row in rows}
+
+    def where(self, connection, values):
+        """Return the records whose columns equal ``values``, by key."""
+        unknown = set(values) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        condition = ' AND '.join(f"{column} = ?" for column in values)
+        rows = connection.execute(
+            f"SELECT {self.key_column}, {', '.join(self.columns)} "
+            f"FROM {self.table} WHERE {condition} "
+            f"ORDER BY {self.key_column}", list(values.values()))
+        return {row[0]: dict(zip(self.columns, row[1:])) for row in rows}
+
+    def put(self, connection, key, record):
+        """Insert or replace one record."""
+        placeholders = ', '.join('?' * (len(self.columns) + 1))
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} "
+            f"({self.key_column}, {', '.join(self.columns)}) "
+            f"VALUES ({placeholders})",
+            [key] + [record[column] for column in self.columns])
+
+    def remove(self, connection, key):
+        """Delete one record."""
+        cursor = connection.execute(
+            f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,))
+        return cursor.rowcount > 0
+
+
+TABLES = {
+    'hotels': HotelTable,
+    'customers': FlatTable('customers', 'customer_id', ('name', 'email')),
+    'reservations': FlatTable(
+        'reservations', 'reservation_id',
+        ('customer_id', 'hotel_id', 'room_number', 'start_date', 'end_date')),
+}
+
+
+class SqlReservationIndex:
+    """``indexes.ReservationIndex`` answered by indexed queries."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def by_customer(self, customer_id):
+        """Return the IDs of a customer's reservations."""
+        return list(self._store.where(customer_id=customer_id))
+
+    def by_hotel(self, hotel_id):
+        """Return the IDs of the reservations at a hotel."""
+        return list(self._store.where(hotel_id=hotel_id))
+
+    def by_room(self, hotel_id, room_number):
+        """Return the IDs of the reservations of one room."""
+        return sorted(self._store.bookings(hotel_id, room_number))
+
+
+class SqlAvailabilityIndex(AvailabilityIndex):
+    """``availability.AvailabilityIndex`` answered by indexed queries.
+
+    Only the bookings of the rooms asked about are read.
+    """
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(self, store):
+        self._store = store
+
+    def ensure(self):
+        """Queries always read the current data."""
+
+    def _room_calendar(self, hotel_id, room_number, start=None, end=None):
+        dates = () if start is None else (from_ordinal(start),
+                                          from_ordinal(end))
+        calendar = RoomCalendar()
+        for key, record in self._store.bookings(
+                hotel_id, room_number, *dates).items():
+            try:
+                calendar.add(*stay_range(
+                    record['start_date'], record['end_date']), key)
+            except ValueError:
+                continue
+        return calendar
+
+    def conflict(self, hotel_id, room_number, start, end, ignore=None):
+        """Return the ID of a reservation overlapping the stay, or None."""
+        return self._room_calendar(
+            hotel_id, room_number, start, end).conflict(start, end, ignore)
+
+
+class SqlRoomAssignmentIndex:
+    """``indexes.RoomAssignmentIndex`` answered by indexed queries."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def rooms_of(self, customer_id):
+        """Return the (hotel ID, room number) pairs held by a customer.
+
+        Uses the ``rooms_customer`` index.
+        """
+        return self._store.database.connection.execute(
+            "SELECT hotel_id, room_number FROM rooms WHERE customer_id = ? "
+            "ORDER BY hotel_id, room_number", (customer_id,)).fetchall()
+
+
+# Indexes answered by SQL queries, by the index class they replace, as
+# (kind of store, class).
+INDEXES = {
+    ReservationIndex: ('reservations', SqlReservationIndex),
+    AvailabilityIndex: ('reservations', SqlAvailabilityIndex),
+    RoomAssignmentIndex: ('hotels', SqlRoomAssignmentIndex),
+}
+
+
+def migrate(db_path, files):
+    """Import JSON data files into the database.
+
+    ``files`` maps a kind ('hotels', 'customers', 'reservations') to the
+    JSON file holding its records. Returns the number of records per kind.
+    """
+    database = get_database(db_path)
+    counts = {}
+    with database.transaction() as connection:
+        for kind, path in files.items():
+            records = JsonStore(kind, path).all()
+            for key, record in records.items():
+                TABLES[kind].put(connection, key, record)
+            counts[kind] = len(records)
+    return counts
+
+
+def main():
+    """Main function when called from terminal"""
+    parser = argparse.ArgumentParser(description="SQLite storage CLI")
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Migrate JSON files command
+    migrate_parser = subparsers.add_parser(
+        'migrate', help='Import the JSON data files into SQLite'
+        )
+    migrate_parser.add_argument(
+        '--db', type=str, default=DEFAULT_DB, help='SQLite database file'
+        )
+    migrate_parser.add_argument(
+        '--hotels', type=str, default='hotels.json', help='Hotels JSON file'
+        )
+    migrate_parser.add_argument(
+        '--customers', type=str, default='customers.json',
+        help='Customers JSON file'
+        )
+    migrate_parser.add_argument(
+        '--reservations', type=str, default='reservations.json',
+        help='Reservations JSON file'
+        )
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        counts = migrate(args.db, {
+            'hotels': args.hotels,
+            'customers': args.customers,
+            'reservations': args.reservations,
+        })
+        for kind, count in counts.items():
+            print(f"Imported {count} {kind}.")
+
+
+if __name__ == '__main__':
+    main()
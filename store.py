@@ -0,0 +1,458 @@
+"""Shared, cached storage for the hotel, customer and reservation files"""
+
+import atexit
+import contextlib
+import copy
+import importlib
+import os
+import weakref
+from locking import file_lock
+from compact import layout_for
+from instrumentation import metrics, phase
+from lazy_json import lookup
+from serialization import decode, write_file
+from snapshot import open_current
+
+DELETED = object()
+UNKNOWN = object()
+
+
+class Observable:
+    """Change notifications for stores.
+
+    Listeners are called as ``listener(key, old, new)`` after a record
+    changes, with ``None`` for a missing side. They are called as
+    ``listener(None, None, None)`` when the whole dataset was reloaded and
+    anything derived from it must be rebuilt.
+
+    Save listeners are called as ``listener(True)`` once the changes
+    reported so far are written to disk, and as ``listener(False)`` if
+    they were discarded instead.
+    """
+
+    def add_listener(self, listener):
+        """Call ``listener`` on every change to this store."""
+        self.__dict__.setdefault('_listeners', []).append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling ``listener``."""
+        self.__dict__.get('_listeners', []).remove(listener)
+
+    def _notify(self, key=None, old=None, new=None):
+        """Tell every listener about a change."""
+        for listener in self.__dict__.get('_listeners', ()):
+            listener(key, old, new)
+
+    def add_save_listener(self, listener):
+        """Call ``listener`` whenever changes are saved or discarded."""
+        self.__dict__.setdefault('_save_listeners', []).append(listener)
+
+    def _notify_saved(self, saved=True):
+        """Tell every save listener that changes were saved or
+        discarded."""
+        for listener in self.__dict__.get('_save_listeners', ()):
+            listener(saved)
+
+
+class DerivedIndex:
+    """Data derived from a store and kept in sync with its changes.
+
+    The index is built from the whole store on first use and after a
+    reload, and is updated incrementally on every other change.
+    Subclasses implement ``clear``, ``add`` and ``discard``.
+    """
+
+    def __init__(self, source):
+        self._source = weakref.ref(source)
+        self._built = False
+        source.add_listener(self._on_change)
+
+    def clear(self):
+        """Forget all derived data."""
+        raise NotImplementedError
+
+    def add(self, key, record):
+        """Account for a record."""
+        raise NotImplementedError
+
+    def discard(self, key, record):
+        """Stop accounting for a record."""
+        raise NotImplementedError
+
+    def _on_change(self, key, old, new):
+        if key is None:
+            self._built = False
+            return
+        if not self._built:
+            return
+        if old is not None:
+            self.discard(key, old)
+        if new is not None:
+            self.add(key, new)
+
+    def ensure(self):
+        """Bring the index up to date with the store."""
+        source = self._source()
+        source.refresh()
+        if not self._built:
+            self.clear()
+            for key, record in source.all().items():
+                self.add(key, record)
+            self._built = True
+
+
+class JsonStore(Observable):
+    """In-memory view of one JSON data file.
+
+    The file is parsed once and kept in memory. It is parsed again only
+    when its modification time, size or inode changes on disk. Changes are
+    kept as pending writes and flushed once ``flush_every`` of them are
+    pending, checked after each change outside a batch and when the
+    outermost ``batch()`` block ends.
+
+    Flushes and batches hold a cross-process lock on the file. A flush
+    first merges the pending writes into the latest file contents and
+    then replaces the file atomically.
+
+    With ``compact_models``, or ``HOTEL_COMPACT_MODELS`` set in the
+    environment, when the store is created, hotels and reservations are
+    kept in memory as the compact models of compact.py and converted
+    back to dicts when they are read.
+    """
+    flush_every = 1
+    # Answer lookups on a cold store by streaming the file instead of
+    # loading it. Useful for processes that only look up a few records.
+    lazy_lookups = False
+    compact_models = False
+
+    def __init__(self, kind, path):
+        self.kind = kind
+        self.path = path
+        self._layout = None
+        if self.compact_models or os.environ.get('HOTEL_COMPACT_MODELS'):
+            self._layout = layout_for(kind)
+        self._data = {}
+        self._loaded = False
+        self._signature = None
+        self._pending = {}
+        self._batch_depth = 0
+        self._snapshot = None
+
+    def _stat(self):
+        """Return a (mtime, size, inode) signature of the file, or None."""
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+    def version(self):
+        """Return a value that changes when the data changes on disk."""
+        return self._stat()
+
+    def _read(self):
+        """Parse the file from disk."""
+        if not os.path.isfile(self.path):
+            return {}
+        with phase('read'):
+            with open(self.path, 'rb') as file:
+                raw = file.read()
+            metrics.count('hotel_bytes_read_total', len(raw), file=self.kind)
+            try:
+                return decode(raw)
+            except ValueError:
+                print(f"Error: {self.kind} file is corrupted.")
+                return {}
+
+    def _write(self):
+        """Write the cached data back to the file."""
+        data = self._data
+        if self._layout is not None:
+            data = {key: self._layout.unpack(key, value)
+                    for key, value in data.items()}
+        with phase('write'):
+            size = write_file(self.path, data)
+        metrics.count('hotel_bytes_written_total', size, file=self.kind)
+
+    def refresh(self):
+        """Reload the file if it changed on disk since it was last read.
+
+        Pending writes that were not flushed yet are applied again on top
+        of the reloaded data.
+        """
+        signature = self._stat()
+        if self._loaded and signature == self._signature:
+            return
+        self._data = self._read()
+        if self._layout is not None:
+            self._data = {key: self._layout.pack(key, record)
+                          for key, record in self._data.items()}
+        self._signature = signature
+        self._loaded = True
+        for key, record in self._pending.items():
+            if record is DELETED:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = record
+        self._notify()
+
+    def exists(self):
+        """Return True if the file exists or there is unflushed data."""
+        return os.path.isfile(self.path) or bool(self._pending)
+
+    def _own(self, key, record):
+        """Return the form a record given to ``put`` is kept in."""
+        if self._layout is None:
+            return copy.deepcopy(record)
+        return self._layout.pack(key, record)
+
+    def _plain(self, key, value):
+        """Return a kept record as a dict, possibly the kept one."""
+        if self._layout is None or value is None or value is DELETED:
+            return value
+        return self._layout.unpack(key, value)
+
+    def _copy(self, key, value):
+        """Return a kept record as a new dict."""
+        if self._layout is None:
+            return copy.deepcopy(value)
+        return self._layout.unpack(key, value)
+
+    def _point_lookup(self, key):
+        """Look up one record without parsing the whole file.
+
+        A binary snapshot (see snapshot.py) is used when one matches the
+        current file. Otherwise, with ``lazy_lookups`` the file is scanned
+        only up to the record (see lazy_json.py). Returns UNKNOWN if the
+        lookup cannot be answered this way, None if the key is missing.
+        """
+        signature = self._stat()
+        if self._snapshot is None or self._snapshot[0] != signature:
+            if self._snapshot is not None and self._snapshot[1] is not None:
+                self._snapshot[1].close()
+            self._snapshot = (signature, open_current(self.path))
+        reader = self._snapshot[1]
+        if reader is not None:
+            return reader.get(key)
+        if self.lazy_lookups:
+            try:
+                return lookup(self.path, key)
+            except ValueError:
+                return UNKNOWN
+        return UNKNOWN
+
+    def get(self, key, default=None):
+        """Return the record stored under ``key``.
+
+        Until the file has been loaded, single lookups are answered
+        without loading it when possible. The record is a copy, so
+        changing it does not change the store before ``put``.
+        """
+        if not self._loaded and not self._pending:
+            record = self._point_lookup(key)
+            if record is not UNKNOWN:
+                return default if record is None else record
+        self.refresh()
+        if key not in self._data:
+            return default
+        return self._copy(key, self._data[key])
+
+    def all(self):
+        """Return a copy of every record in the file."""
+        self.refresh()
+        if self._layout is None:
+            return copy.deepcopy(self._data)
+        return {key: self._copy(key, value)
+                for key, value in self._data.items()}
+
+    def __contains__(self, key):
+        self.refresh()
+        return key in self._data
+
+    def put(self, key, record):
+        """Store ``record`` under ``key``."""
+        self.refresh()
+        with phase('mutate'):
+            value = self._own(key, record)
+            old = self._data.get(key)
+            self._data[key] = value
+            self._pending[key] = value
+            self._notify(key, self._plain(key, old), self._plain(key, value))
+        self._maybe_flush()
+
+    def remove(self, key):
+        """Remove ``key`` and return True if it was present."""
+        self.refresh()
+        if key not in self._data:
+            return False
+        old = self._data.pop(key)
+        self._pending[key] = DELETED
+        self._notify(key, self._plain(key, old), None)
+        self._maybe_flush()
+        return True
+
+    def pending(self):
+        """Return True if there are changes not written yet."""
+        return bool(self._pending)
+
+    def _maybe_flush(self):
+        """Flush if enough writes are pending and no batch is open."""
+        if self._batch_depth == 0 and self._pending and \
+                len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write pending changes to disk."""
+        if not self._pending:
+            return
+        with file_lock(self.path):
+            self.refresh()
+            self._write()
+            self._pending = {}
+            self._signature = self._stat()
+        self._notify_saved()
+
+    def _discard(self, pending):
+        """Go back to the ``pending`` changes, dropping those made since."""
+        self._pending = pending
+        self._loaded = False
+        self.refresh()
+        self._notify_saved(False)
+
+    def snapshot(self):
+        """Return a context manager for consistent reads; files are read
+        as they are, see ``snapshot()`` below."""
+        return contextlib.nullcontext(self)
+
+    @contextlib.contextmanager
+    def batch(self, scope=None):  # pylint: disable=unused-argument
+        """Group several changes into a single write.
+
+        The file stays locked for the whole block, so everything read
+        inside it is current and cannot change before the flush. With a
+        ``flush_every`` above 1 the flush may happen in a later batch.
+        If the outermost block raises, the changes made in it are
+        discarded. ``scope`` is ignored; sharded stores use it to lock
+        less.
+        """
+        with file_lock(self.path):
+            self.refresh()
+            before = dict(self._pending) if self._batch_depth == 0 else None
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                if before is not None:
+                    self._discard(before)
+                raise
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._maybe_flush()
+
+
+_stores = {}
+
+# Storage backends by name, as (module, class). The class is called with
+# (kind, path) for every data file.
+BACKENDS = {
+    'json': ('store', 'JsonStore'),
+    'journal': ('journal', 'JournalStore'),
+    'sqlite': ('sqlite_store', 'SqliteStore'),
+    'sharded': ('sharding', 'ShardedStore'),
+    'mvcc': ('mvcc', 'VersionedStore'),
+}
+_settings = {'backend': None}
+
+
+def backend_name():
+    """Return the name of the backend used for new stores."""
+    return (_settings['backend']
+            or os.environ.get('HOTEL_STORE_BACKEND')
+            or 'json')
+
+
+def use_backend(name):
+    """Select the storage backend for stores opened from now on."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {name}")
+    reset()
+    _settings['backend'] = name
+
+
+def get_store(kind, path):
+    """Return the shared store for ``path``, creating it on first use.
+
+    With ``HOTEL_CHANGE_FEED`` set, the changes of new stores are
+    published to that feed, see changefeed.py.
+    """
+    key = (kind, os.path.abspath(path))
+    if key not in _stores:
+        module, attr = BACKENDS[backend_name()]
+        factory = getattr(importlib.import_module(module), attr)
+        _stores[key] = factory(kind, path)
+        if os.environ.get('HOTEL_CHANGE_FEED'):
+            importlib.import_module('changefeed').attach(_stores[key])
+    return _stores[key]
+
+
+_derived = weakref.WeakKeyDictionary()
+
+
+def derived(source, index_class):
+    """Return the shared ``index_class`` index of a store.
+
+    Stores that can answer the queries of an index themselves, such as
+    SQLite tables, return their own version of it from
+    ``source.index(index_class)``; it is used instead.
+    """
+    indexes = _derived.setdefault(source, {})
+    if index_class not in indexes:
+        own = getattr(source, 'index', None)
+        index = None if own is None else own(index_class)
+        indexes[index_class] = index if index is not None else \
+            index_class(source)
+    return indexes[index_class]
+
+
+@contextlib.contextmanager
+def batch(*stores, scope=None):
+    """Group changes to several stores, flushing each one once.
+
+    Stores are locked in path order so that concurrent batches over the
+    same files cannot deadlock. ``scope`` optionally lists the hotel IDs
+    the block works on, see ``sharding.ShardedStore.batch``.
+    """
+    with contextlib.ExitStack() as stack:
+        for item in sorted(stores, key=lambda item: os.path.abspath(
+                item.path)):
+            stack.enter_context(item.batch(scope))
+        yield stores
+
+
+@contextlib.contextmanager
+def snapshot(*stores):
+    """Read several stores at one consistent point.
+
+    Backends that keep versions (see mvcc.py) pin one version of every
+    store for the block. The others read their current data as usual.
+    """
+    with contextlib.ExitStack() as stack:
+        for item in stores:
+            stack.enter_context(item.snapshot())
+        yield stores
+
+
+def flush_all():
+    """Flush every store that has pending changes."""
+    for item in _stores.values():
+        item.flush()
+
+
+def reset():
+    """Flush and forget every cached store."""
+    flush_all()
+    _stores.clear()
+
+
+atexit.register(flush_all)
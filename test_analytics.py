@@ -0,0 +1,72 @@
+"""Unit tests for analytics.py"""
+
+import unittest
+import os
+import datetime
+import tempfile
+import store
+from analytics import (average_stay, cache_path, lead_times, load_columns,
+                       nights_by_hotel_month, np)
+from reservation import Reservation
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestAnalytics(unittest.TestCase):
+    """Test the vectorized reservation reports"""
+    def setUp(self):
+        """Write a few reservations to a temporary file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.reservations_file = Reservation.reservations_file
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        storage = Reservation.storage()
+        with storage.batch():
+            for key, hotel_id, start, end in (
+                    ("R1", "H1", "2024-01-30", "2024-02-02"),
+                    ("R2", "H1", "2024-02-10", "2024-02-11"),
+                    ("R3", "H2", "2024-01-01", "2024-01-05"),
+                    ("R4", "H2", "bad", "2024-01-05")):
+                storage.put(key, {
+                    "customer_id": "C1", "hotel_id": hotel_id,
+                    "room_number": "101", "start_date": start,
+                    "end_date": end})
+
+    def test_nights_by_hotel_month(self):
+        """Nights are split across the months they fall in."""
+        self.assertEqual(nights_by_hotel_month(load_columns()), {
+            ("H1", "2024-01"): 2, ("H1", "2024-02"): 2,
+            ("H2", "2024-01"): 4})
+
+    def test_average_stay(self):
+        """Invalid reservations are left out of the averages."""
+        self.assertEqual(average_stay(load_columns()),
+                         {"H1": 2.0, "H2": 4.0})
+
+    def test_lead_times(self):
+        """Lead times are binned in days before arrival."""
+        booked = {
+            "R1": datetime.datetime(2024, 1, 20).timestamp(),
+            "R3": datetime.datetime(2023, 12, 31, 12).timestamp(),
+        }
+        counts, edges = lead_times(load_columns(), booked)
+        self.assertEqual(int(counts.sum()), 2)
+        self.assertEqual(int(counts[list(edges).index(1)]), 1)
+        self.assertEqual(int(counts[list(edges).index(7)]), 1)
+
+    def test_cache(self):
+        """The columns are cached until the reservations change."""
+        load_columns()
+        self.assertTrue(os.path.isfile(
+            cache_path(Reservation.reservations_file)))
+        self.assertEqual(len(load_columns()), 3)
+        Reservation.storage().remove("R2")
+        self.assertEqual(len(load_columns()), 2)
+
+    def tearDown(self):
+        store.reset()
+        Reservation.reservations_file = self.reservations_file
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,118 @@
+"""Unit tests for availability.py"""
+
+import unittest
+import os
+import tempfile
+from availability import RoomCalendar, index_for, stay_range, to_ordinal
+from store import JsonStore
+
+
+class TestRoomCalendar(unittest.TestCase):
+    """Test the per-room interval list"""
+    def setUp(self):
+        """Create a calendar with two bookings."""
+        self.calendar = RoomCalendar()
+        self.calendar.add(10, 15, "R1")
+        self.calendar.add(20, 25, "R2")
+
+    def test_conflict(self):
+        """Overlapping stays are detected."""
+        self.assertEqual(self.calendar.conflict(14, 16), "R1")
+        self.assertEqual(self.calendar.conflict(5, 30), "R2")
+        self.assertEqual(self.calendar.conflict(22, 23), "R2")
+
+    def test_back_to_back_stays(self):
+        """Check-out day is free for the next guest."""
+        self.assertIsNone(self.calendar.conflict(15, 20))
+        self.assertIsNone(self.calendar.conflict(5, 10))
+
+    def test_ignore_own_booking(self):
+        """A reservation does not conflict with itself."""
+        self.assertIsNone(self.calendar.conflict(12, 14, ignore="R1"))
+
+    def test_gap(self):
+        """The free gap around a stay is bounded by its neighbours."""
+        self.assertEqual(self.calendar.gap(15, 18), (15, 20))
+        self.assertEqual(self.calendar.gap(2, 5), (None, 10))
+        self.assertEqual(self.calendar.gap(26, 30), (25, None))
+        self.assertIsNone(self.calendar.gap(14, 16))
+
+    def test_overlapping_bookings(self):
+        """Bookings saved before double bookings were rejected still
+        block every night they cover."""
+        calendar = RoomCalendar()
+        calendar.add(1, 10, "A")
+        calendar.add(2, 3, "B")
+        self.assertTrue(calendar.overlapping)
+        self.assertEqual(calendar.conflict(5, 6), "A")
+        self.assertEqual(calendar.conflict(2, 3, ignore="A"), "B")
+        self.assertIsNone(calendar.conflict(10, 12))
+        self.assertIsNone(calendar.gap(5, 6))
+        self.assertEqual(calendar.gap(12, 14), (10, None))
+
+    def test_discard(self):
+        """Discarded bookings free their nights."""
+        self.calendar.discard(10, "R1")
+        self.assertIsNone(self.calendar.conflict(10, 15))
+        self.assertEqual(len(self.calendar), 1)
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+    """Test the index kept in sync with a reservations store"""
+    def setUp(self):
+        """Create a reservations store with one booking."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = JsonStore(
+            'reservations', os.path.join(self.tmpdir.name, 'res.json'))
+        self.store.put("R1", {
+            "customer_id": "C1", "hotel_id": "H1", "room_number": "101",
+            "start_date": "2024-01-01", "end_date": "2024-01-05"})
+        self.index = index_for(self.store)
+
+    def test_free_rooms(self):
+        """Only rooms without overlapping bookings are returned."""
+        start, end = stay_range("2024-01-03", "2024-01-04")
+        self.assertEqual(
+            self.index.free_rooms("H1", ["101", "102"], start, end), ["102"])
+
+    def test_best_fit(self):
+        """The room with the tightest free gap is chosen."""
+        for key, start_date, end_date in (
+                ("R2", "2024-01-01", "2024-01-03"),
+                ("R3", "2024-01-07", "2024-01-09")):
+            self.store.put(key, {
+                "customer_id": "C1", "hotel_id": "H1", "room_number": "102",
+                "start_date": start_date, "end_date": end_date})
+        rooms = ["100", "101", "102"]
+        for start_date, end_date, room in (
+                ("2024-01-05", "2024-01-06", "102"),
+                ("2024-01-09", "2024-01-11", "102"),
+                ("2024-01-05", "2024-01-08", "101"),
+                ("2024-01-02", "2024-01-04", "100")):
+            start, end = stay_range(start_date, end_date)
+            self.assertEqual(
+                self.index.best_fit("H1", rooms, start, end), room)
+        start, end = stay_range("2024-01-03", "2024-01-04")
+        self.assertIsNone(self.index.best_fit("H1", ["101"], start, end))
+
+    def test_updates_follow_store(self):
+        """Changes to the store are reflected in the index."""
+        start = to_ordinal("2024-01-02")
+        self.assertEqual(self.index.conflict("H1", "101", start, start + 1),
+                         "R1")
+        self.store.remove("R1")
+        self.assertIsNone(self.index.conflict("H1", "101", start, start + 1))
+
+    def test_invalid_range(self):
+        """Empty or reversed stays are rejected."""
+        with self.assertRaises(ValueError):
+            stay_range("2024-01-05", "2024-01-05")
+        with self.assertRaises(ValueError):
+            stay_range("2024-13-01", "2024-12-05")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
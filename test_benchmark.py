@@ -0,0 +1,73 @@
+"""Unit tests for benchmark.py"""
+
+import unittest
+import tempfile
+import store
+from benchmark import (WORKLOADS, compare, formats, generate_data,
+                       percentile, run, run_formats, run_workload)
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test the benchmark harness"""
+    def test_generate_data(self):
+        """Generated data follows the populate_data.py layout."""
+        hotels, customers, reservations = generate_data(3, rooms_per_hotel=2,
+                                                        reservations=8)
+        self.assertEqual(len(hotels), 3)
+        self.assertEqual(len(customers), 3)
+        self.assertEqual(len(reservations), 8)
+        booking = reservations["R0000000"]
+        room = hotels[booking["hotel_id"]]["rooms"][booking["room_number"]]
+        self.assertFalse(room["available"])
+        stays = {(item["hotel_id"], item["room_number"], item["start_date"])
+                 for item in reservations.values()}
+        self.assertEqual(len(stays), 8)
+
+    def test_percentile(self):
+        """Percentiles pick from sorted samples."""
+        samples = list(range(101))
+        self.assertEqual(percentile(samples, 0.5), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_run_reports_every_workload(self):
+        """A small run measures each workload and restores the files."""
+        hotels_file = Hotel.hotels_file
+        report = run(sorted(WORKLOADS), [5], 5)
+        self.assertEqual(len(report["results"]), len(WORKLOADS))
+        for item in report["results"]:
+            self.assertGreater(item["throughput"], 0)
+            self.assertGreaterEqual(item["p99_ms"], item["p50_ms"])
+        self.assertEqual(Hotel.hotels_file, hotels_file)
+        self.assertEqual(len(compare(report, report)), len(WORKLOADS))
+
+    def test_cancel_workload_cancels_every_operation(self):
+        """Every cancel operation finds a reservation to cancel."""
+        files = (Hotel.hotels_file, Customer.customers_file,
+                 Reservation.reservations_file)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                run_workload('reservation.cancel', 3, 10, directory)
+                self.assertEqual(Reservation.get_all_reservations(), {})
+                store.reset()
+        finally:
+            (Hotel.hotels_file, Customer.customers_file,
+             Reservation.reservations_file) = files
+
+    def test_run_formats(self):
+        """Compact files are smaller than pretty-printed ones."""
+        results = run_formats(5, repeat=1)
+        self.assertEqual(len(results), len(formats()))
+        sizes = {(item["style"], item["codec"], item["compression"]):
+                 item["bytes"] for item in results}
+        self.assertLess(sizes[("compact", "json", "none")],
+                        sizes[("pretty", "json", "none")])
+        self.assertLess(sizes[("compact", "json", "gzip")],
+                        sizes[("compact", "json", "none")])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+"""Unit tests for bulk.py"""
+
+import unittest
+import os
+import io
+import json
+import tempfile
+import store
+from bulk import bulk_export, bulk_import
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+
+
+class TestBulk(unittest.TestCase):
+    """Test JSON Lines import and export"""
+    def setUp(self):
+        """Point the data files at a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (
+            Hotel.hotels_file, Customer.customers_file,
+            Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Customer.customers_file = os.path.join(
+            self.tmpdir.name, 'customers.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+
+    def test_import_and_export(self):
+        """Records survive a round trip through JSON Lines."""
+        lines = io.StringIO(
+            '{"customer_id": "C001", "name": "John", "email": "j@x.com"}\n'
+            '{"customer_id": "C002", "name": "Jane", "email": "y@x.com"}\n')
+        imported, errors = bulk_import('customers', lines, batch_size=1)
+        self.assertEqual((imported, errors), (2, []))
+        output = io.StringIO()
+        self.assertEqual(bulk_export('customers', output), 2)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(records[0]["customer_id"], "C001")
+
+    def test_invalid_lines_are_reported(self):
+        """Broken or incomplete records are skipped with their line."""
+        lines = io.StringIO(
+            '{"hotel_id": "H001", "name": "A", "location": "B"}\n'
+            'not json\n'
+            '{"hotel_id": "H002", "name": "A"}\n')
+        imported, errors = bulk_import('hotels', lines)
+        self.assertEqual(imported, 1)
+        self.assertEqual([number for number, _ in errors], [2, 3])
+        self.assertIn("H001", Hotel.get_all_hotels())
+
+    def test_rejected_reservations(self):
+        """Reservations are checked like single bookings."""
+        Hotel("H001", "A", "B", {"101": {"available": True,
+                                         "customer_id": None}}).save()
+        lines = io.StringIO(
+            '{"reservation_id": "R1", "customer_id": "C1", "hotel_id": "H001",'
+            ' "room_number": "101", "start_date": "2024-01-01",'
+            ' "end_date": "2024-01-05"}\n'
+            '{"reservation_id": "R2", "customer_id": "C2", "hotel_id": "H001",'
+            ' "room_number": "101", "start_date": "2024-01-02",'
+            ' "end_date": "2024-01-03"}\n')
+        imported, errors = bulk_import('reservations', lines)
+        self.assertEqual(imported, 1)
+        self.assertEqual([number for number, _ in errors], [2])
+        self.assertIn("already booked by reservation R1", errors[0][1])
+        rooms = Hotel.get_all_hotels()["H001"]["rooms"]
+        self.assertFalse(rooms["101"]["available"])
+
+    def test_field_types_are_checked(self):
+        """Records with values of the wrong type are reported."""
+        lines = io.StringIO(
+            '{"hotel_id": 7, "name": "A", "location": "B"}\n'
+            '{"hotel_id": "H002", "name": "A", "location": "B",'
+            ' "rooms": {"101": true}}\n'
+            '{"hotel_id": "H003", "name": "A", "location": "B"}\n')
+        imported, errors = bulk_import('hotels', lines)
+        self.assertEqual((imported, [number for number, _ in errors]),
+                         (1, [1, 2]))
+        self.assertEqual(errors[0][1], "fields must be strings: hotel_id")
+        self.assertEqual(list(Hotel.get_all_hotels()), ["H003"])
+        lines = io.StringIO(
+            '{"reservation_id": "R1", "customer_id": "C1", "hotel_id": "H3",'
+            ' "room_number": "101", "start_date": 20250101,'
+            ' "end_date": "2025-01-05"}\n')
+        self.assertEqual(bulk_import('reservations', lines),
+                         (0, [(1, "fields must be strings: start_date")]))
+
+    def tearDown(self):
+        store.reset()
+        (Hotel.hotels_file, Customer.customers_file,
+         Reservation.reservations_file) = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,90 @@
+"""Unit tests for cache.py"""
+
+import unittest
+import os
+import json
+import tempfile
+from cache import MISSING, LRUCache, cached
+from store import JsonStore
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the bounded LRU mapping"""
+    def setUp(self):
+        """Create a two-entry cache with a manual clock."""
+        self.now = 0.0
+        self.cache = LRUCache(2, ttl=10, clock=lambda: self.now)
+
+    def test_least_recently_used_is_evicted(self):
+        """The entry not read for longest goes first."""
+        self.cache.put("A", 1)
+        self.cache.put("B", 2)
+        self.assertEqual(self.cache.get("A"), 1)
+        self.cache.put("C", 3)
+        self.assertIs(self.cache.get("B"), MISSING)
+        self.assertEqual(self.cache.get("A"), 1)
+        self.assertEqual(self.cache.stats,
+                         {'hits': 2, 'misses': 1, 'evictions': 1})
+
+    def test_ttl(self):
+        """Entries older than the TTL are misses."""
+        self.cache.put("A", 1)
+        self.now = 5
+        self.assertEqual(self.cache.get("A"), 1)
+        self.now = 11
+        self.assertIs(self.cache.get("A"), MISSING)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestRecordCache(unittest.TestCase):
+    """Test the read-through cache in front of a store"""
+    def setUp(self):
+        """Create a store with one record and its cache."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'items.json')
+        self.store = JsonStore('items', self.path)
+        self.store.flush_every = 100
+        self.store.put("A", {"value": 1})
+        self.cache = cached(self.store)
+
+    def test_repeated_reads_hit(self):
+        """Only the first read of a record reaches the store."""
+        for _ in range(3):
+            self.assertEqual(self.cache.get("A"), {"value": 1})
+        self.assertIsNone(self.cache.get("B"))
+        self.assertEqual(self.cache.cache.stats['hits'], 2)
+        self.assertEqual(self.cache.cache.stats['misses'], 2)
+
+    def test_local_write_drops_record(self):
+        """A put through the store replaces the cached record."""
+        self.cache.get("A")
+        self.cache.get("B")
+        self.store.put("B", {"value": 2})
+        self.assertEqual(self.cache.get("B"), {"value": 2})
+        self.assertEqual(self.cache.cache.stats['hits'], 0)
+        self.assertEqual(self.cache.get("A"), {"value": 1})
+        self.assertEqual(self.cache.cache.stats['hits'], 1)
+
+    def test_flush_keeps_other_records(self):
+        """Writing the store's own changes to disk is not an external
+        change."""
+        self.cache.get("A")
+        self.store.put("B", {"value": 2})
+        self.store.flush()
+        self.assertEqual(self.cache.get("A"), {"value": 1})
+        self.assertEqual(self.cache.cache.stats['hits'], 1)
+
+    def test_external_change_drops_everything(self):
+        """Another process replacing the file is noticed."""
+        self.store.flush()
+        self.cache.get("A")
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({"A": {"value": 9}, "padding": {}}, file)
+        self.assertEqual(self.cache.get("A"), {"value": 9})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,115 @@
+"""Unit tests for changefeed.py"""
+
+import unittest
+import os
+import sys
+import tempfile
+from io import StringIO
+import store
+from changefeed import ChangeFeed, attach, consume, read
+from hotel import Hotel
+from reservation import Reservation
+
+
+class TestChangeFeed(unittest.TestCase):
+    """Test publishing and consuming change events"""
+    def setUp(self):
+        """Point the data files and the feed at a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (Hotel.hotels_file, Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.feed = os.path.join(self.tmpdir.name, 'changes.jsonl')
+        self.checkpoint = os.path.join(self.tmpdir.name, 'consumer.json')
+        self.original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        attach(Hotel.storage(), self.feed)
+        attach(Reservation.storage(), self.feed)
+
+    def test_entity_changes_are_published(self):
+        """Saves and cancellations become ordered events."""
+        hotel = Hotel("H001", "A", "X", {})
+        hotel.save()
+        hotel.add_room("101")
+        Reservation("R001", "C001", "H001", "101", "2024-01-01",
+                    "2024-01-02").save()
+        Reservation.cancel("R001")
+        events, _ = read(self.feed)
+        self.assertEqual([event["seq"] for event in events],
+                         list(range(1, len(events) + 1)))
+        self.assertEqual(
+            [(event["kind"], event["key"], event["op"]) for event in events],
+            [("hotels", "H001", "insert"), ("hotels", "H001", "update"),
+             ("reservations", "R001", "insert"),
+             ("hotels", "H001", "update"),
+             ("reservations", "R001", "delete"),
+             ("hotels", "H001", "update")])
+        self.assertIsNone(events[4]["new"])
+        self.assertEqual(events[4]["old"]["room_number"], "101")
+        booked, released = events[3], events[5]
+        self.assertEqual(booked["old"]["rooms"]["101"],
+                         {"available": True, "customer_id": None})
+        self.assertEqual(booked["new"]["rooms"]["101"],
+                         {"available": False, "customer_id": "C001"})
+        self.assertEqual(released["old"]["rooms"]["101"],
+                         booked["new"]["rooms"]["101"])
+        self.assertEqual(released["new"]["rooms"]["101"],
+                         {"available": True, "customer_id": None})
+
+    def test_changes_published_when_saved(self):
+        """Changes in a batch appear in the feed once they are written."""
+        hotels = Hotel.storage()
+        with store.batch(hotels):
+            hotels.put("H001", {"name": "A", "location": "X", "rooms": {}})
+            self.assertEqual(read(self.feed)[0], [])
+        events, _ = read(self.feed)
+        self.assertEqual([event["key"] for event in events], ["H001"])
+
+    def test_consumer_resumes_from_checkpoint(self):
+        """Each call only hands over the events added since the last."""
+        seen = []
+        Hotel("H001", "A", "X", {}).save()
+        self.assertEqual(consume(self.feed, self.checkpoint, seen.append), 1)
+        self.assertEqual(consume(self.feed, self.checkpoint, seen.append), 0)
+        Hotel("H002", "B", "Y", {}).save()
+        self.assertEqual(consume(self.feed, self.checkpoint, seen.append), 1)
+        self.assertEqual([event["key"] for event in seen], ["H001", "H002"])
+
+    def test_failed_handler_keeps_position(self):
+        """Events after a failure are handed over again."""
+        Hotel("H001", "A", "X", {}).save()
+        Hotel("H002", "B", "Y", {}).save()
+        seen = []
+        failures = ["H002"]
+
+        def handler(event):
+            if event["key"] in failures:
+                failures.remove(event["key"])
+                raise RuntimeError
+            seen.append(event["key"])
+
+        with self.assertRaises(RuntimeError):
+            consume(self.feed, self.checkpoint, handler)
+        consume(self.feed, self.checkpoint, handler)
+        self.assertEqual(seen, ["H001", "H002"])
+
+    def test_torn_line(self):
+        """An interrupted append does not corrupt later events."""
+        Hotel("H001", "A", "X", {}).save()
+        with open(self.feed, 'a', encoding='utf-8') as file:
+            file.write('{"seq": 2, "kind"')
+        other = ChangeFeed(self.feed)
+        self.assertEqual(other.append("hotels", "H002", None, {}), 2)
+        events, _ = read(self.feed)
+        self.assertEqual([event["seq"] for event in events], [1, 2])
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        store.reset()
+        Hotel.hotels_file, Reservation.reservations_file = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
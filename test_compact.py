@@ -0,0 +1,129 @@
+"""Unit tests for compact.py"""
+
+import unittest
+import os
+import json
+import tempfile
+from compact import (CompactHotel, CompactReservation, HotelLayout,
+                     ReservationLayout, RoomTable)
+from populate_data import default_hotels_data, default_reservations_data
+from store import JsonStore
+
+
+class TestCompact(unittest.TestCase):
+    """Test the compact models"""
+    def test_hotels_round_trip(self):
+        """Hotels convert back to the exact JSON layout."""
+        layout = HotelLayout()
+        for hotel_id, record in default_hotels_data.items():
+            model = layout.pack(hotel_id, record)
+            self.assertIsInstance(model, CompactHotel)
+            self.assertEqual(layout.unpack(hotel_id, model), record)
+
+    def test_reservations_round_trip(self):
+        """Reservations convert back to the exact JSON layout."""
+        for reservation_id, record in default_reservations_data.items():
+            model = ReservationLayout.pack(reservation_id, record)
+            self.assertIsInstance(model, CompactReservation)
+            self.assertEqual(ReservationLayout.unpack(reservation_id, model),
+                             record)
+        model = ReservationLayout.pack("R001", default_reservations_data[
+            "R001"])
+        self.assertEqual(model.end - model.start, 9)
+
+    def test_extra_keys_are_kept(self):
+        """Keys the models do not know survive the round trip."""
+        hotel = {"name": "A", "location": "X", "stars": 4,
+                 "rooms": {"101": {"available": True, "customer_id": None,
+                                   "type": "suite"}}}
+        reservation = {"customer_id": "C001", "hotel_id": "H001",
+                       "room_number": "101", "start_date": "2024-01-01",
+                       "end_date": "20240105", "status": "paid"}
+        layout = HotelLayout()
+        self.assertEqual(layout.unpack("H001", layout.pack("H001", hotel)),
+                         hotel)
+        self.assertEqual(ReservationLayout.unpack(
+            "R001", ReservationLayout.pack("R001", reservation)), reservation)
+
+    def test_other_records_are_kept_as_they_are(self):
+        """Records that do not fit a model are kept as copies."""
+        layout = HotelLayout()
+        for record in ({"name": "A"}, {"name": "A", "location": "X",
+                                       "rooms": {"101": {"available": 1}}}):
+            packed = layout.pack("H001", record)
+            self.assertEqual(packed, record)
+            self.assertIsNot(packed, record)
+        self.assertEqual(ReservationLayout.pack("R001", {"hotel_id": "H1"}),
+                         {"hotel_id": "H1"})
+
+    def test_room_table(self):
+        """Room status is kept in the bitset and customer codes."""
+        table = RoomTable()
+        for number in range(20):
+            table.set(str(number))
+        table.set("7", available=False, customer_id="C001")
+        table.set("15", available=False, customer_id="C001")
+        self.assertEqual(len(table), 20)
+        self.assertEqual(table.available_count(), 18)
+        self.assertFalse(table.is_available("15"))
+        self.assertEqual(table.customer("7"), "C001")
+        self.assertIsNone(table.customer("8"))
+        self.assertEqual(table.customer_ids.ids, ["C001"])
+        table.set("7")
+        self.assertTrue(table.is_available("7"))
+
+    def test_room_removal(self):
+        """Removing a room keeps the status of the rooms after it."""
+        table = RoomTable()
+        for number in range(12):
+            table.set(str(number), available=number % 3 != 0,
+                      customer_id=None if number % 3 else f"C{number}")
+        expected = table.to_json()
+        table.remove("4")
+        del expected["4"]
+        self.assertEqual(table.to_json(), expected)
+        self.assertEqual(list(table.to_json()), list(expected))
+        self.assertEqual(table.available_count(), 7)
+        self.assertNotIn("4", table)
+
+
+class TestCompactStore(unittest.TestCase):
+    """Test stores that keep compact models"""
+    def setUp(self):
+        """Write the default data files to a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for kind, data in (('hotels', default_hotels_data),
+                           ('reservations', default_reservations_data)):
+            self.paths[kind] = os.path.join(self.tmpdir.name, kind + '.json')
+            with open(self.paths[kind], 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_records_read_as_dicts(self):
+        """Reads return the records of the JSON layout."""
+        JsonStore.compact_models = True
+        try:
+            hotels = JsonStore('hotels', self.paths['hotels'])
+            reservations = JsonStore('reservations',
+                                     self.paths['reservations'])
+        finally:
+            JsonStore.compact_models = False
+        self.assertEqual(hotels.all(), default_hotels_data)
+        self.assertEqual(reservations.all(), default_reservations_data)
+        # pylint: disable-next=protected-access
+        self.assertIsInstance(hotels._data["H001"], CompactHotel)
+        hotel = hotels.get("H001")
+        hotel["rooms"]["101"]["available"] = False
+        self.assertTrue(hotels.get("H001")["rooms"]["101"]["available"])
+        hotels.put("H001", hotel)
+        del hotel["rooms"]["102"]
+        hotels.put("H001", hotel)
+        with open(self.paths['hotels'], 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file)["H001"], hotel)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
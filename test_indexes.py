@@ -0,0 +1,52 @@
+"""Unit tests for indexes.py"""
+
+import unittest
+import os
+import tempfile
+from indexes import reservation_index
+from store import JsonStore
+
+
+class TestReservationIndex(unittest.TestCase):
+    """Test the secondary reservation indexes"""
+    def setUp(self):
+        """Create a reservations store with a few bookings."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = JsonStore(
+            'reservations', os.path.join(self.tmpdir.name, 'res.json'))
+        with self.store.batch():
+            self.store.put("R1", self.record("C1", "H1", "101"))
+            self.store.put("R2", self.record("C1", "H2", "201"))
+            self.store.put("R3", self.record("C2", "H1", "101"))
+        self.index = reservation_index(self.store)
+
+    @staticmethod
+    def record(customer_id, hotel_id, room_number):
+        """Return a reservation record."""
+        return {"customer_id": customer_id, "hotel_id": hotel_id,
+                "room_number": room_number, "start_date": "2024-01-01",
+                "end_date": "2024-01-02"}
+
+    def test_lookups(self):
+        """Each index returns the matching reservation IDs."""
+        self.assertEqual(self.index.by_customer("C1"), ["R1", "R2"])
+        self.assertEqual(self.index.by_hotel("H1"), ["R1", "R3"])
+        self.assertEqual(self.index.by_room("H1", "101"), ["R1", "R3"])
+        self.assertEqual(self.index.by_customer("C9"), [])
+
+    def test_incremental_updates(self):
+        """Changes to the store move reservations between keys."""
+        self.index.by_customer("C1")
+        self.store.put("R2", self.record("C2", "H2", "202"))
+        self.store.remove("R1")
+        self.assertEqual(self.index.by_customer("C1"), [])
+        self.assertEqual(self.index.by_customer("C2"), ["R2", "R3"])
+        self.assertEqual(self.index.by_room("H2", "202"), ["R2"])
+        self.assertEqual(self.index.by_room("H2", "201"), [])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,87 @@
+"""Unit tests for instrumentation.py"""
+
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+import instrumentation
+import store
+from hotel import Hotel, main
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test metrics and profiling hooks"""
+    def setUp(self):
+        """Point the hotels file at a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.hotels_file = Hotel.hotels_file
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        self.original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        instrumentation.metrics.clear()
+
+    def test_install_records_operations(self):
+        """Wrapped operations report calls, phases and bytes."""
+        instrumentation.install()
+        try:
+            Hotel("H001", "Test Hotel", "Here", {}).save()
+            Hotel.get_all_hotels()
+        finally:
+            instrumentation.uninstall()
+        text = instrumentation.metrics.render()
+        self.assertIn(
+            'hotel_operation_calls_total{operation="Hotel.save"} 1', text)
+        self.assertIn('hotel_phase_seconds_count{phase="write"} 1', text)
+        self.assertIn('# TYPE hotel_operation_seconds histogram', text)
+        self.assertIn('hotel_bytes_written_total{file="hotels"}', text)
+
+    def test_uninstall_restores_operations(self):
+        """Operations are unwrapped and metrics stop."""
+        original = Hotel.__dict__['delete']
+        instrumentation.install()
+        instrumentation.install()
+        instrumentation.uninstall()
+        self.assertIs(Hotel.__dict__['delete'].__func__, original.__func__)
+        Hotel("H001", "Test Hotel", "Here", {}).save()
+        self.assertEqual(instrumentation.metrics.counters, {})
+
+    def test_cli_options(self):
+        """The CLI writes metrics and profiles on request."""
+        metrics_file = os.path.join(self.tmpdir.name, 'metrics.prom')
+        main(['--metrics', metrics_file, '--profile', '-',
+              'create', 'H001', 'Test Hotel', 'Here'])
+        with open(metrics_file, 'r', encoding='utf-8') as file:
+            self.assertIn('operation="Hotel.save"', file.read())
+        self.assertIn('cumulative', sys.stdout.getvalue())
+
+    def test_options_after_subcommand(self):
+        """The options are also accepted after the subcommand."""
+        metrics_file = os.path.join(self.tmpdir.name, 'metrics.prom')
+        main(['create', 'H001', 'Test Hotel', 'Here',
+              '--metrics', metrics_file])
+        with open(metrics_file, 'r', encoding='utf-8') as file:
+            self.assertIn('operation="Hotel.save"', file.read())
+
+    def test_script_records_operations(self):
+        """Operations are counted when the CLI runs as a script."""
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'hotel.py')
+        output = subprocess.run(
+            [sys.executable, script, 'create', 'H001', 'Test Hotel', 'Here',
+             '--metrics', '-'],
+            cwd=self.tmpdir.name, capture_output=True, text=True,
+            check=True).stdout
+        self.assertIn(
+            'hotel_operation_calls_total{operation="Hotel.save"} 1', output)
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        store.reset()
+        Hotel.hotels_file = self.hotels_file
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
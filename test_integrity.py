@@ -0,0 +1,89 @@
+"""Unit tests for integrity.py"""
+
+import unittest
+import os
+import sys
+import tempfile
+from io import StringIO
+import store
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+
+
+class TestIntegrity(unittest.TestCase):
+    """Test restrict and cascade deletes"""
+    def setUp(self):
+        """Create a hotel, a customer and a reservation in temp files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (
+            Hotel.hotels_file, Customer.customers_file,
+            Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Customer.customers_file = os.path.join(
+            self.tmpdir.name, 'customers.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        Hotel("H001", "Test Hotel", "Here", {
+            "101": {"available": True, "customer_id": None},
+            "102": {"available": False, "customer_id": "C001"}}).save()
+        Customer("C001", "John Doe", "johndoe@example.com").save()
+        Reservation("R001", "C001", "H001", "101", "2024-01-01",
+                    "2024-01-03").save()
+
+    def test_restrict_keeps_referenced_records(self):
+        """Restrict mode refuses to delete referenced records."""
+        self.assertFalse(Hotel.delete("H001", 'restrict'))
+        self.assertFalse(Customer.delete("C001", 'restrict'))
+        self.assertIn("H001", Hotel.get_all_hotels())
+        self.assertIn("C001", Customer.get_all_customers())
+        self.assertIn("R001", sys.stdout.getvalue())
+
+    def test_cascade_hotel(self):
+        """Cascade deletes the hotel's reservations."""
+        self.assertTrue(Hotel.delete("H001", 'cascade'))
+        self.assertEqual(Reservation.get_all_reservations(), {})
+        self.assertNotIn("H001", Hotel.get_all_hotels())
+
+    def test_cascade_customer(self):
+        """Cascade deletes reservations and frees the customer's rooms."""
+        self.assertTrue(Customer.delete("C001", 'cascade'))
+        self.assertEqual(Reservation.get_all_reservations(), {})
+        rooms = Hotel.get_all_hotels()["H001"]["rooms"]
+        for room in rooms.values():
+            self.assertTrue(room["available"])
+            self.assertIsNone(room["customer_id"])
+        self.assertNotIn("C001", Customer.get_all_customers())
+
+    def test_unreferenced_records(self):
+        """Records nobody refers to are deleted in restrict mode."""
+        Customer("C002", "Jane Smith", "janesmith@example.com").save()
+        self.assertTrue(Customer.delete("C002", 'restrict'))
+        self.assertFalse(Customer.delete("C002", 'restrict'))
+
+    def test_cancel_releases_room_reference(self):
+        """A cancelled booking no longer ties its room to the customer."""
+        Customer("C002", "Jane Smith", "janesmith@example.com").save()
+        Customer("C003", "Max Mustermann", "max@example.com").save()
+        Reservation("R002", "C002", "H001", "101", "2024-02-01",
+                    "2024-02-03").save()
+        self.assertFalse(Customer.delete("C002", 'restrict'))
+        self.assertTrue(Reservation.cancel("R002"))
+        Reservation("R003", "C003", "H001", "101", "2024-03-01",
+                    "2024-03-03").save()
+        self.assertTrue(Customer.delete("C002", 'cascade'))
+        room = Hotel.get_all_hotels()["H001"]["rooms"]["101"]
+        self.assertEqual(room["customer_id"], "C003")
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        store.reset()
+        (Hotel.hotels_file, Customer.customers_file,
+         Reservation.reservations_file) = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+"""Unit tests for journal.py"""
+
+import unittest
+import os
+import json
+import tempfile
+from journal import JournalStore
+
+
+class TestJournalStore(unittest.TestCase):
+    """Test the append-only journal backend"""
+    def setUp(self):
+        """Create a journal store on a temporary file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'items.json')
+        self.store = JournalStore('items', self.path)
+
+    def test_changes_are_appended(self):
+        """Each change adds one line to the journal."""
+        self.store.put("A", {"value": 1})
+        self.store.put("B", {"value": 2})
+        self.store.remove("A")
+        with open(self.store.journal_path, 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 3)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_replay_rebuilds_state(self):
+        """A new store sees the state recorded in the journal."""
+        self.store.put("A", {"value": 1})
+        self.store.put("B", {"value": 2})
+        self.store.remove("A")
+        reopened = JournalStore('items', self.path)
+        self.assertEqual(reopened.all(), {"B": {"value": 2}})
+
+    def test_torn_line_is_ignored(self):
+        """An incomplete trailing entry does not break replay."""
+        self.store.put("A", {"value": 1})
+        with open(self.store.journal_path, 'a', encoding='utf-8') as file:
+            file.write('{"op": "put", "key": "B"')
+        reopened = JournalStore('items', self.path)
+        self.assertEqual(reopened.all(), {"A": {"value": 1}})
+
+    def test_appends_after_torn_line(self):
+        """Entries appended after a torn line are replayed."""
+        self.store.put("A", {"value": 1})
+        with open(self.store.journal_path, 'a', encoding='utf-8') as file:
+            file.write('{"op": "put", "key": "B"')
+        writer = JournalStore('items', self.path)
+        writer.put("C", {"value": 3})
+        writer.put("D", {"value": 4})
+        reopened = JournalStore('items', self.path)
+        self.assertEqual(set(reopened.all()), {"A", "C", "D"})
+
+    def test_compaction_writes_snapshot(self):
+        """Compaction folds the journal into the JSON snapshot."""
+        self.store.compact_every = 2
+        self.store.put("A", {"value": 1})
+        self.store.put("B", {"value": 2})
+        self.assertFalse(os.path.exists(self.store.journal_path))
+        with open(self.path, 'r', encoding='utf-8') as file:
+            self.assertEqual(set(json.load(file)), {"A", "B"})
+        self.store.put("C", {"value": 3})
+        reopened = JournalStore('items', self.path)
+        self.assertEqual(set(reopened.all()), {"A", "B", "C"})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
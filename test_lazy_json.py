@@ -0,0 +1,82 @@
+"""Unit tests for lazy_json.py"""
+
+import unittest
+import os
+import io
+import json
+import tempfile
+import lazy_json
+from lazy_json import build_index, index_path, iter_items, lookup
+from store import JsonStore
+
+
+class TestLazyJson(unittest.TestCase):
+    """Test streaming lookups"""
+    def setUp(self):
+        """Write a JSON data file larger than one read chunk."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'customers.json')
+        self.data = {
+            f"C{number:05d}": {"name": f"Cliente {number} ñ",
+                               "email": f"c{number}@example.com",
+                               "score": number * 1.5}
+            for number in range(3000)
+        }
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(self.data, file, indent=4, ensure_ascii=False)
+
+    def test_iter_items_reads_everything(self):
+        """Every entry is read with the byte span of its value."""
+        with open(self.path, 'rb') as file:
+            raw = file.read()
+            file.seek(0)
+            for key, value, offset, length in iter_items(file):
+                self.assertEqual(value, self.data[key])
+                self.assertEqual(json.loads(raw[offset:offset + length]),
+                                 value)
+
+    def test_small_chunks(self):
+        """Values split across chunk boundaries are decoded."""
+        chunk_size = lazy_json.CHUNK_SIZE
+        lazy_json.CHUNK_SIZE = 7
+        try:
+            items = list(iter_items(io.BytesIO(
+                b'{"a": 12345678, "b": {"x": "\xc3\xb1\xc3\xb1"}, "c": []}')))
+        finally:
+            lazy_json.CHUNK_SIZE = chunk_size
+        self.assertEqual([(key, value) for key, value, _, _ in items],
+                         [("a", 12345678), ("b", {"x": "ññ"}), ("c", [])])
+
+    def test_empty_object(self):
+        """An empty file object has no entries."""
+        self.assertEqual(list(iter_items(io.BytesIO(b' {} '))), [])
+
+    def test_lookup(self):
+        """Lookups find records with and without the sidecar index."""
+        self.assertEqual(lookup(self.path, "C02999"), self.data["C02999"])
+        self.assertIsNone(lookup(self.path, "C99999"))
+        self.assertEqual(build_index(self.path), 3000)
+        self.assertTrue(os.path.exists(index_path(self.path)))
+        self.assertEqual(lookup(self.path, "C01234"), self.data["C01234"])
+        self.assertIsNone(lookup(self.path, "C99999"))
+
+    def test_stale_index_is_ignored(self):
+        """An index for older contents is not used."""
+        build_index(self.path)
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({"C00001": {"name": "New"}}, file)
+        self.assertEqual(lookup(self.path, "C00001"), {"name": "New"})
+
+    def test_lazy_store(self):
+        """A store in lazy mode answers lookups without loading."""
+        store = JsonStore('customers', self.path)
+        store.lazy_lookups = True
+        self.assertEqual(store.get("C00010"), self.data["C00010"])
+        self.assertFalse(store._loaded)  # pylint: disable=protected-access
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
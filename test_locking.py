@@ -0,0 +1,112 @@
+"""Unit tests for locking.py"""
+
+import unittest
+import os
+import json
+import multiprocessing
+import tempfile
+import time
+import locking
+from instrumentation import metrics
+from store import JsonStore
+
+
+def _write_keys(path, worker, count):
+    """Add ``count`` keys to the store at ``path`` from another process."""
+    store = JsonStore('items', path)
+    for number in range(count):
+        store.put(f"{worker}-{number}", {"worker": worker})
+
+
+def _hold_lock(path, locked):
+    """Hold the lock on ``path`` for a moment from another process."""
+    with locking.file_lock(path):
+        locked.set()
+        time.sleep(0.2)
+
+
+class TestLocking(unittest.TestCase):
+    """Test cross-process locks and atomic writes"""
+    def setUp(self):
+        """Create a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'items.json')
+
+    def test_atomic_write(self):
+        """The file is replaced as a whole and no temp files remain."""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('x' * 100)
+        locking.atomic_write(self.path, lambda file: file.write('{}'))
+        with open(self.path, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), '{}')
+        self.assertEqual(
+            [name for name in os.listdir(self.tmpdir.name)
+             if name.endswith('.tmp')], [])
+
+    def test_atomic_write_keeps_mode(self):
+        """Replaced files keep their mode and new ones follow the umask."""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('{}')
+        os.chmod(self.path, 0o640)
+        locking.atomic_write(self.path, lambda file: file.write('[]'))
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        new_path = os.path.join(self.tmpdir.name, 'new.json')
+        umask = os.umask(0o022)
+        try:
+            locking.atomic_write(new_path, lambda file: file.write('{}'))
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(new_path).st_mode & 0o777, 0o644)
+
+    def test_lock_is_reentrant(self):
+        """Nested locks on the same file do not deadlock."""
+        before = locking.stats['acquired']
+        with locking.file_lock(self.path):
+            with locking.file_lock(self.path):
+                pass
+        self.assertEqual(locking.stats['acquired'], before + 1)
+
+    def test_contention_is_metered(self):
+        """Waiting for a lock held by another process is reported."""
+        context = multiprocessing.get_context('fork')
+        locked = context.Event()
+        holder = context.Process(target=_hold_lock, args=(self.path, locked))
+        holder.start()
+        locked.wait()
+        metrics.clear()
+        metrics.enabled = True
+        try:
+            with locking.file_lock(self.path):
+                pass
+        finally:
+            metrics.enabled = False
+            holder.join()
+        text = metrics.render()
+        self.assertIn('hotel_lock_acquired_total{file="items.json"} 1', text)
+        self.assertIn('hotel_lock_contended_total{file="items.json"} 1',
+                      text)
+        _, waited, _ = metrics.histograms['hotel_lock_wait_seconds'][
+            (('file', 'items.json'),)]
+        self.assertGreater(waited, 0.05)
+        metrics.clear()
+
+    def test_concurrent_writers_keep_every_write(self):
+        """Writers in several processes do not overwrite each other."""
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_write_keys, args=(self.path, worker, 20))
+            for worker in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        with open(self.path, 'r', encoding='utf-8') as file:
+            self.assertEqual(len(json.load(file)), 80)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,159 @@
+"""Unit tests for mvcc.py"""
+
+import unittest
+import os
+import json
+import subprocess
+import sys
+import tempfile
+from mvcc import Repository, VersionedStore, migrate
+from store import batch, snapshot
+
+
+class TestVersionedStore(unittest.TestCase):
+    """Test the multi-version backend"""
+    def setUp(self):
+        """Create versioned stores in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repository = Repository(
+            os.path.join(self.tmpdir.name, 'versions'))
+        self.hotels = self.open('hotels')
+        self.reservations = self.open('reservations')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def open(self, kind, repository=None):
+        """Return a store of ``kind`` in the temporary directory."""
+        return VersionedStore(
+            kind, os.path.join(self.tmpdir.name, kind + '.json'),
+            repository or self.repository)
+
+    def test_put_publishes_version(self):
+        """Every write outside a batch publishes a new version."""
+        self.hotels.put("H001", {"name": "A"})
+        self.hotels.put("H002", {"name": "B"})
+        self.assertEqual(self.hotels.version(), 2)
+        self.assertEqual(self.repository.versions(), [1, 2])
+        self.assertTrue(self.hotels.remove("H001"))
+        self.assertFalse(self.hotels.remove("H001"))
+        self.assertEqual(self.hotels.all(), {"H002": {"name": "B"}})
+
+    def test_batch_commits_one_version(self):
+        """Changes to several stores in a batch become visible together."""
+        reader = Repository(self.repository.root)
+        hotels = self.open('hotels', reader)
+        reservations = self.open('reservations', reader)
+        self.hotels.put("H001", {"name": "A", "rooms": {
+            "101": {"available": True}}})
+        with batch(self.reservations, self.hotels):
+            self.reservations.put("R001", {"hotel_id": "H001",
+                                           "room_number": "101"})
+            self.assertEqual(reservations.all(), {})
+            hotel = self.hotels.get("H001")
+            hotel["rooms"]["101"]["available"] = False
+            self.hotels.put("H001", hotel)
+            self.assertTrue(hotels.get("H001")["rooms"]["101"]["available"])
+        self.assertEqual(self.hotels.version(), 2)
+        self.assertIn("R001", reservations.all())
+        self.assertFalse(hotels.get("H001")["rooms"]["101"]["available"])
+
+    def test_failed_batch_publishes_nothing(self):
+        """A batch that raises leaves no partial changes behind."""
+        with self.assertRaises(KeyError):
+            with batch(self.reservations, self.hotels):
+                self.reservations.put("R001", {"hotel_id": "H001"})
+                raise KeyError("H001")
+        self.assertEqual(self.reservations.all(), {})
+        self.assertEqual(self.repository.versions(), [])
+
+    def test_pinned_reads_ignore_new_versions(self):
+        """Inside a snapshot, reads stay at the pinned version."""
+        reader = self.open('hotels', Repository(self.repository.root))
+        self.hotels.put("H001", {"name": "A"})
+        with reader.snapshot():
+            self.hotels.put("H001", {"name": "B"})
+            self.assertEqual(reader.get("H001"), {"name": "A"})
+        self.assertEqual(reader.get("H001"), {"name": "B"})
+
+    def test_old_versions_are_pruned(self):
+        """Only recent versions and the files still in use are kept."""
+        self.repository.keep_versions = 2
+        self.reservations.put("R001", {"hotel_id": "H001"})
+        for number in range(5):
+            self.hotels.put("H001", {"name": str(number)})
+        self.assertEqual(self.repository.versions(), [1, 4, 5, 6])
+        self.assertEqual(self.open('reservations', Repository(
+            self.repository.root)).all(), {"R001": {"hotel_id": "H001"}})
+
+    def test_snapshot_spans_stores(self):
+        """A snapshot over several stores reads them at one version."""
+        reader = Repository(self.repository.root)
+        hotels = self.open('hotels', reader)
+        reservations = self.open('reservations', reader)
+        self.hotels.put("H001", {"rooms": {"101": {"available": True}}})
+        with snapshot(hotels, reservations):
+            self.assertTrue(hotels.get("H001")["rooms"]["101"]["available"])
+            with batch(self.reservations, self.hotels):
+                self.reservations.put("R001", {"hotel_id": "H001"})
+                self.hotels.put(
+                    "H001", {"rooms": {"101": {"available": False}}})
+            self.assertEqual(reservations.all(), {})
+        self.assertIn("R001", reservations.all())
+
+    def test_pinned_version_is_not_pruned(self):
+        """A long reader keeps its version however many are published."""
+        self.repository.keep_versions = 1
+        self.reservations.put("R001", {"hotel_id": "H001"})
+        self.hotels.put("H001", {"name": "A"})
+        reader = Repository(self.repository.root)
+        reservations = self.open('reservations', reader)
+        with reader.pin():
+            for number in range(5):
+                with batch(self.reservations, self.hotels):
+                    self.reservations.put("R001", {"hotel_id": str(number)})
+                    self.hotels.put("H001", {"name": str(number)})
+            self.assertEqual(reservations.get("R001"), {"hotel_id": "H001"})
+        self.hotels.put("H001", {"name": "B"})
+        self.assertEqual(self.repository.versions(), [7, 8])
+
+    def test_dead_reader_lease_is_dropped(self):
+        """Leases of readers that died do not keep versions forever."""
+        self.repository.keep_versions = 1
+        self.hotels.put("H001", {"name": "A"})
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        readers = os.path.join(self.repository.root, 'readers')
+        os.makedirs(readers)
+        with open(os.path.join(readers, 'dead.json'), 'w',
+                  encoding='utf-8') as file:
+            json.dump({"pid": process.pid,
+                       "files": {"hotels": "00000001/hotels.json"}}, file)
+        for number in range(3):
+            self.hotels.put("H001", {"name": str(number)})
+        self.assertEqual(self.repository.versions(), [3, 4])
+        self.assertEqual(os.listdir(readers), [])
+
+    def test_get_returns_copy(self):
+        """Changing a fetched record does not change the store."""
+        self.hotels.put("H001", {"name": "A"})
+        self.hotels.get("H001")["name"] = "B"
+        self.hotels.all()["H001"]["name"] = "C"
+        self.assertEqual(self.hotels.get("H001"), {"name": "A"})
+
+    def test_migrate(self):
+        """JSON data files are published as one version."""
+        path = os.path.join(self.tmpdir.name, 'customers.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"C001": {"name": "A"}}, file)
+        counts = migrate(self.repository.root, {
+            'customers': path,
+            'hotels': os.path.join(self.tmpdir.name, 'missing.json')})
+        self.assertEqual(counts, {'customers': 1})
+        self.assertEqual(self.open('customers').all(),
+                         {"C001": {"name": "A"}})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+"""Unit tests for report.py"""
+
+import unittest
+import os
+import sys
+import json
+import tempfile
+from io import StringIO
+import store
+from availability import to_ordinal
+from hotel import Hotel
+from report import (DayCounter, cache_path, daily_occupancy, main,
+                    occupancy)
+from reservation import Reservation
+
+
+class TestDayCounter(unittest.TestCase):
+    """Test range updates and sums over days"""
+    def test_range_sums(self):
+        """Sums match a plain per-day count."""
+        counter = DayCounter()
+        plain = {}
+        for start, end, value in ((10, 15, 1), (12, 20, 2), (14, 15, -1)):
+            counter.add(start, end, value)
+            for day in range(start, end):
+                plain[day] = plain.get(day, 0) + value
+        for start in range(5, 25):
+            for end in range(start + 1, 26):
+                self.assertEqual(
+                    counter.total(start, end),
+                    sum(plain.get(day, 0) for day in range(start, end)))
+
+
+class TestOccupancy(unittest.TestCase):
+    """Test the occupancy report"""
+    def setUp(self):
+        """Create two hotels and two reservations in temp files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (Hotel.hotels_file, Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        self.hotel = Hotel("H001", "A", "X", {})
+        self.hotel.add_room("101")
+        self.hotel.add_room("102")
+        Hotel("H002", "B", "Y", {"201": {"available": True,
+                                         "customer_id": None}}).save()
+        Reservation("R001", "C001", "H001", "101", "2024-01-01",
+                    "2024-01-05").save()
+        Reservation("R002", "C002", "H001", "102", "2024-01-03",
+                    "2024-01-04").save()
+
+    def test_occupancy_and_revpar(self):
+        """Sold room nights are counted within the range only."""
+        rows, totals = occupancy("2024-01-03", "2024-01-05", adr=100)
+        self.assertEqual([row["hotel_id"] for row in rows], ["H001", "H002"])
+        self.assertEqual(rows[0]["sold_nights"], 3)
+        self.assertEqual(rows[0]["available_nights"], 4)
+        self.assertEqual(rows[0]["unavailable"], 2)
+        self.assertAlmostEqual(rows[0]["revpar"], 75.0)
+        self.assertEqual(totals["available_nights"], 6)
+        self.assertAlmostEqual(totals["occupancy"], 0.5)
+
+    def test_counters_follow_changes(self):
+        """Cancellations and room changes update the counters."""
+        occupancy("2024-01-01", "2024-01-10")
+        Reservation.cancel("R001")
+        self.hotel = Hotel("H001", "A", "X",
+                           Hotel.get_all_hotels()["H001"]["rooms"])
+        self.hotel.add_room("103")
+        rows, _ = occupancy("2024-01-01", "2024-01-10", ["H001"])
+        self.assertEqual(rows[0]["sold_nights"], 1)
+        self.assertEqual(rows[0]["rooms"], 3)
+        days = daily_occupancy("2024-01-02", "2024-01-05", "H001")
+        self.assertEqual(days, [(to_ordinal("2024-01-02"), 0, 3),
+                                (to_ordinal("2024-01-03"), 1, 3),
+                                (to_ordinal("2024-01-04"), 0, 3)])
+
+    @unittest.skipIf(store.backend_name() != 'json',
+                     "counters are only cached next to JSON files")
+    def test_counters_cached_until_data_changes(self):
+        """Other processes load the saved counters while the files are
+        unchanged."""
+        occupancy("2024-01-01", "2024-01-10")
+        path = cache_path(Hotel.hotels_file, 'rooms')
+        with open(path, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        self.assertEqual(cached["data"]["H001"], [2, 2])
+        cached["data"]["H002"] = [9, 0]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(cached, file)
+        store.reset()
+        rows, _ = occupancy("2024-01-01", "2024-01-10")
+        self.assertEqual((rows[0]["sold_nights"], rows[1]["rooms"]), (5, 9))
+        store.reset()
+        Hotel("H003", "C", "Z", {}).save()
+        rows, _ = occupancy("2024-01-01", "2024-01-10")
+        self.assertEqual(rows[1]["rooms"], 1)
+
+    def test_cli(self):
+        """The report command prints each hotel and the totals."""
+        main(['occupancy', '--from', '2024-01-01', '--to', '2024-01-03',
+              '--hotel', 'H001', '--daily'])
+        output = sys.stdout.getvalue()
+        self.assertIn("Hotel ID: H001", output)
+        self.assertIn("2024-01-02: 1/2 rooms booked", output)
+        self.assertIn("Total, Rooms: 2", output)
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        store.reset()
+        Hotel.hotels_file, Reservation.reservations_file = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
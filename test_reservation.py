@@ -3,7 +3,9 @@
 
 import unittest
 import os
-from reservation import Reservation
+import sys
+from io import StringIO
+from reservation import Reservation, main, read_batch
 from hotel import Hotel
 from customer import Customer
 
@@ -43,6 +45,92 @@ class TestReservation(unittest.TestCase):
         reservations_after_cancellation = Reservation.get_all_reservations()
         self.assertNotIn("R001", reservations_after_cancellation)
 
+    def test_find_reservations(self):
+        """Test looking up reservations by customer, hotel and room."""
+        self.reservation.save()
+        self.assertIn("R001", Reservation.find_by_customer("C001"))
+        self.assertIn("R001", Reservation.find_by_hotel("H001"))
+        self.assertIn("R001", Reservation.find_by_room("H001", "101"))
+        self.assertEqual(Reservation.find_by_customer("C999"), {})
+
+    def test_overlapping_reservation_rejected(self):
+        """Test that a room cannot be booked twice for the same nights."""
+        self.assertTrue(self.reservation.save())
+        overlapping = Reservation("R002", "C001", "H001", "101", "2024-01-09", "2024-01-12")
+        self.assertFalse(overlapping.save())
+        self.assertNotIn("R002", Reservation.get_all_reservations())
+        following = Reservation("R003", "C001", "H001", "101", "2024-01-10", "2024-01-12")
+        self.assertTrue(following.save())
+        Reservation.cancel("R003")
+
+    def test_save_many_is_all_or_nothing(self):
+        """Test that a batch with one bad booking saves nothing."""
+        first = Reservation("R010", "C001", "H001", "102", "2024-05-01", "2024-05-05")
+        clashing = Reservation("R011", "C001", "H001", "102", "2024-05-04", "2024-05-06")
+        failures = Reservation.save_many([first, clashing])
+        self.assertEqual(list(failures), ["R011"])
+        self.assertNotIn("R010", Reservation.get_all_reservations())
+        later = Reservation("R011", "C001", "H001", "102", "2024-05-05", "2024-05-06")
+        self.assertEqual(Reservation.save_many([first, later]), {})
+        self.assertIn("R011", Reservation.get_all_reservations())
+        Reservation.cancel("R010")
+        Reservation.cancel("R011")
+
+    def test_read_batch_reports_bad_lines(self):
+        """Test that bad lines of a batch file are reported by number."""
+        booking = ('"reservation_id": "R020", "customer_id": "C001", '
+                   '"hotel_id": "H001", "start_date": "2024-06-01", '
+                   '"end_date": "2024-06-02"')
+        file = StringIO(
+            '{' + booking + ', "room_number": "101"}\n'
+            '{' + booking + '\n'
+            '\n'
+            '{' + booking + '}\n'
+            '{' + booking + ', "room_number": "101", "note": "x"}\n'
+            '{' + booking + ', "room_number": 101}\n'
+            '[]\n')
+        reservations, errors = read_batch(file)
+        self.assertEqual([item.room_number for item in reservations], ["101"])
+        self.assertEqual([number for number, _ in errors], [2, 4, 5, 6, 7])
+        self.assertIn("invalid JSON", errors[0][1])
+        self.assertEqual(errors[1][1], "missing room_number")
+        self.assertEqual(errors[2][1], "unknown note")
+        self.assertEqual(errors[3][1], "fields must be strings: room_number")
+        reservations, errors = read_batch(
+            StringIO('{' + booking + '}\n'), ('room_number',))
+        self.assertEqual((reservations[0].room_number, errors), (None, []))
+
+    def test_auto_assign(self):
+        """Test that rooms are chosen to leave the fewest gaps."""
+        hotel = Hotel("H002", "Other Hotel", "Test Location", {})
+        hotel.add_room("201")
+        hotel.add_room("202")
+        booked = Reservation("R020", "C001", "H002", "202", "2024-06-01", "2024-06-03")
+        self.assertTrue(booked.save())
+        stays = [
+            Reservation("R021", "C001", "H002", None, "2024-06-03", "2024-06-05"),
+            Reservation("R022", "C001", "H002", None, "2024-06-02", "2024-06-06"),
+        ]
+        self.assertEqual(Reservation.auto_assign(stays), {})
+        self.assertEqual([stay.room_number for stay in stays], ["202", "201"])
+        full = Reservation("R023", "C001", "H002", None, "2024-06-04", "2024-06-05")
+        self.assertEqual(list(Reservation.auto_assign([full])), ["R023"])
+        for reservation_id in ("R020", "R021", "R022"):
+            Reservation.cancel(reservation_id)
+        Hotel.delete("H002")
+
+    def test_availability_cli_invalid_dates(self):
+        """Test that the availability command reports bad dates."""
+        original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            main(['availability', 'H001', '2024-01-10', '2024-01-01'])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = original_stdout
+        self.assertIn("Invalid dates: End date must be after start date.",
+                      output)
+
     @classmethod
     def tearDownClass(cls):
         # Clean up created files during tests
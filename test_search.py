@@ -0,0 +1,105 @@
+"""Unit tests for search.py"""
+
+import unittest
+import os
+import sys
+import tempfile
+from io import StringIO
+import store
+from hotel import Hotel, main
+from reservation import Reservation
+from search import default_snapshot, is_current, search
+
+
+class TestSearch(unittest.TestCase):
+    """Test the parallel availability search"""
+    def setUp(self):
+        """Create three hotels and one reservation in temp files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (Hotel.hotels_file, Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        rooms = {"101": {"available": True, "customer_id": None},
+                 "102": {"available": True, "customer_id": None}}
+        Hotel("H001", "Harbour", "Lisbon", dict(rooms)).save()
+        Hotel("H002", "Castle", "Lisbon", {"201": dict(rooms["101"])}).save()
+        Hotel("H003", "Canal", "Porto", dict(rooms)).save()
+        Reservation("R001", "C001", "H002", "201", "2024-01-01",
+                    "2024-01-05").save()
+
+    def test_ranked_by_free_rooms(self):
+        """Hotels with more free rooms come first."""
+        results = search("2024-01-05", "2024-01-07", workers=1)
+        self.assertEqual([item[0] for item in results],
+                         ["H001", "H003", "H002"])
+        self.assertEqual(results[0][3], ["101", "102"])
+
+    def test_booked_hotels_and_city_filter(self):
+        """Fully booked hotels and other cities are left out."""
+        results = search("2024-01-03", "2024-01-06", city="lisbon", workers=2)
+        self.assertEqual([item[0] for item in results], ["H001"])
+
+    def test_overlapping_legacy_bookings(self):
+        """Stays inside a long booking that overlaps another are taken."""
+        reservations = Reservation.storage()
+        stays = (("R010", "2024-01-01", "2024-01-11"),
+                 ("R011", "2024-01-02", "2024-01-03"))
+        for key, start_date, end_date in stays:
+            reservations.put(key, {"customer_id": "C001", "hotel_id": "H001",
+                                   "room_number": "101",
+                                   "start_date": start_date,
+                                   "end_date": end_date})
+        results = search("2024-01-05", "2024-01-06", city="lisbon", workers=1)
+        self.assertEqual(results[0][:1] + results[0][3:], ("H001", ["102"]))
+
+    def test_snapshot_reused_until_data_changes(self):
+        """A saved search snapshot is rebuilt after a change."""
+        path = os.path.join(self.tmpdir.name, 'search.snap')
+        search("2024-01-01", "2024-01-02", snapshot_path=path, workers=1)
+        self.assertTrue(is_current(path))
+        Reservation("R002", "C001", "H001", "101", "2024-01-01",
+                    "2024-01-02").save()
+        self.assertFalse(is_current(path))
+        results = search("2024-01-01", "2024-01-02", snapshot_path=path,
+                         workers=1)
+        self.assertEqual(results[0][0], "H003")
+        self.assertEqual(results[1][3], ["102"])
+
+    @unittest.skipIf(store.backend_name() != 'json',
+                     "snapshots are only checked against JSON files")
+    def test_default_snapshot_reused(self):
+        """Searches without a snapshot file share one next to the data."""
+        search("2024-01-01", "2024-01-02", workers=1)
+        path = default_snapshot()
+        self.assertTrue(is_current(path))
+        built = os.stat(path).st_mtime_ns
+        search("2024-01-05", "2024-01-06", workers=1)
+        self.assertEqual(os.stat(path).st_mtime_ns, built)
+        Reservation("R002", "C001", "H001", "101", "2024-01-05",
+                    "2024-01-06").save()
+        results = search("2024-01-05", "2024-01-06", workers=1)
+        self.assertEqual([item[0] for item in results],
+                         ["H003", "H001", "H002"])
+
+    def test_cli(self):
+        """The hotel CLI prints the ranked hotels."""
+        original_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            main(['search', '--from', '2024-01-02', '--to', '2024-01-03',
+                  '--city', 'Porto', '--workers', '1'])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = original_stdout
+        self.assertIn("Hotel ID: H003", output)
+        self.assertNotIn("H001", output)
+
+    def tearDown(self):
+        store.reset()
+        Hotel.hotels_file, Reservation.reservations_file = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+"""Unit tests for serialization.py"""
+
+import unittest
+import os
+import tempfile
+import serialization
+from serialization import (configure, decode, encode, orjson, read_file,
+                           settings, write_file, zstandard)
+from store import JsonStore
+
+DATA = {"H001": {"name": "Hôtel", "rooms": {"101": {"available": True,
+                                                     "customer_id": None}}}}
+
+
+class TestSerialization(unittest.TestCase):
+    """Test the data file formats"""
+    def setUp(self):
+        """Remember the configured format."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # pylint: disable-next=protected-access
+        self.saved = dict(serialization._settings)
+
+    def test_round_trips(self):
+        """Every style and compression decodes to the same data."""
+        for style in serialization.STYLES:
+            for compression in ('none', 'gzip'):
+                raw = encode(DATA, style, 'json', compression)
+                self.assertEqual(decode(raw), DATA)
+
+    def test_compact_is_smaller(self):
+        """Compact files drop the indentation."""
+        self.assertLess(len(encode(DATA, 'compact', 'json', 'none')),
+                        len(encode(DATA, 'pretty', 'json', 'none')))
+        self.assertNotIn(b'\n', encode(DATA, 'compact', 'json', 'none'))
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_matches_json(self):
+        """Both codecs read each other's output."""
+        raw = encode(DATA, 'compact', 'orjson', 'none')
+        self.assertEqual(decode(raw, 'json'), DATA)
+        self.assertEqual(decode(encode(DATA, 'pretty', 'json', 'none'),
+                                'orjson'), DATA)
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_non_string_keys(self):
+        """orjson writes integer keys as strings, like json."""
+        data = {"H001": {"rooms": {101: {"available": True}}}}
+        for style in serialization.STYLES:
+            self.assertEqual(decode(encode(data, style, 'orjson', 'none')),
+                             decode(encode(data, style, 'json', 'none')))
+
+    @unittest.skipIf(zstandard is not None, "zstandard is installed")
+    def test_zstd_without_zstandard(self):
+        """zstd files are not taken for corrupted ones and overwritten."""
+        path = os.path.join(self.tmpdir.name, 'hotels.json')
+        with open(path, 'wb') as file:
+            file.write(serialization.ZSTD_MAGIC + b'data')
+        store = JsonStore('hotels', path)
+        with self.assertRaises(ImportError):
+            store.put("H001", DATA["H001"])
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), serialization.ZSTD_MAGIC + b'data')
+
+    def test_configure(self):
+        """Configured formats are used by the stores."""
+        configure(style='compact', compression='gzip')
+        self.assertEqual(settings()['compression'], 'gzip')
+        path = os.path.join(self.tmpdir.name, 'hotels.json')
+        store = JsonStore('hotels', path)
+        store.put("H001", DATA["H001"])
+        with open(path, 'rb') as file:
+            self.assertTrue(file.read().startswith(serialization.GZIP_MAGIC))
+        self.assertEqual(JsonStore('hotels', path).all(), DATA)
+        with self.assertRaises(ValueError):
+            configure(style='fancy')
+
+    def test_corrupted_file(self):
+        """Damaged compressed data raises ValueError."""
+        path = os.path.join(self.tmpdir.name, 'hotels.json')
+        write_file(path, DATA)
+        self.assertEqual(read_file(path), DATA)
+        with self.assertRaises(ValueError):
+            decode(serialization.GZIP_MAGIC + b'broken')
+
+    def tearDown(self):
+        # pylint: disable-next=protected-access
+        serialization._settings.update(self.saved)
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,157 @@
+"""Unit tests for server.py"""
+
+import unittest
+import os
+import json
+import asyncio
+import threading
+import tempfile
+import store
+from customer import Customer
+from hotel import Hotel
+from reservation import Reservation
+from server import BookingServer
+
+
+class TestBookingServer(unittest.IsolatedAsyncioTestCase):
+    """Test the HTTP booking service"""
+    async def asyncSetUp(self):
+        """Start a server on temporary data files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (
+            Hotel.hotels_file, Customer.customers_file,
+            Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Customer.customers_file = os.path.join(
+            self.tmpdir.name, 'customers.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.server = BookingServer(refresh_interval=0.05)
+        host, port = await self.server.start('127.0.0.1', 0)
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def request(self, method, path, body=None):
+        """Send one request on the shared connection."""
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: test\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def test_hotel_lifecycle(self):
+        """Hotels can be created, displayed and deleted."""
+        status, _ = await self.request('POST', '/hotels', {
+            'hotel_id': 'H001', 'name': 'Test Hotel', 'location': 'Here',
+            'rooms': {'101': {'available': True, 'customer_id': None}}})
+        self.assertEqual(status, 201)
+        status, hotel = await self.request('GET', '/hotels/H001')
+        self.assertEqual((status, hotel['name']), (200, 'Test Hotel'))
+        status, _ = await self.request('DELETE', '/hotels/H001')
+        self.assertEqual(status, 200)
+        status, _ = await self.request('GET', '/hotels/H001')
+        self.assertEqual(status, 404)
+
+    async def test_reservations_and_availability(self):
+        """Bookings update availability and conflicts are rejected."""
+        await self.request('POST', '/hotels', {
+            'hotel_id': 'H001', 'name': 'Test Hotel', 'location': 'Here',
+            'rooms': {'101': {'available': True, 'customer_id': None},
+                      '102': {'available': True, 'customer_id': None}}})
+        booking = {
+            'reservation_id': 'R001', 'customer_id': 'C001',
+            'hotel_id': 'H001', 'room_number': '101',
+            'start_date': '2024-01-01', 'end_date': '2024-01-05'}
+        status, _ = await self.request('POST', '/reservations', booking)
+        self.assertEqual(status, 201)
+        status, _ = await self.request(
+            'POST', '/reservations', dict(booking, reservation_id='R002'))
+        self.assertEqual(status, 409)
+        status, free = await self.request(
+            'GET', '/availability?hotel_id=H001&start_date=2024-01-02'
+            '&end_date=2024-01-03')
+        self.assertEqual((status, free['rooms']), (200, ['102']))
+        status, _ = await self.request('DELETE', '/reservations/R001')
+        self.assertEqual(status, 200)
+
+    async def test_bad_requests(self):
+        """Invalid requests get client errors."""
+        status, _ = await self.request('POST', '/customers', {'name': 'A'})
+        self.assertEqual(status, 400)
+        status, _ = await self.request('GET', '/unknown/1')
+        self.assertEqual(status, 404)
+        status, _ = await self.request('PUT', '/customers/C1')
+        self.assertEqual(status, 405)
+
+    async def test_bad_bodies(self):
+        """Bodies of the wrong shape are rejected before they are saved."""
+        hotel = {'hotel_id': 'H001', 'name': 'Test Hotel', 'location': 'Here'}
+        for body in (dict(hotel, rooms=['101']),
+                     dict(hotel, rooms={'101': 'free'}),
+                     dict(hotel, name=5)):
+            status, _ = await self.request('POST', '/hotels', body)
+            self.assertEqual(status, 400)
+        status, _ = await self.request('GET', '/hotels/H001')
+        self.assertEqual(status, 404)
+
+    async def test_referenced_hotel_is_kept(self):
+        """A hotel with reservations cannot be deleted."""
+        await self.request('POST', '/hotels', {
+            'hotel_id': 'H001', 'name': 'Test Hotel', 'location': 'Here',
+            'rooms': {'101': {'available': True, 'customer_id': None}}})
+        await self.request('POST', '/reservations', {
+            'reservation_id': 'R001', 'customer_id': 'C001',
+            'hotel_id': 'H001', 'room_number': '101',
+            'start_date': '2024-01-01', 'end_date': '2024-01-05'})
+        status, answer = await self.request('DELETE', '/hotels/H001')
+        self.assertEqual(status, 409)
+        self.assertIn('R001', answer['error'])
+        status, _ = await self.request('GET', '/hotels/H001')
+        self.assertEqual(status, 200)
+
+    async def test_reads_do_not_wait_for_writes(self):
+        """Reads are answered while a write is running."""
+        await self.request('POST', '/customers', {
+            'customer_id': 'C001', 'name': 'A', 'email': 'a@example.com'})
+        writing = threading.Event()
+        write = asyncio.ensure_future(
+            self.server._run(writing.wait))  # pylint: disable=protected-access
+        status, customer = await self.request('GET', '/customers/C001')
+        self.assertEqual((status, customer['name']), (200, 'A'))
+        self.assertFalse(write.done())
+        writing.set()
+        await write
+
+    @unittest.skipIf(store.backend_name() != 'json',
+                     "writes the JSON data file directly")
+    async def test_changes_by_other_processes(self):
+        """Records written to the files directly are picked up."""
+        with open(Customer.customers_file, 'w', encoding='utf-8') as file:
+            json.dump({'C001': {'name': 'A', 'email': 'a@example.com'}}, file)
+        for _ in range(100):
+            status, _ = await self.request('GET', '/customers/C001')
+            if status == 200:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(status, 200)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.server.close()
+        store.reset()
+        (Hotel.hotels_file, Customer.customers_file,
+         Reservation.reservations_file) = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+"""Unit tests for sharding.py"""
+
+import unittest
+import os
+import json
+import tempfile
+import store
+from hotel import Hotel
+from reservation import Reservation
+from sharding import ShardedStore, join, shard_dir, shard_of, split
+
+
+class TestShardedStore(unittest.TestCase):
+    """Test the store that splits data files by hotel ID"""
+    def setUp(self):
+        """Create sharded hotel and reservation stores in a temp dir."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.hotels = ShardedStore(
+            'hotels', os.path.join(self.tmpdir.name, 'hotels.json'), 4)
+        self.reservations = ShardedStore(
+            'reservations',
+            os.path.join(self.tmpdir.name, 'reservations.json'), 4)
+
+    def shard_files(self, name):
+        """Return the shard files written so far."""
+        directory = os.path.join(self.tmpdir.name, name + '.shards')
+        return sorted(entry for entry in os.listdir(directory)
+                      if entry.startswith('shard-')
+                      and entry.endswith('.json'))
+
+    def test_write_touches_owning_shard(self):
+        """A put writes only the shard its hotel ID maps to."""
+        self.hotels.put("H001", {"name": "A", "location": "X", "rooms": {}})
+        number = shard_of("H001", 4)
+        self.assertEqual(self.shard_files('hotels'),
+                         [f"shard-{number:02d}.json"])
+        self.assertEqual(self.hotels.get("H001")["name"], "A")
+
+    def test_reservations_follow_their_hotel(self):
+        """Reservations share the shard number of their hotel."""
+        self.reservations.put("R001", {"hotel_id": "H001", "room": "101"})
+        self.assertIs(self.reservations.shard_for("R001"),
+                      self.reservations.shards[shard_of("H001", 4)])
+        self.reservations.put("R001", {"hotel_id": "H002", "room": "101"})
+        self.assertEqual(list(self.reservations.all()), ["R001"])
+        self.assertTrue(self.reservations.remove("R001"))
+        self.assertFalse(self.reservations.remove("R001"))
+
+    def test_lookup_reads_owning_shard(self):
+        """Reservations are found without loading the other shards."""
+        for number in range(8):
+            self.reservations.put(f"R{number:03d}",
+                                  {"hotel_id": f"H{number:03d}"})
+        reopened = ShardedStore('reservations', self.reservations.path)
+        self.assertEqual(reopened.get("R001"), {"hotel_id": "H001"})
+        loaded = [shard for shard in reopened.shards + reopened.routes
+                  if shard._loaded]  # pylint: disable=protected-access
+        self.assertEqual(loaded, [
+            reopened.shards[shard_of("H001", 4)],
+            reopened.routes[shard_of("R001", 4)]])
+
+    def test_routes_built_for_old_manifest(self):
+        """Stores sharded before routes existed get them on first use."""
+        self.reservations.put("R001", {"hotel_id": "H001"})
+        directory = shard_dir(self.reservations.path)
+        manifest = os.path.join(directory, 'manifest.json')
+        with open(manifest, 'r', encoding='utf-8') as file:
+            content = json.load(file)
+        del content['routes']
+        with open(manifest, 'w', encoding='utf-8') as file:
+            json.dump(content, file)
+        for entry in os.listdir(directory):
+            if entry.startswith('route-'):
+                os.remove(os.path.join(directory, entry))
+        reopened = ShardedStore('reservations', self.reservations.path)
+        self.assertEqual(reopened.get("R001"), {"hotel_id": "H001"})
+        with open(manifest, 'r', encoding='utf-8') as file:
+            self.assertIn('routes', json.load(file))
+
+    def test_manifest_keeps_shard_count(self):
+        """A reopened store uses the shard count of the manifest."""
+        self.hotels.put("H001", {"name": "A"})
+        reopened = ShardedStore(
+            'hotels', os.path.join(self.tmpdir.name, 'hotels.json'), 8)
+        self.assertEqual(len(reopened.shards), 4)
+        self.assertEqual(reopened.all(), {"H001": {"name": "A"}})
+
+    def test_scoped_batch_locks_owning_shards(self):
+        """A scoped batch only takes the locks of its hotels' shards."""
+        with self.hotels.batch(scope=["H001"]):
+            self.hotels.put("H001", {"name": "A"})
+            self.assertFalse(os.path.exists(
+                self.hotels.shard_for("H001").path))
+        locks = [entry for entry in os.listdir(
+            shard_dir(self.hotels.path)) if entry.startswith('shard-')
+                 and entry.endswith('.lock')]
+        number = shard_of("H001", 4)
+        self.assertEqual(locks, [f"shard-{number:02d}.json.lock"])
+
+    def test_split_and_join(self):
+        """A JSON file survives a round trip through shards."""
+        path = os.path.join(self.tmpdir.name, 'customers.json')
+        records = {f"C{number:03d}": {"name": str(number)}
+                   for number in range(20)}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(records, file)
+        self.assertEqual(split(path, 'customers', 3), 20)
+        os.remove(path)
+        self.assertEqual(join(path, 'customers'), 20)
+        with open(path, 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), records)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+class TestShardedBackend(unittest.TestCase):
+    """Test the entities on the sharded backend"""
+    def setUp(self):
+        """Select the sharded backend and point the files at a temp dir."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (Hotel.hotels_file, Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.backend = store.backend_name()
+        store.use_backend('sharded')
+
+    def test_booking(self):
+        """Bookings are checked and saved across shards."""
+        Hotel("H001", "A", "X", {"101": {"available": True,
+                                         "customer_id": None}}).save()
+        self.assertTrue(Reservation(
+            "R001", "C001", "H001", "101", "2024-01-01", "2024-01-03").save())
+        self.assertFalse(Reservation(
+            "R002", "C002", "H001", "101", "2024-01-02", "2024-01-04").save())
+        rooms = Hotel.get_all_hotels()["H001"]["rooms"]
+        self.assertEqual(rooms["101"]["customer_id"], "C001")
+
+    def tearDown(self):
+        store.use_backend(self.backend)
+        Hotel.hotels_file, Reservation.reservations_file = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,102 @@
+"""Unit tests for shell.py"""
+
+import unittest
+import os
+import sys
+import json
+import tempfile
+from io import StringIO
+import store
+from customer import Customer
+from hotel import Hotel
+from instrumentation import metrics
+from reservation import Reservation
+from shell import Shell, main
+
+
+class TestShell(unittest.TestCase):
+    """Test the command shell"""
+    def setUp(self):
+        """Point the data files at a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (
+            Hotel.hotels_file, Customer.customers_file,
+            Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Customer.customers_file = os.path.join(
+            self.tmpdir.name, 'customers.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.original_stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def test_commands_share_state_and_flush_at_end(self):
+        """Commands run in order and are written when the shell ends."""
+        script = [
+            'hotel create H001 "Seaside Resort" "Ocean View" '
+            '--rooms \'{"101": {"available": true, "customer_id": null}}\'',
+            'customer create C001 "John Doe" johndoe@example.com',
+            '# comments and blank lines are ignored',
+            '',
+            'reservation create R001 C001 H001 101 2024-01-01 2024-01-05',
+            'hotel display H001',
+        ]
+        shell = Shell(flush_every=100)
+        shell.run(script[:-1])
+        self.assertEqual(shell.commands_run, 3)
+        with open(Reservation.reservations_file, 'r',
+                  encoding='utf-8') as file:
+            self.assertIn("R001", json.load(file))
+        shell.run(script[-1:])
+        self.assertIn("'available': False", sys.stdout.getvalue())
+
+    def test_flush_every(self):
+        """Changes are written after every N commands."""
+        shell = Shell(flush_every=1)
+        shell.execute('customer create C001 "John Doe" j@example.com')
+        self.assertTrue(os.path.exists(Customer.customers_file))
+
+    def test_flush_every_must_be_positive(self):
+        """A flush interval below 1 is rejected."""
+        original_stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                main(['--flush-every', '0'])
+            self.assertIn("must be at least 1", sys.stderr.getvalue())
+        finally:
+            sys.stderr = original_stderr
+
+    def test_metrics_per_command(self):
+        """--metrics on one line meters just that command."""
+        path = os.path.join(self.tmpdir.name, 'metrics.prom')
+        shell = Shell()
+        shell.execute('customer create C001 "John Doe" j@example.com '
+                      '--metrics ' + path)
+        with open(path, 'r', encoding='utf-8') as file:
+            self.assertIn('operation="Customer.save"', file.read())
+        self.assertFalse(metrics.enabled)
+
+    def test_errors_do_not_stop_the_shell(self):
+        """Bad commands are reported and the shell goes on."""
+        shell = Shell()
+        self.assertTrue(shell.execute('unknown command'))
+        self.assertTrue(shell.execute('hotel create'))
+        self.assertTrue(shell.execute('hotel "unterminated'))
+        self.assertTrue(shell.execute(
+            'reservation create-batch ' + os.path.join(
+                self.tmpdir.name, 'missing.jsonl')))
+        self.assertFalse(shell.execute('exit'))
+        self.assertIn("Unknown command", sys.stdout.getvalue())
+        self.assertIn("missing.jsonl", sys.stdout.getvalue())
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        store.reset()
+        (Hotel.hotels_file, Customer.customers_file,
+         Reservation.reservations_file) = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
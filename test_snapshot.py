@@ -0,0 +1,69 @@
+"""Unit tests for snapshot.py"""
+
+import unittest
+import os
+import json
+import tempfile
+from snapshot import SnapshotReader, open_current, to_binary, to_json, \
+    write_snapshot
+from store import JsonStore
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test binary snapshots"""
+    def setUp(self):
+        """Write a JSON data file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.tmpdir.name, 'hotels.json')
+        self.data = {
+            f"H{number:03d}": {"name": f"Hotel {number}", "location": "Ñandú",
+                               "rooms": {"101": {"available": True,
+                                                 "customer_id": None}}}
+            for number in range(50)
+        }
+        with open(self.json_path, 'w', encoding='utf-8') as file:
+            json.dump(self.data, file, indent=4)
+
+    def test_lookup(self):
+        """Every key is found and missing keys are not."""
+        path = os.path.join(self.tmpdir.name, 'data.snap')
+        write_snapshot(path, self.data)
+        with SnapshotReader(path) as reader:
+            self.assertEqual(len(reader), 50)
+            for key, record in self.data.items():
+                self.assertEqual(reader.get(key), record)
+            self.assertIsNone(reader.get("H999"))
+            self.assertEqual(reader.key_at(0), "H000")
+
+    def test_round_trip(self):
+        """JSON converts to a snapshot and back without changes."""
+        path = to_binary(self.json_path)
+        out = os.path.join(self.tmpdir.name, 'copy.json')
+        to_json(path, out)
+        with open(out, 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), self.data)
+
+    def test_stale_snapshot_is_ignored(self):
+        """A snapshot is only used while the JSON file is unchanged."""
+        to_binary(self.json_path)
+        reader = open_current(self.json_path)
+        self.assertIsNotNone(reader)
+        reader.close()
+        with open(self.json_path, 'w', encoding='utf-8') as file:
+            json.dump({}, file)
+        self.assertIsNone(open_current(self.json_path))
+
+    def test_store_uses_snapshot_for_lookups(self):
+        """A cold store answers single lookups from the snapshot."""
+        to_binary(self.json_path)
+        store = JsonStore('hotels', self.json_path)
+        self.assertEqual(store.get("H007"), self.data["H007"])
+        self.assertIsNone(store.get("H999"))
+        self.assertFalse(store._loaded)  # pylint: disable=protected-access
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,165 @@
+"""Unit tests for sqlite_store.py"""
+
+import unittest
+import contextlib
+import io
+import os
+import json
+import sqlite3
+import tempfile
+import store
+from customer import Customer
+from hotel import Hotel
+from integrity import CASCADE, delete_customer
+from reservation import Reservation
+from sqlite_store import SqliteStore, migrate
+
+
+class TestSqliteStore(unittest.TestCase):
+    """Test the SQLite backend"""
+    def setUp(self):
+        """Create stores in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.hotels = SqliteStore(
+            'hotels', os.path.join(self.tmpdir.name, 'hotels.json'))
+        self.reservations = SqliteStore(
+            'reservations',
+            os.path.join(self.tmpdir.name, 'reservations.json'))
+
+    def test_hotel_round_trip(self):
+        """Hotels keep their nested rooms."""
+        record = {"name": "Test Hotel", "location": "Here", "rooms": {
+            "101": {"available": False, "customer_id": "C001"}}}
+        self.hotels.put("H001", record)
+        self.assertEqual(self.hotels.get("H001"), record)
+        self.assertEqual(self.hotels.all(), {"H001": record})
+
+    def test_remove(self):
+        """Removing reports whether the key existed."""
+        self.hotels.put("H001", {"name": "A", "location": "B", "rooms": {}})
+        self.assertTrue(self.hotels.remove("H001"))
+        self.assertFalse(self.hotels.remove("H001"))
+        self.assertIsNone(self.hotels.get("H001"))
+
+    def test_batch_rolls_back_on_error(self):
+        """A failing batch leaves no partial changes behind."""
+        saves = []
+        self.reservations.add_save_listener(saves.append)
+        with self.assertRaises(KeyError):
+            with self.reservations.batch():
+                self.reservations.put("R001", {
+                    "customer_id": "C001", "hotel_id": "H001",
+                    "room_number": "101", "start_date": "2024-01-01",
+                    "end_date": "2024-01-02"})
+                self.reservations.put("R002", {})
+        self.assertEqual(self.reservations.all(), {})
+        self.assertEqual(saves, [False])
+
+    def test_batch_takes_write_lock(self):
+        """Other connections cannot write while a batch is open."""
+        other = sqlite3.connect(self.hotels.database.path, timeout=0)
+        with self.hotels.batch():
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute("BEGIN IMMEDIATE")
+        other.execute("BEGIN IMMEDIATE")
+        other.rollback()
+        other.close()
+
+    def test_indexes_exist(self):
+        """The reservation lookups are backed by indexes."""
+        rows = self.hotels.database.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")
+        names = {row[0] for row in rows}
+        self.assertIn("reservations_customer", names)
+        self.assertIn("reservations_hotel", names)
+        self.assertIn("reservations_room_dates", names)
+
+    def test_migrate(self):
+        """JSON files are imported into the database."""
+        path = os.path.join(self.tmpdir.name, 'customers.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"C001": {"name": "John", "email": "j@x.com"}}, file)
+        counts = migrate(self.hotels.database.path, {'customers': path})
+        self.assertEqual(counts, {'customers': 1})
+        customers = SqliteStore('customers', path)
+        self.assertEqual(customers.get("C001")["name"], "John")
+
+    def tearDown(self):
+        self.hotels.database.close()
+        self.tmpdir.cleanup()
+
+
+class TestSqliteBackend(unittest.TestCase):
+    """Test the entities on the SQLite backend"""
+    def setUp(self):
+        """Select the SQLite backend and point the files at a temp dir."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = (Hotel.hotels_file, Customer.customers_file,
+                      Reservation.reservations_file)
+        Hotel.hotels_file = os.path.join(self.tmpdir.name, 'hotels.json')
+        Customer.customers_file = os.path.join(
+            self.tmpdir.name, 'customers.json')
+        Reservation.reservations_file = os.path.join(
+            self.tmpdir.name, 'reservations.json')
+        self.backend = store.backend_name()
+        store.use_backend('sqlite')
+        self.statements = []
+        Reservation.storage().database.connection.set_trace_callback(
+            self.statements.append)
+
+    def test_reservations_use_indexed_queries(self):
+        """Bookings and lookups never read the whole reservations table."""
+        Hotel("H001", "A", "X", {"101": {"available": True,
+                                         "customer_id": None},
+                                 "102": {"available": True,
+                                         "customer_id": None}}).save()
+        self.assertTrue(Reservation(
+            "R001", "C001", "H001", "101", "2024-01-01", "2024-01-05").save())
+        self.assertFalse(Reservation(
+            "R002", "C002", "H001", "101", "2024-01-04", "2024-01-06").save())
+        self.assertTrue(Reservation(
+            "R003", "C001", "H001", "101", "2024-01-05", "2024-01-06").save())
+        self.assertEqual(list(Reservation.find_by_customer("C001")),
+                         ["R001", "R003"])
+        self.assertEqual(list(Reservation.find_by_hotel("H001")),
+                         ["R001", "R003"])
+        self.assertEqual(Reservation.available_rooms(
+            "H001", "2024-01-02", "2024-01-03"), ["102"])
+        self.assertEqual(self._scans(), [])
+
+    def test_customer_references_use_indexed_queries(self):
+        """Deleting a customer looks up only their rooms and bookings."""
+        Customer("C001", "John Doe", "j@example.com").save()
+        Hotel("H001", "A", "X", {"101": {"available": False,
+                                         "customer_id": "C001"},
+                                 "102": {"available": True,
+                                         "customer_id": None}}).save()
+        self.assertTrue(Reservation(
+            "R001", "C001", "H001", "102", "2024-01-01", "2024-01-05").save())
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertFalse(delete_customer("C001"))
+        self.assertIn("reservations R001 and rooms 101 in hotel H001",
+                      output.getvalue())
+        self.assertTrue(delete_customer("C001", CASCADE))
+        self.assertEqual(Hotel.storage().get("H001")["rooms"]["101"],
+                         {"available": True, "customer_id": None})
+        self.assertEqual(self._scans(), [])
+        self.assertEqual(Reservation.find_by_customer("C001"), {})
+
+    def _scans(self):
+        """Return the statements that read a whole reservations or rooms
+        table."""
+        return [statement for statement in self.statements
+                if ("FROM reservations" in statement
+                    or "FROM rooms" in statement)
+                and "WHERE" not in statement]
+
+    def tearDown(self):
+        store.use_backend(self.backend)
+        (Hotel.hotels_file, Customer.customers_file,
+         Reservation.reservations_file) = self.files
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+"""Unit tests for store.py"""
+
+import unittest
+import os
+import json
+import tempfile
+import store
+from store import JsonStore
+
+
+class TestJsonStore(unittest.TestCase):
+    """Test the cached JSON store"""
+    def setUp(self):
+        """Create a store on a temporary file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'items.json')
+        self.store = JsonStore('items', self.path)
+
+    def read_file(self):
+        """Return the file contents as parsed JSON."""
+        with open(self.path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_put_writes_through(self):
+        """A put is flushed immediately by default."""
+        self.store.put("A", {"value": 1})
+        self.assertEqual(self.read_file(), {"A": {"value": 1}})
+
+    def test_batch_flushes_once(self):
+        """Changes inside a batch are only written at the end."""
+        with self.store.batch():
+            self.store.put("A", {"value": 1})
+            self.store.put("B", {"value": 2})
+            self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(set(self.read_file()), {"A", "B"})
+
+    def test_remove(self):
+        """Removing reports whether the key existed."""
+        self.store.put("A", {"value": 1})
+        self.assertTrue(self.store.remove("A"))
+        self.assertFalse(self.store.remove("A"))
+        self.assertEqual(self.read_file(), {})
+
+    def test_external_change_invalidates_cache(self):
+        """A file rewritten by someone else is read again."""
+        self.store.put("A", {"value": 1})
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({"B": {"value": 2}, "C": {"value": 3}}, file)
+        self.assertIsNone(self.store.get("A"))
+        self.assertEqual(self.store.get("B"), {"value": 2})
+
+    def test_pending_writes_survive_reload(self):
+        """Unflushed changes are applied again after an external change."""
+        self.store.flush_every = 10
+        self.store.put("A", {"value": 1})
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({"B": {"value": 2}}, file)
+        self.assertEqual(set(self.store.all()), {"A", "B"})
+        self.store.flush()
+        self.assertEqual(set(self.read_file()), {"A", "B"})
+
+    def test_put_copies_record(self):
+        """Mutating the caller's record does not change the store."""
+        record = {"rooms": {}}
+        self.store.put("A", record)
+        record["rooms"]["101"] = {}
+        self.assertEqual(self.store.get("A"), {"rooms": {}})
+
+    def test_all_returns_copy(self):
+        """Changing fetched records does not reach the file."""
+        self.store.put("A", {"rooms": {"101": {"available": True}}})
+        self.store.all()["A"]["rooms"]["101"]["available"] = "MUTATED"
+        self.store.put("B", {})
+        self.assertIs(JsonStore('items', self.path).get("A")[
+            "rooms"]["101"]["available"], True)
+
+    def test_failed_batch_discards_changes(self):
+        """Changes made in a batch that raises are not written."""
+        self.store.flush_every = 10
+        self.store.put("A", {"n": 1})
+        with self.assertRaises(KeyError):
+            with self.store.batch():
+                self.store.put("B", {"n": 2})
+                self.store.remove("A")
+                raise KeyError("B")
+        self.assertEqual(self.store.all(), {"A": {"n": 1}})
+        self.store.flush()
+        self.assertEqual(JsonStore('items', self.path).all(), {"A": {"n": 1}})
+
+    def test_get_returns_copy(self):
+        """Changing a fetched record does not change the store, and
+        listeners see the record as it was."""
+        self.store.put("A", {"rooms": {"101": {"available": True}}})
+        changes = []
+        self.store.add_listener(
+            lambda key, old, new: changes.append((old, new)))
+        record = self.store.get("A")
+        record["rooms"]["101"]["available"] = False
+        self.assertTrue(self.store.get("A")["rooms"]["101"]["available"])
+        self.store.put("A", record)
+        old, new = changes[-1]
+        self.assertTrue(old["rooms"]["101"]["available"])
+        self.assertFalse(new["rooms"]["101"]["available"])
+
+    def test_get_store_is_shared(self):
+        """The same path always maps to the same store."""
+        first = store.get_store('items', self.path)
+        self.assertIs(first, store.get_store('items', self.path))
+
+    def tearDown(self):
+        store.reset()
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)